@@ -0,0 +1,148 @@
+import os
+
+from lazy_imports import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+BAR_SERIES_PRICE_DTYPE = os.getenv("BAR_SERIES_PRICE_DTYPE", "float64")
+
+COLUMNS = ("Close", "Volume")
+
+
+class BarSeries:
+    """
+    A compact, read-only price history holding only the columns the stock functions use.
+
+    Bars are stored as contiguous NumPy arrays: int64 epoch timestamps in nanoseconds (UTC), closing
+    prices as float64 (or float32 with BAR_SERIES_PRICE_DTYPE) and volumes as int64. Compared to
+    the DataFrame returned by yfinance this drops the unused Open, High, Low, Dividends and Stock
+    Splits columns and the per-frame block manager overhead.
+
+    Indexing a column, e.g. `bars['Close']`, returns a pandas Series that is a zero-copy view of the
+    stored array, so code written against the DataFrame keeps working.
+
+    Attributes:
+        timestamps (numpy.ndarray): Bar timestamps as int64 nanoseconds since the epoch, in UTC.
+        close (numpy.ndarray): Closing prices.
+        volume (numpy.ndarray): Traded volumes.
+        tz (str): The exchange timezone of the bars, or None for naive timestamps.
+    """
+
+    __slots__ = ("timestamps", "close", "volume", "tz")
+
+    def __init__(self, timestamps, close, volume, tz=None):
+        self.timestamps = timestamps
+        self.close = close
+        self.volume = volume
+        self.tz = tz
+        for array in (timestamps, close, volume):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_frame(cls, frame, price_dtype=BAR_SERIES_PRICE_DTYPE):
+        """
+        Build a bar series from a yfinance history.
+
+        Args:
+            frame (pandas.DataFrame): The OHLCV history, indexed by timestamp, oldest first.
+            price_dtype (str, optional): The dtype of the price array, 'float64' or 'float32'.
+
+        Returns:
+            BarSeries: The compact history.
+        """
+        if frame.empty or "Close" not in frame:
+            return cls(np.empty(0, dtype="int64"), np.empty(0, dtype=price_dtype), np.empty(0, dtype="int64"))
+
+        index = pd.DatetimeIndex(frame.index)
+        tz = str(index.tz) if index.tz is not None else None
+        if tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        volume = frame["Volume"] if "Volume" in frame else pd.Series(0, index=frame.index)
+        # Copy, as a column of the frame is a view that would keep every other column alive
+        return cls(np.array(index.as_unit("ns").asi8, dtype="int64"),
+                   np.array(frame["Close"].to_numpy(), dtype=price_dtype),
+                   np.array(volume.fillna(0).to_numpy(), dtype="int64"), tz)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __reduce__(self):
+        # Rebuild through __init__ so unpickled arrays are read-only too
+        return BarSeries, (self.timestamps, self.close, self.volume, self.tz)
+
+    @property
+    def empty(self):
+        """Whether the series has no bars."""
+        return len(self.timestamps) == 0
+
+    @property
+    def nbytes(self):
+        """The memory held by the arrays, in bytes."""
+        return self.timestamps.nbytes + self.close.nbytes + self.volume.nbytes
+
+    @property
+    def index(self):
+        """The bar timestamps as a DatetimeIndex in the exchange timezone."""
+        index = pd.DatetimeIndex(self.timestamps.view("M8[ns]"), name="Date")
+        return index.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else index
+
+    def __getitem__(self, column):
+        """
+        Get a column as a pandas Series sharing memory with the stored array.
+
+        Args:
+            column (str): 'Close' or 'Volume'.
+
+        Returns:
+            pandas.Series: The column, indexed by timestamp.
+
+        Raises:
+            KeyError: If the column is not stored.
+        """
+        if column == "Close":
+            values = self.close
+        elif column == "Volume":
+            values = self.volume
+        else:
+            raise KeyError(column)
+        return pd.Series(values, index=self.index, name=column, copy=False)
+
+    def __contains__(self, column):
+        return column in COLUMNS
+
+    def resample(self, rule, origin="start_day"):
+        """
+        Aggregate the bars into coarser ones in one vectorized pass.
+
+        Each new bar closes at the last close and trades the summed volume of the bars it covers;
+        periods without bars, such as nights and weekends, are dropped.
+
+        Args:
+            rule (str): A pandas offset alias, e.g. '60min' or 'W-MON'.
+            origin (str, optional): Where fixed-width bins start: 'start_day' (midnight) or 'start'
+                (the first bar), as in `pandas.Series.resample`.
+
+        Returns:
+            BarSeries: The resampled bars, labelled by the start of each bin.
+        """
+        if self.empty:
+            return self
+        options = {"label": "left", "closed": "left", "origin": origin}
+        close = self["Close"].resample(rule, **options).last()
+        volume = self["Volume"].resample(rule, **options).sum()
+        traded = close.notna()
+        return BarSeries.from_frame(pd.DataFrame({"Close": close[traded], "Volume": volume[traded]}),
+                                    self.close.dtype)
+
+    def to_frame(self):
+        """
+        Get the stored columns as a DataFrame.
+
+        Returns:
+            pandas.DataFrame: The 'Close' and 'Volume' columns.
+        """
+        return pd.DataFrame({column: self[column] for column in COLUMNS})
+
+    def __repr__(self):
+        return f"BarSeries({len(self)} bars, tz={self.tz!r})"
@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from lazy_imports import LazyModule
+from market_data import MarketDataError
+from market_hours import is_market_open, previous_close
+
+pd = LazyModule("pandas")
+
+logger = logging.getLogger(__name__)
+
+PERIOD_UNITS = {
+    "d": "days",
+    "wk": "weeks",
+    "mo": "months",
+    "y": "years",
+}
+
+
+def period_start(period, now=None):
+    """
+    Get the first timestamp covered by a yfinance period string.
+
+    Args:
+        period (str): A yfinance period such as '5d', '1mo', '1y', 'ytd' or 'max'.
+        now (pandas.Timestamp, optional): The reference time (default is the current time).
+
+    Returns:
+        pandas.Timestamp: The start of the period in UTC, or None for 'max'.
+
+    Raises:
+        ValueError: If the period is not recognized.
+    """
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    for suffix, unit in PERIOD_UNITS.items():
+        amount = period[:-len(suffix)]
+        if period.endswith(suffix) and amount.isdigit():
+            return now - pd.DateOffset(**{unit: int(amount)})
+    raise ValueError(f"Unknown period '{period}'.")
+
+
+class BarStore:
+    """
+    Persistent on-disk store of price histories, one Parquet file per ticker and interval.
+
+    A read serves the requested period from the stored bars and only asks upstream for the bars
+    after the last stored one, so restarts and cold starts do not refetch whole histories. Files are
+    read through a memory map and periods are cut from the Arrow table with zero-copy slices.
+    Each file records how far back it reaches; a request for an older period fetches the full
+    period once and replaces the file. In offline mode nothing is fetched, which allows replaying
+    recorded histories.
+    """
+
+    def __init__(self, root, fetch_period, fetch_since, offline=False):
+        """
+        Args:
+            root (str): The directory holding the Parquet files.
+            fetch_period (Callable[[str, str, str], pandas.DataFrame]): Fetches (ticker, period,
+                interval) from upstream.
+            fetch_since (Callable[[str, pandas.Timestamp, str], pandas.DataFrame]): Fetches the bars of
+                (ticker, start, interval) from start onwards.
+            offline (bool, optional): Serve stored bars only and never fetch (default is False).
+        """
+        self.root = root
+        self.fetch_period = fetch_period
+        self.fetch_since = fetch_since
+        self.offline = offline
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ticker, interval):
+        """
+        Get the file that stores a ticker's bars for an interval.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+
+        Returns:
+            str: The Parquet file path.
+        """
+        safe_ticker = "".join(c if c.isalnum() or c in "-." else "_" for c in ticker.upper())
+        return os.path.join(self.root, f"{safe_ticker}_{interval}.parquet")
+
+    def read(self, ticker, period='1y', interval='1d'):
+        """
+        Get a price history, fetching only what the store does not have yet.
+
+        Stored bars are served even when they are stale if the upstream cannot be reached.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str, optional): The time period to return (default is '1y').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            pandas.DataFrame: The OHLCV history for the period.
+
+        Raises:
+            MarketDataError: If the period is not stored and the upstream is unavailable.
+        """
+        path = self.path(ticker, interval)
+        start = period_start(period)
+        with self._lock(path):
+            table = self._load(path)
+            if table is None or not self._covers(table, start):
+                if self.offline:
+                    return self._slice(table, start) if table is not None else pd.DataFrame()
+                frame = self.fetch_period(ticker, period, interval)
+                if not frame.empty:
+                    self._write(path, frame, "max" if start is None else start.isoformat())
+                return frame
+
+            if not self.offline and self._is_stale(table):
+                try:
+                    table = self._append_tail(path, ticker, interval, table)
+                except MarketDataError as e:
+                    # Stale bars are more useful than an error while the upstream is down
+                    logger.warning("Serving stored bars for %s: %s", ticker, e)
+            return self._slice(table, start)
+
+    def _lock(self, path):
+        """
+        Get the lock serializing reads and writes of one file.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            threading.Lock: The lock for the file.
+        """
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _load(path):
+        """
+        Memory-map a stored file.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            pyarrow.Table: The stored bars, or None if nothing is stored.
+        """
+        import pyarrow.parquet as pq
+
+        if not os.path.exists(path):
+            return None
+        return pq.read_table(path, memory_map=True)
+
+    @staticmethod
+    def _metadata(table, key):
+        """
+        Read a string from a stored table's schema metadata.
+
+        Args:
+            table (pyarrow.Table): The stored bars.
+            key (str): The metadata key.
+
+        Returns:
+            str: The value, or None if it is missing.
+        """
+        return (table.schema.metadata or {}).get(key.encode(), b"").decode() or None
+
+    def _covers(self, table, start):
+        """
+        Check whether a stored table reaches back to the start of a requested period.
+
+        Args:
+            table (pyarrow.Table): The stored bars.
+            start (pandas.Timestamp): The start of the period, or None for 'max'.
+
+        Returns:
+            bool: True if the table can serve the period.
+        """
+        covers_from = self._metadata(table, "covers_from")
+        if covers_from is None:
+            return False
+        if covers_from == "max":
+            return True
+        return start is not None and pd.Timestamp(covers_from) <= start
+
+    def _is_stale(self, table):
+        """
+        Check whether bars may have been added upstream since a table was written.
+
+        Args:
+            table (pyarrow.Table): The stored bars.
+
+        Returns:
+            bool: True while the market is open, or if the table predates the last close.
+        """
+        fetched_at = self._metadata(table, "fetched_at")
+        if fetched_at is None or is_market_open():
+            return True
+        return datetime.fromisoformat(fetched_at) < previous_close()
+
+    def _append_tail(self, path, ticker, interval, table):
+        """
+        Fetch the bars from the last stored one onwards and merge them into the store.
+
+        The last stored bar is fetched again because it may have been written before it closed.
+
+        Args:
+            path (str): The file path.
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval.
+            table (pyarrow.Table): The stored bars.
+
+        Returns:
+            pyarrow.Table: The updated bars.
+        """
+        stored = table.to_pandas()
+        tail = self.fetch_since(ticker, stored.index[-1], interval)
+        if tail.empty:
+            return table
+        merged = pd.concat([stored[stored.index < tail.index[0]], tail])
+        return self._write(path, merged, self._metadata(table, "covers_from"))
+
+    @staticmethod
+    def _write(path, frame, covers_from):
+        """
+        Atomically replace a stored file.
+
+        Args:
+            path (str): The file path.
+            frame (pandas.DataFrame): The bars to store.
+            covers_from (str): How far back the bars reach, as an ISO timestamp or 'max'.
+
+        Returns:
+            pyarrow.Table: The stored table.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"covers_from": covers_from.encode(),
+            b"fetched_at": datetime.now(timezone.utc).isoformat().encode(),
+        })
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, temporary_path)
+        os.replace(temporary_path, path)
+        return table
+
+    @staticmethod
+    def _slice(table, start):
+        """
+        Cut the bars of a period from a stored table.
+
+        Args:
+            table (pyarrow.Table): The stored bars.
+            start (pandas.Timestamp): The start of the period, or None for everything.
+
+        Returns:
+            pandas.DataFrame: The bars from start onwards.
+        """
+        if start is not None:
+            index_name = table.schema.pandas_metadata["index_columns"][0]
+            timestamps = table.column(index_name).to_numpy()
+            offset = int(timestamps.searchsorted(start.tz_convert("UTC").tz_localize(None).to_datetime64()))
+            table = table.slice(offset)
+        return table.to_pandas(split_blocks=True)
@@ -0,0 +1,108 @@
+"""
+Import-time budget check for cold starts.
+
+Imports the application in fresh interpreters with `python -X importtime`, reports the cumulative
+import time of `main` and the slowest modules, and fails when the time exceeds the budget or when a
+heavy dependency is imported eagerly. Run from the repository root:
+
+    python -m benchmarks.bench_import --budget-ms 800
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.report import result, write_report  # noqa: E402
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+
+# Modules that must only be imported when a request needs them
+HEAVY_MODULES = ("pandas", "numpy", "yfinance", "openai", "matplotlib", "pyarrow")
+
+
+def parse_importtime(output):
+    """
+    Parse the report written by `python -X importtime`.
+
+    Args:
+        output (str): The interpreter's stderr.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Maps each module to its self and cumulative import time in
+            microseconds.
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module="main"):
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module (str, optional): The module to import (default is 'main').
+
+    Returns:
+        Tuple[Dict[str, Tuple[int, int]], List[str]]: The parsed import times and the heavy modules
+            that were imported.
+    """
+    code = (f"import json, sys, {module}; "
+            f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True,
+                             text=True, check=True)
+    return parse_importtime(process.stderr), json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run(repeat=5, top=10):
+    """
+    Measure the cold import of the application.
+
+    Args:
+        repeat (int, optional): Number of fresh interpreters; the fastest run is reported.
+        top (int, optional): Number of slowest modules to report.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    runs = [measure() for _ in range(repeat)]
+    times, eager = min(runs, key=lambda run: run[0]["main"][1])
+    results = [
+        result("import_main", "cumulative_time", times["main"][1] / 1000, "ms"),
+        result("import_main", "eager_heavy_modules", len(eager), "count", modules=eager),
+    ]
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    results += [result("import_module", "self_time", self_us / 1000, "ms", module=name)
+                for name, (self_us, _) in slowest]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    write_report("import", results, args.output)
+
+    import_ms = results[0]["value"]
+    eager = results[1]["labels"]["modules"]
+    if import_ms > args.budget_ms:
+        sys.exit(f"Importing main took {import_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget.")
+    if eager:
+        sys.exit(f"Heavy modules imported at startup: {', '.join(eager)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmarks for the stock functions over 1y, 5y and max histories.
+
+Each calculate_* function is timed with a warm history cache, which is what a repeated chat question
+costs, next to a full vectorized recompute of the same indicator. The incremental indicator states
+are also checked against the full recompute, both on a whole history and after bars are appended.
+Run from the repository root:
+
+    python -m benchmarks.bench_indicators
+"""
+import argparse
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import PERIOD_BARS, install_fake_yfinance, synthetic_history  # noqa: E402
+from benchmarks.report import result, write_report  # noqa: E402
+
+PERIODS = ("1y", "5y", "max")
+
+FUNCTIONS = ("get_stock_price", "calculate_sma", "calculate_ema", "calculate_rsi", "calculate_macd")
+
+FUNCTION_INDICATORS = {
+    "calculate_sma": "sma",
+    "calculate_ema": "ema",
+    "calculate_rsi": "rsi",
+    "calculate_macd": "macd",
+}
+
+TICKER = "BENCH"
+
+
+def bench(func, repeat=5, number=200):
+    """
+    Time a callable.
+
+    Args:
+        func (Callable[[], Any]): The code to time.
+        repeat (int, optional): Number of timing runs; the fastest is reported.
+        number (int, optional): Calls per run.
+
+    Returns:
+        float: Microseconds per call.
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1e6
+
+
+def check_equivalence(period, appended=5):
+    """
+    Compare the incremental indicator states with a full recompute.
+
+    Args:
+        period (str): The period of the synthetic history.
+        appended (int, optional): Bars held back and then appended one at a time.
+
+    Returns:
+        float: The largest relative difference over all indicators and checkpoints.
+    """
+    from indicator_state import IndicatorStateStore
+    from indicators import compute_indicators
+
+    close = synthetic_history(TICKER, PERIOD_BARS[period])["Close"]
+    store = IndicatorStateStore()
+    worst = 0.0
+    for end in range(len(close) - appended, len(close) + 1):
+        incremental = store.latest(TICKER, period, close.iloc[:end])
+        full = compute_indicators(close.iloc[:end])
+        for name, expected in full.items():
+            actual = incremental[name]
+            if math.isnan(expected) and math.isnan(actual):
+                continue
+            worst = max(worst, abs(actual - expected) / max(abs(expected), 1e-12))
+    return worst
+
+
+def run(periods=PERIODS, repeat=5, number=200):
+    """
+    Run the stock function micro-benchmarks.
+
+    Args:
+        periods (Iterable[str], optional): History periods to benchmark.
+        repeat (int, optional): Number of timing runs; the fastest is reported.
+        number (int, optional): Calls per run.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    install_fake_yfinance()
+    import stock_functions
+    from history_cache import get_history
+    from indicators import compute_indicators
+
+    results = []
+    for period in periods:
+        close = get_history(TICKER, period)["Close"]
+        labels = {"period": period, "bars": len(close)}
+        for name in FUNCTIONS:
+            func = getattr(stock_functions, name)
+            func(TICKER, period)
+            results.append(result(name, "warm_call", bench(lambda: func(TICKER, period), repeat, number),
+                                  "us", **labels))
+            if name in FUNCTION_INDICATORS:
+                indicators = (FUNCTION_INDICATORS[name],)
+                results.append(result(name, "full_recompute",
+                                      bench(lambda: compute_indicators(close, indicators), repeat, number),
+                                      "us", **labels))
+        results.append(result("compute_indicators", "full_recompute_all",
+                              bench(lambda: compute_indicators(close), repeat, number), "us", **labels))
+        results.append(result("indicator_state", "max_relative_error", check_equivalence(period), "ratio",
+                              **labels))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--periods", nargs="+", default=list(PERIODS), choices=sorted(PERIOD_BARS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+    write_report("indicators", run(args.periods, args.repeat, args.number), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for per-request prompt parsing.
+
+Compares the single-pass intent router with the previous approach of rebuilding a dict of patterns
+and scanning the lowercased prompt repeatedly. Run from the repository root:
+
+    python -m benchmarks.bench_intent_router
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.report import result, write_report  # noqa: E402
+from intent_router import parse_intent  # noqa: E402
+
+PROMPTS = [
+    "What is the current price?",
+    "What's the RSI 21-day for AAPL?",
+    "Show me the 50 day SMA over 5 years",
+    "macd 12/26/9 for the last 6 months",
+    "Is the RSI of TSLA better than MSFT and $NVDA?",
+    "Should I buy or sell?",
+    "What is the trading volume?",
+    "Tell me something about this company",
+]
+
+LEGACY_PATTERNS = {
+    "get_stock_price": r"price|current price|stock price|price of",
+    "get_stock_volume": r"volume|stock volume|trading volume|number of shares traded",
+    "calculate_sma": r"SMA|simple moving average",
+    "calculate_ema": r"EMA|exponential moving average",
+    "calculate_rsi": r"RSI|relative strength index",
+    "calculate_macd": r"MACD|moving average convergence divergence"
+}
+
+
+def legacy_find_matching_function(prompt):
+    """
+    Find the matching stock function the way main.py did before the intent router.
+
+    Args:
+        prompt (str): The user's message.
+
+    Returns:
+        str: The name of the matching stock function.
+    """
+    patterns = dict(LEGACY_PATTERNS)
+    for func_name, pattern in patterns.items():
+        if re.search(pattern, prompt, re.IGNORECASE):
+            return func_name
+    return None
+
+
+def legacy_route(prompt):
+    """
+    Route a prompt the way main.py did before the intent router: handle_user_input's substring
+    checks, find_matching_function, then the same scan again in get_function_context.
+
+    Args:
+        prompt (str): The user's message.
+
+    Returns:
+        Tuple[str, str]: The matched action or function and its context key.
+    """
+    prompt_lower = prompt.lower()
+    if "exit" in prompt_lower:
+        return "exit", None
+    if "change stock" in prompt_lower:
+        return "change_stock", None
+    if any(word in prompt_lower for word in ["buy", "sell"]):
+        return "trade", None
+    if "better than" in prompt_lower or "worse than" in prompt_lower:
+        other_stock = next((stock for stock in ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN"]
+                            if stock.lower() in prompt_lower), None)
+        indicator = next((name for name in ("rsi", "sma", "ema", "macd") if name in prompt_lower), None)
+        return "compare", (other_stock, indicator)
+
+    function_name = legacy_find_matching_function(prompt)
+    context = None
+    if legacy_find_matching_function(prompt) is not None:
+        context = next((name for name in ("sma", "ema", "rsi", "macd", "price", "volume") if name in prompt_lower),
+                       None)
+    return function_name, context
+
+
+def bench(func, repeat=5, number=2000):
+    """
+    Time a parser over all sample prompts.
+
+    Args:
+        func (Callable[[str], Any]): The parser.
+        repeat (int, optional): Number of timing runs; the fastest is reported.
+        number (int, optional): Passes over the sample prompts per run.
+
+    Returns:
+        float: Microseconds per parsed prompt.
+    """
+    best = min(timeit.repeat(lambda: [func(prompt) for prompt in PROMPTS], repeat=repeat, number=number))
+    return best / (number * len(PROMPTS)) * 1e6
+
+
+def run(repeat=5, number=2000):
+    """
+    Run the intent router micro-benchmark.
+
+    Args:
+        repeat (int, optional): Number of timing runs; the fastest is reported.
+        number (int, optional): Passes over the sample prompts per run.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    labels = {"prompts": len(PROMPTS)}
+    return [
+        result("intent_router", "parse", bench(parse_intent, repeat, number), "us", **labels),
+        result("legacy_router", "parse", bench(legacy_route, repeat, number), "us", **labels),
+    ]
+
+
+def main():
+    write_report("intent_router", run())
+
+
+if __name__ == "__main__":
+    main()
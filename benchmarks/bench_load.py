@@ -0,0 +1,175 @@
+"""
+Load test for the /stock-info/ endpoint.
+
+Starts the application with uvicorn on a local port, backed by the fake yfinance provider and a
+mock OpenAI server, and measures latency percentiles and throughput at several concurrency levels.
+Nothing touches the network. Run from the repository root:
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import MockOpenAIServer, install_fake_yfinance  # noqa: E402
+from benchmarks.report import percentile, result, write_report  # noqa: E402
+
+CONCURRENCY_LEVELS = (1, 8, 32, 64)
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN", "NVDA", "META", "NFLX"]
+
+PROMPTS = [
+    "What is the current price?",
+    "What's the RSI 21-day?",
+    "Show me the 50 day SMA",
+    "What is the EMA?",
+    "macd 12/26/9",
+    "What is the trading volume?",
+]
+
+
+def free_port():
+    """
+    Find a free local TCP port.
+
+    Returns:
+        int: The port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port):
+    """
+    Serve the application with uvicorn in a background thread.
+
+    Args:
+        port (int): The local port to listen on.
+
+    Returns:
+        uvicorn.Server: The running server; set `should_exit` to stop it.
+    """
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def drive(base_url, concurrency, requests):
+    """
+    Send requests to /stock-info/ from concurrent clients.
+
+    Args:
+        base_url (str): The application's base URL.
+        concurrency (int): Number of clients sending requests at the same time.
+        requests (int): Total number of requests.
+
+    Returns:
+        Tuple[List[float], int, float]: Latencies of successful requests in milliseconds, the number of
+            failed requests and the wall time in seconds.
+    """
+    import httpx
+
+    payloads = [{"selected_stock": ticker, "user_input": prompt} for ticker in TICKERS for prompt in PROMPTS]
+    latencies = []
+    errors = 0
+    sent = 0
+
+    async def client(http):
+        nonlocal errors, sent
+        while sent < requests:
+            payload = payloads[sent % len(payloads)]
+            sent += 1
+            started = time.perf_counter()
+            try:
+                response = await http.post("/stock-info/", json=payload)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def run(concurrency_levels=CONCURRENCY_LEVELS, requests=200, yfinance_latency=0.05, llm_latency=0.3,
+        llm_cache=False):
+    """
+    Run the /stock-info/ load test.
+
+    Args:
+        concurrency_levels (Iterable[int], optional): Numbers of concurrent clients to test.
+        requests (int, optional): Requests sent at each concurrency level.
+        yfinance_latency (float, optional): Seconds each fake upstream history request takes.
+        llm_latency (float, optional): Seconds each mock completion takes.
+        llm_cache (bool, optional): Keep the LLM response cache on; by default every request reaches
+            the mock OpenAI server.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    yfinance = install_fake_yfinance(yfinance_latency)
+    openai_server = MockOpenAIServer(latency=llm_latency).start()
+    os.environ["OPENAI_API_BASE"] = openai_server.api_base
+    os.environ.setdefault("API_KEY", "benchmark")
+
+    import openai
+    from history_cache import history_cache
+    from llm_cache import response_cache
+
+    openai.api_base = openai_server.api_base
+    if not llm_cache:
+        response_cache.max_entries = 0
+
+    port = free_port()
+    server = start_app(port)
+    results = []
+    try:
+        for concurrency in concurrency_levels:
+            history_cache.invalidate()
+            upstream_before = yfinance.requests
+            latencies, errors, elapsed = asyncio.run(drive(f"http://127.0.0.1:{port}", concurrency, requests))
+            labels = {"endpoint": "/stock-info/", "concurrency": concurrency, "requests": requests}
+            for q in (50, 95, 99):
+                results.append(result("stock_info", f"p{q}_latency", percentile(latencies, q), "ms", **labels))
+            results.append(result("stock_info", "throughput", len(latencies) / elapsed, "req/s", **labels))
+            results.append(result("stock_info", "errors", errors, "count", **labels))
+            results.append(result("stock_info", "upstream_fetches", yfinance.requests - upstream_before, "count",
+                                  **labels))
+    finally:
+        server.should_exit = True
+        openai_server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=list(CONCURRENCY_LEVELS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument("--yfinance-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled.")
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+    write_report("load", run(args.concurrency, args.requests, args.yfinance_latency, args.llm_latency,
+                             args.llm_cache), args.output)
+
+
+if __name__ == "__main__":
+    main()
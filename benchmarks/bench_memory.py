@@ -0,0 +1,117 @@
+"""
+Memory benchmark for cached price histories.
+
+Fills a cache with 1k and 10k tickers' histories, once as the pandas DataFrames returned by
+yfinance and once as compact BarSeries, and reports the memory each takes as measured by
+tracemalloc. Every ticker gets its own deep copy of one synthetic history, so the entries share no
+memory, just as separately fetched histories would not. Run from the repository root:
+
+    python -m benchmarks.bench_memory --tickers 1000 10000 --period 1y
+"""
+import argparse
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import PERIOD_BARS, synthetic_history  # noqa: E402
+from benchmarks.report import result, write_report  # noqa: E402
+
+TICKER_COUNTS = (1000, 10000)
+
+
+def fresh_copy(frame):
+    """
+    Copy a history, including its index, as if it had been fetched separately.
+
+    Args:
+        frame (pandas.DataFrame): The history to copy.
+
+    Returns:
+        pandas.DataFrame: The copy.
+    """
+    copy = frame.copy(deep=True)
+    copy.index = frame.index.copy(deep=True)
+    return copy
+
+
+def measure(count, template, build):
+    """
+    Measure the memory held by a cache of histories.
+
+    Args:
+        count (int): Number of tickers to cache.
+        template (pandas.DataFrame): The yfinance-style history every ticker gets a copy of.
+        build (Callable[[pandas.DataFrame], Any]): Turns a fetched frame into the cached value.
+
+    Returns:
+        int: The bytes still allocated once the cache is filled.
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    cache = {}
+    for number in range(count):
+        cache[f"T{number:05d}"] = build(fresh_copy(template))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del cache
+    return used
+
+
+def run(counts=TICKER_COUNTS, period="1y"):
+    """
+    Run the memory benchmark.
+
+    Args:
+        counts (Iterable[int], optional): Numbers of cached tickers.
+        period (str, optional): The period of each history, which sets its number of bars.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    import numpy as np
+
+    from bar_series import BarSeries
+
+    template = synthetic_history("BENCH", PERIOD_BARS[period])
+    layouts = {
+        "dataframe": lambda frame: frame,
+        "bar_series_float64": lambda frame: BarSeries.from_frame(frame, "float64"),
+        "bar_series_float32": lambda frame: BarSeries.from_frame(frame, "float32"),
+    }
+
+    results = []
+    for count in counts:
+        labels = {"tickers": count, "period": period, "bars": len(template)}
+        used = {name: measure(count, template, build) for name, build in layouts.items()}
+        for name, size in used.items():
+            results.append(result(name, "cache_memory", size / 2 ** 20, "MiB", **labels))
+            results.append(result(name, "bytes_per_ticker", size / count, "bytes", **labels))
+            results.append(result(name, "memory_ratio_to_dataframe", size / used["dataframe"], "ratio", **labels))
+
+    sample = BarSeries.from_frame(template)
+    results.append(result("bar_series", "close_view_zero_copy",
+                          np.shares_memory(sample["Close"].to_numpy(), sample.close), "bool", period=period))
+    timer = timeit.Timer(lambda: sample["Close"])
+    loops = 1000
+    results.append(result("bar_series", "close_view", min(timer.repeat(5, loops)) / loops * 1e6, "us",
+                          period=period))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickers", nargs="+", type=int, default=list(TICKER_COUNTS))
+    parser.add_argument("--period", default="1y", choices=sorted(PERIOD_BARS))
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+    write_report("memory", run(args.tickers, args.period), args.output)
+
+
+if __name__ == "__main__":
+    main()
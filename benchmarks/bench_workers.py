@@ -0,0 +1,150 @@
+"""
+Throughput of /stock-info/ served by one and by several worker processes.
+
+Runs the application with `uvicorn --workers N` for each worker count, with every worker backed by
+the fake yfinance provider and sharing one mock OpenAI server and one shared cache server, then
+drives it with the `bench_load` clients. Nothing touches the network. Run from the repository root:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_load import drive, free_port  # noqa: E402
+from benchmarks.fakes import MockOpenAIServer, install_fake_yfinance  # noqa: E402
+from benchmarks.report import percentile, result, write_report  # noqa: E402
+
+WORKER_COUNTS = (1, 2, 4)
+STARTUP_TIMEOUT = 60
+
+
+def create_app():
+    """
+    Build the application inside a worker process, for `uvicorn --factory`.
+
+    Returns:
+        fastapi.FastAPI: The application, backed by the fake yfinance provider and the mock OpenAI
+            server at OPENAI_API_BASE.
+    """
+    install_fake_yfinance(float(os.getenv("BENCH_YFINANCE_LATENCY", "0")))
+    import openai
+    from llm_cache import response_cache
+    from main import app
+
+    openai.api_base = os.environ["OPENAI_API_BASE"]
+    response_cache.max_entries = 0
+    return app
+
+
+def start_workers(port, workers, env):
+    """
+    Start the application with uvicorn worker processes and wait until it answers.
+
+    Args:
+        port (int): The local port to listen on.
+        workers (int): The number of worker processes.
+        env (dict): The environment of the workers.
+
+    Returns:
+        subprocess.Popen: The uvicorn parent process.
+
+    Raises:
+        RuntimeError: If the application does not start in time.
+    """
+    import httpx
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.bench_workers:create_app", "--factory", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            # Every worker must be up, so wait for as many answers as there are workers
+            for _ in range(workers * 2):
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=5).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"The application did not start with {workers} workers.")
+
+
+def run(worker_counts=WORKER_COUNTS, concurrency=32, requests=200, yfinance_latency=0.05, llm_latency=0.05):
+    """
+    Run the worker count comparison.
+
+    Args:
+        worker_counts (Iterable[int], optional): Numbers of worker processes to test.
+        concurrency (int, optional): Number of clients sending requests at the same time.
+        requests (int, optional): Requests sent for each worker count.
+        yfinance_latency (float, optional): Seconds each fake upstream history request takes.
+        llm_latency (float, optional): Seconds each mock completion takes.
+
+    Returns:
+        List[dict]: The benchmark results.
+    """
+    from shared_cache import SharedCache, start_server
+
+    openai_server = MockOpenAIServer(latency=llm_latency).start()
+    socket_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    authkey = secrets.token_bytes(32).hex()
+    results = []
+    try:
+        for workers in worker_counts:
+            # A fresh cache server per run, so every worker count starts cold
+            address = os.path.join(socket_dir, f"cache-{workers}.sock")
+            cache_server = start_server(address, authkey)
+            env = dict(os.environ, SHARED_CACHE_ADDRESS=address, SHARED_CACHE_AUTHKEY=authkey,
+                       OPENAI_API_BASE=openai_server.api_base, BENCH_YFINANCE_LATENCY=str(yfinance_latency),
+                       BAR_STORE_ENABLED="0", PREFETCH_ENABLED="0")
+            env.setdefault("API_KEY", "benchmark")
+            port = free_port()
+            process = start_workers(port, workers, env)
+            try:
+                latencies, errors, elapsed = asyncio.run(drive(f"http://127.0.0.1:{port}", concurrency, requests))
+                store = SharedCache(address, authkey).store.stats()
+            finally:
+                process.terminate()
+                process.wait()
+                cache_server.shutdown()
+
+            labels = {"endpoint": "/stock-info/", "workers": workers, "concurrency": concurrency,
+                      "requests": requests}
+            for q in (50, 95, 99):
+                results.append(result("workers", f"p{q}_latency", percentile(latencies, q), "ms", **labels))
+            results.append(result("workers", "throughput", len(latencies) / elapsed, "req/s", **labels))
+            results.append(result("workers", "errors", errors, "count", **labels))
+            results.append(result("workers", "shared_cache_hits", store["hits"], "count", **labels))
+            results.append(result("workers", "shared_cache_misses", store["misses"], "count", **labels))
+    finally:
+        openai_server.stop()
+        for name in os.listdir(socket_dir):
+            os.unlink(os.path.join(socket_dir, name))
+        os.rmdir(socket_dir)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", nargs="+", type=int, default=list(WORKER_COUNTS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per worker count.")
+    parser.add_argument("--yfinance-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+    write_report("workers", run(args.workers, args.concurrency, args.requests, args.yfinance_latency,
+                                args.llm_latency), args.output)
+
+
+if __name__ == "__main__":
+    main()
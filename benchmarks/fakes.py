@@ -0,0 +1,243 @@
+"""
+Offline stand-ins for yfinance and the OpenAI API used by the benchmark suite.
+
+The application loads yfinance lazily, on the first market data request, so the fake only has to be
+in place before then. `install_fake_yfinance` should still run before any application module is
+imported, because it also sets the environment that turns off the bar store and the prefetcher,
+which those modules read at import time.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+PERIOD_BARS = {
+    "1d": 1,
+    "5d": 5,
+    "1mo": 21,
+    "3mo": 63,
+    "6mo": 126,
+    "ytd": 200,
+    "1y": 252,
+    "2y": 504,
+    "5y": 1260,
+    "10y": 2520,
+    "max": 10080,
+}
+
+
+def synthetic_history(ticker, bars, end=None):
+    """
+    Generate a deterministic daily OHLCV history for a ticker.
+
+    Prices follow a geometric random walk seeded from the ticker symbol, so the same ticker always
+    produces the same series.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        bars (int): Number of daily bars.
+        end (pandas.Timestamp, optional): The last bar's date (default is today).
+
+    Returns:
+        pandas.DataFrame: The OHLCV history, indexed by New York dates, oldest first.
+    """
+    end = pd.Timestamp.now(tz="America/New_York").normalize() if end is None else end
+    index = pd.bdate_range(end=end, periods=bars, tz="America/New_York", name="Date")
+    rng = np.random.default_rng(zlib.crc32(ticker.upper().encode()))
+    returns = rng.normal(0.0003, 0.02, bars)
+    close = 50 + 150 * rng.random() * np.exp(np.cumsum(returns))
+    spread = np.abs(rng.normal(0, 0.01, bars)) * close
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.005, bars)),
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, bars).astype("int64"),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=index)
+
+
+class FakeYFinance:
+    """
+    A stand-in for the parts of the yfinance module the application uses.
+
+    Every call sleeps for a configurable latency to simulate the network, and calls are counted.
+    """
+
+    def __init__(self, latency=0.0):
+        """
+        Args:
+            latency (float, optional): Seconds each upstream request takes (default is 0).
+        """
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        """Count an upstream request and wait for the simulated latency."""
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def Ticker(self, ticker, session=None):
+        """Get a fake yfinance.Ticker for a symbol."""
+        return FakeTicker(self, ticker)
+
+
+class FakeTicker:
+    """
+    A stand-in for yfinance.Ticker.
+    """
+
+    def __init__(self, provider, ticker):
+        self.provider = provider
+        self.ticker = ticker
+
+    def history(self, period='1mo', interval='1d', start=None, **kwargs):
+        """
+        Get a synthetic history.
+
+        Args:
+            period (str, optional): The time period to fetch (default is '1mo').
+            interval (str, optional): The bar interval (default is '1d').
+            start (pandas.Timestamp, optional): Only return bars from this date onwards.
+
+        Returns:
+            pandas.DataFrame: The OHLCV history.
+        """
+        self.provider._request()
+        frame = synthetic_history(self.ticker, PERIOD_BARS.get(period, PERIOD_BARS["max"]))
+        if start is not None:
+            frame = frame[frame.index >= pd.Timestamp(start)]
+        return frame
+
+
+def install_fake_yfinance(latency=0.0):
+    """
+    Replace the yfinance module with an offline fake and turn off the app's disk and background I/O.
+
+    Calling it again only updates the latency of the installed fake.
+
+    Args:
+        latency (float, optional): Seconds each upstream request takes (default is 0).
+
+    Returns:
+        FakeYFinance: The installed fake, whose `requests` attribute counts upstream calls.
+    """
+    installed = getattr(sys.modules.get("yfinance"), "fake", None)
+    if isinstance(installed, FakeYFinance):
+        installed.latency = latency
+        return installed
+
+    os.environ.setdefault("BAR_STORE_ENABLED", "0")
+    os.environ.setdefault("PREFETCH_ENABLED", "0")
+    fake = FakeYFinance(latency)
+    module = types.ModuleType("yfinance")
+    module.Ticker = fake.Ticker
+    module.fake = fake
+    sys.modules["yfinance"] = module
+    return fake
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Several app workers connect at once, beyond the default listen backlog of 5
+    request_queue_size = 128
+
+
+class MockOpenAIServer:
+    """
+    A local HTTP server that answers OpenAI chat completion requests after a configurable delay.
+
+    Both plain and streamed (`stream: true`) completions are supported. Point the OpenAI client at
+    `api_base` to use it.
+    """
+
+    def __init__(self, latency=0.3, tokens=30, host="127.0.0.1", port=0):
+        """
+        Args:
+            latency (float, optional): Seconds before a completion is returned (default is 0.3).
+            tokens (int, optional): Number of tokens in each completion (default is 30).
+            host (str, optional): The interface to bind (default is 127.0.0.1).
+            port (int, optional): The port to bind; 0 picks a free one.
+        """
+        self.latency = latency
+        self.tokens = tokens
+        self.requests = 0
+        self._server = _HTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_base(self):
+        """The base URL to configure as the OpenAI API base."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns:
+            MockOpenAIServer: The server itself.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                time.sleep(server.latency)
+                words = [f"word{i} " for i in range(server.tokens)]
+
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    for word in words:
+                        chunk = {"object": "chat.completion.chunk",
+                                 "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.close_connection = True
+                    return
+
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words).strip()}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": server.tokens, "total_tokens": server.tokens},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
@@ -0,0 +1,85 @@
+"""
+Machine-readable benchmark results.
+
+Every benchmark returns a list of result records; `write_report` wraps them with enough metadata to
+compare runs across releases.
+"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def result(name, metric, value, unit, **labels):
+    """
+    Build one benchmark result record.
+
+    Args:
+        name (str): The benchmark or scenario name.
+        metric (str): What was measured, e.g. 'p95_latency'.
+        value (float): The measured value.
+        unit (str): The unit of the value, e.g. 'ms' or 'req/s'.
+        **labels: Extra dimensions such as period or concurrency.
+
+    Returns:
+        dict: The record.
+    """
+    return {"name": name, "metric": metric, "value": round(float(value), 6), "unit": unit, "labels": labels}
+
+
+def percentile(values, q):
+    """
+    Get a percentile of a list of values using linear interpolation.
+
+    Args:
+        values (List[float]): The samples.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or NaN for an empty list.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(suite, results, output=None):
+    """
+    Write benchmark results as JSON.
+
+    Args:
+        suite (str): The suite name.
+        results (List[dict]): Records built with `result`.
+        output (str, optional): File to write; prints to stdout when omitted.
+
+    Returns:
+        dict: The report.
+    """
+    report = {
+        "suite": suite,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
@@ -0,0 +1,41 @@
+"""
+Run the whole benchmark suite and write one JSON report.
+
+Run from the repository root:
+
+    python -m benchmarks.run_all --output benchmark-results.json
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_import, bench_indicators, bench_intent_router, bench_load, bench_memory  # noqa: E402
+from benchmarks.fakes import install_fake_yfinance  # noqa: E402
+from benchmarks.report import write_report  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true",
+                        help="Fewer timing runs and requests, for a fast smoke check.")
+    parser.add_argument("--skip-load", action="store_true", help="Skip the HTTP load test.")
+    parser.add_argument("--output", help="Write the JSON report to a file instead of stdout.")
+    args = parser.parse_args()
+
+    # Before any application module is imported, as it also sets the environment they read at import time
+    install_fake_yfinance()
+    repeat, number, requests = (2, 20, 50) if args.quick else (5, 200, 200)
+
+    results = bench_import.run(repeat)
+    results += bench_intent_router.run(repeat, number * 10)
+    results += bench_indicators.run(repeat=repeat, number=number)
+    results += bench_memory.run((1000,) if args.quick else bench_memory.TICKER_COUNTS)
+    if not args.skip_load:
+        results += bench_load.run(requests=requests)
+    write_report("all", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from lazy_imports import LazyModule
+
+np = LazyModule("numpy")
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+
+CHART_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+CHART_OVERLAYS = ("sma", "ema", "macd")
+
+# Indicator series each overlay draws; the MACD panel needs the line and signal besides the histogram
+OVERLAY_SERIES = {
+    "sma": ("sma",),
+    "ema": ("ema",),
+    "macd": ("macd_line", "macd_signal", "macd"),
+}
+
+MIN_WIDTH, MAX_WIDTH = 200, 2000
+MIN_HEIGHT, MAX_HEIGHT = 150, 1500
+DPI = 100
+
+
+class ChartData:
+    """
+    The series a chart is drawn from, and the identity of the image they produce.
+
+    Attributes:
+        ticker (str): The normalized ticker symbol.
+        period (str): The time period shown.
+        overlays (Tuple[str, ...]): The requested overlays, in canonical order.
+        dates (numpy.ndarray): The bar timestamps as datetime64 values.
+        close (numpy.ndarray): The closing prices.
+        series (Dict[str, numpy.ndarray]): The indicator series needed by the overlays.
+        interval (str): The bar interval.
+    """
+
+    __slots__ = ("ticker", "period", "overlays", "dates", "close", "series", "interval")
+
+    def __init__(self, ticker, period, overlays, dates, close, series, interval="1d"):
+        self.ticker = ticker
+        self.period = period
+        self.overlays = overlays
+        self.dates = dates
+        self.close = close
+        self.series = series
+        self.interval = interval
+
+    def etag(self, width, height, format):
+        """
+        Build the entity tag of the image drawn from this data.
+
+        The tag changes whenever the rendering options change or a new or revised bar arrives, so it
+        doubles as the chart cache key.
+
+        Args:
+            width (int): The image width in pixels.
+            height (int): The image height in pixels.
+            format (str): 'png' or 'svg'.
+
+        Returns:
+            str: The quoted entity tag.
+        """
+        last_bar = (str(self.dates[-1]), repr(float(self.close[-1]))) if len(self.close) else ("", "")
+        identity = "|".join([self.ticker, self.period, self.interval, ",".join(self.overlays), str(width),
+                             str(height), format, str(len(self.close)), *last_bar])
+        return f'"{hashlib.sha256(identity.encode()).hexdigest()[:32]}"'
+
+
+def parse_overlays(overlays):
+    """
+    Parse a comma-separated list of chart overlays.
+
+    Args:
+        overlays (str): e.g. 'sma,macd'; empty for none.
+
+    Returns:
+        Tuple[str, ...]: The overlays in canonical order, without duplicates.
+
+    Raises:
+        ValueError: If an overlay is not supported.
+    """
+    requested = {name.strip().lower() for name in (overlays or "").split(",") if name.strip()}
+    unknown = requested - set(CHART_OVERLAYS)
+    if unknown:
+        raise ValueError(f"Unknown overlays: {', '.join(sorted(unknown))}. Use any of: {', '.join(CHART_OVERLAYS)}.")
+    return tuple(name for name in CHART_OVERLAYS if name in requested)
+
+
+def validate_size(width, height):
+    """
+    Check that a chart size is within the supported bounds.
+
+    Args:
+        width (int): The image width in pixels.
+        height (int): The image height in pixels.
+
+    Raises:
+        ValueError: If the size is out of bounds.
+    """
+    if not (MIN_WIDTH <= width <= MAX_WIDTH and MIN_HEIGHT <= height <= MAX_HEIGHT):
+        raise ValueError(f"width must be between {MIN_WIDTH} and {MAX_WIDTH} and height between {MIN_HEIGHT} "
+                         f"and {MAX_HEIGHT}.")
+
+
+def render_chart(ticker, dates, close, series, overlays=(), width=800, height=480, format="png"):
+    """
+    Draw a price chart into an in-memory image.
+
+    Uses matplotlib's object-oriented API with its own figure and canvas, so it keeps no global
+    state and is safe to run concurrently and in worker processes. Nothing is written to disk.
+
+    Args:
+        ticker (str): The stock ticker symbol, used in the title.
+        dates (numpy.ndarray): The bar timestamps.
+        close (numpy.ndarray): The closing prices.
+        series (Dict[str, numpy.ndarray]): Precomputed indicator series for the overlays.
+        overlays (Iterable[str], optional): Any of 'sma', 'ema' and 'macd'.
+        width (int, optional): The image width in pixels (default is 800).
+        height (int, optional): The image height in pixels (default is 480).
+        format (str, optional): 'png' or 'svg' (default is 'png').
+
+    Returns:
+        bytes: The encoded image.
+    """
+    import matplotlib
+
+    # Headless rendering; matplotlib is only imported once a chart is requested
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(width / DPI, height / DPI), dpi=DPI)
+    if "macd" in overlays:
+        price_axes, macd_axes = figure.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": (3, 1)})
+    else:
+        price_axes, macd_axes = figure.subplots(), None
+
+    price_axes.plot(dates, close, label=f"{ticker} Close Price")
+    for name in ("sma", "ema"):
+        if name in overlays:
+            price_axes.plot(dates, series[name], label=name.upper(), linewidth=1)
+    price_axes.set_title(f"{ticker} Stock Price")
+    price_axes.set_ylabel("Price (USD)")
+    price_axes.legend()
+    price_axes.grid(True)
+
+    if macd_axes is not None:
+        histogram = series["macd"]
+        bar_width = np.median(np.diff(dates)) * 0.8 if len(dates) > 1 else np.timedelta64(1, "D")
+        macd_axes.bar(dates, histogram, width=bar_width, color=np.where(histogram >= 0, "tab:green", "tab:red"))
+        macd_axes.plot(dates, series["macd_line"], label="MACD", linewidth=1)
+        macd_axes.plot(dates, series["macd_signal"], label="Signal", linewidth=1)
+        macd_axes.legend(loc="upper left")
+        macd_axes.grid(True)
+    (macd_axes or price_axes).set_xlabel("Date")
+    figure.autofmt_xdate()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=format)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """
+    Size-bounded LRU cache of rendered images keyed by entity tag.
+    """
+
+    def __init__(self, max_entries=CHART_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            max_entries (int, optional): Maximum number of cached images.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, etag):
+        """
+        Get a cached image.
+
+        Args:
+            etag (str): The image's entity tag.
+
+        Returns:
+            bytes: The image, or None on a miss.
+        """
+        with self._lock:
+            image = self._entries.get(etag)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return image
+
+    def put(self, etag, image):
+        """
+        Store an image, evicting the least recently used ones beyond the size bound.
+
+        Args:
+            etag (str): The image's entity tag.
+            image (bytes): The encoded image.
+        """
+        with self._lock:
+            self._entries.pop(etag, None)
+            self._entries[etag] = image
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and bytes in use.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": sum(len(image) for image in self._entries.values()),
+            }
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,633 @@
+import functools
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from bar_series import BarSeries
+from bar_store import BarStore
+from intervals import INTERVAL_RULES, can_resample, interval_rank, is_intraday, normalize_interval, \
+    source_interval, validate_period
+from market_data import market_data
+from market_hours import is_market_open, seconds_until_open
+from metrics import metrics
+from shared_cache import shared_cache
+
+DEFAULT_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_TTL_OPEN = float(os.getenv("HISTORY_CACHE_TTL_OPEN", "60"))
+DEFAULT_TTL_CLOSED = float(os.getenv("HISTORY_CACHE_TTL_CLOSED", "3600"))
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", os.path.join(tempfile.gettempdir(), "stock-bar-store"))
+BAR_STORE_ENABLED = os.getenv("BAR_STORE_ENABLED", "1") == "1"
+BAR_STORE_OFFLINE = os.getenv("BAR_STORE_OFFLINE", "0") == "1"
+
+FETCH_SECONDS = metrics.histogram("history_fetch_seconds", "Time spent fetching price histories on cache misses.",
+                                  ("mode",))
+FETCHED_TICKERS = metrics.counter("history_fetched_tickers_total", "Price histories fetched on cache misses.",
+                                  ("ticker",))
+
+
+def _fetch_history(ticker, period, interval):
+    """
+    Download price history from yfinance.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str): The time period to fetch (e.g. '1y', 'max').
+        interval (str): The bar interval (e.g. '1d').
+
+    Returns:
+        pandas.DataFrame: The OHLCV history returned by yfinance.
+
+    Raises:
+        MarketDataError: If the upstream is unavailable or rate limiting.
+    """
+    return market_data.history(ticker, period=period, interval=interval)
+
+
+def _fetch_history_since(ticker, start, interval):
+    """
+    Download the price history from a given timestamp onwards from yfinance.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        start (pandas.Timestamp): The first bar to fetch.
+        interval (str): The bar interval (e.g. '1d').
+
+    Returns:
+        pandas.DataFrame: The OHLCV history returned by yfinance.
+
+    Raises:
+        MarketDataError: If the upstream is unavailable or rate limiting.
+    """
+    return market_data.history(ticker, interval=interval, start=start)
+
+
+def _fetch_histories(tickers, period, interval):
+    """
+    Download the price histories of several tickers in one batched yfinance call.
+
+    Args:
+        tickers (List[str]): The stock ticker symbols.
+        period (str): The time period to fetch (e.g. '1y', 'max').
+        interval (str): The bar interval (e.g. '1d').
+
+    Returns:
+        dict: Maps each ticker to its OHLCV history; tickers without data map to empty frames.
+
+    Raises:
+        MarketDataError: If the upstream is unavailable or rate limiting.
+    """
+    frames = market_data.download(tickers, period, interval)
+    return {ticker: frame.dropna(how='all') for ticker, frame in frames.items()}
+
+
+def _shared_key(key):
+    """Get the shared cache key of a (ticker, period, interval) key."""
+    return "history:" + "|".join(key)
+
+
+class _Call:
+    """
+    An in-flight call shared by every caller asking for the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is running wait for it
+    and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """
+        Run a function once for all concurrent callers with the same key.
+
+        Args:
+            key (Hashable): Identifies the call to share.
+            func (Callable[[], Any]): The function to run if no call for the key is in flight.
+
+        Returns:
+            Any: The function's return value.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Get the coalescing counters.
+
+        Returns:
+            dict: The number of executions, coalesced calls and calls currently in flight.
+        """
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class HistoryCache:
+    """
+    In-process cache of price histories keyed by (ticker, period, interval).
+
+    Only the finest interval asked for is fetched upstream: daily and coarser bars are resampled from
+    daily bars, and coarser intraday bars from finer ones already cached for the same period. Derived
+    entries expire together with the bars they were built from.
+
+    With a shared cache tier, histories fetched by one worker process are published there and
+    loaded from it by the others before they fetch upstream themselves.
+
+    Entries expire after a TTL that is short while the market is open and stretches to the next
+    open while it is closed. Total memory is bounded and the least recently used entries are
+    evicted first. Histories are stored as compact, read-only BarSeries shared between callers.
+    """
+
+    def __init__(self, fetcher=_fetch_history, batch_fetcher=_fetch_histories, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl_open=DEFAULT_TTL_OPEN, ttl_closed=DEFAULT_TTL_CLOSED, clock=time.monotonic, shared=None):
+        """
+        Args:
+            fetcher (Callable[[str, str, str], pandas.DataFrame], optional): Loads a history on a miss.
+            batch_fetcher (Callable[[List[str], str, str], dict], optional): Loads the histories of
+                several tickers in one request.
+            max_bytes (int, optional): The memory budget for all cached histories.
+            ttl_open (float, optional): Entry lifetime in seconds during market hours.
+            ttl_closed (float, optional): Maximum entry lifetime in seconds outside market hours.
+            clock (Callable[[], float], optional): Monotonic clock used for expiry.
+            shared (SharedCache, optional): The cache tier shared with other worker processes.
+        """
+        self.fetcher = fetcher
+        self.batch_fetcher = batch_fetcher
+        self.max_bytes = max_bytes
+        self.ttl_open = ttl_open
+        self.ttl_closed = ttl_closed
+        self.clock = clock
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resampled = 0
+        self.shared_hits = 0
+
+    @staticmethod
+    def make_key(ticker, period, interval):
+        """
+        Build the normalized cache key for a request.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str): The time period.
+            interval (str): The bar interval.
+
+        Returns:
+            Tuple[str, str, str]: The (ticker, period, interval) key.
+
+        Raises:
+            ValueError: If the interval is not supported.
+        """
+        return ticker.strip().upper(), period, normalize_interval(interval)
+
+    def ttl(self):
+        """
+        Get the lifetime for an entry stored now.
+
+        Returns:
+            float: The TTL in seconds.
+        """
+        if is_market_open():
+            return self.ttl_open
+        return max(self.ttl_open, min(self.ttl_closed, seconds_until_open()))
+
+    def get(self, ticker, period='1y', interval='1d'):
+        """
+        Get a price history, fetching it on a miss or after expiry.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str, optional): The time period to fetch (default is '1y').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            BarSeries: The price history.
+
+        Raises:
+            ValueError: If the interval is not supported or not available over the period.
+        """
+        key = self.make_key(ticker, period, interval)
+        bars = self.lookup(key)
+        if bars is not None:
+            return bars
+
+        return self._flight.do(key, functools.partial(self._load, key))
+
+    def get_intervals(self, ticker, period, intervals):
+        """
+        Get a price history at several intervals, fetching only the finest one when the others can be
+        built from it.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str): The time period to fetch.
+            intervals (Iterable[str]): The bar intervals.
+
+        Returns:
+            dict: Maps each canonical interval to its BarSeries, finest first.
+
+        Raises:
+            ValueError: If an interval is not supported or not available over the period.
+        """
+        intervals = sorted({normalize_interval(interval) for interval in intervals}, key=interval_rank)
+        return {interval: self.get(ticker, period, interval) for interval in intervals}
+
+    def get_many(self, tickers, period='1y', interval='1d'):
+        """
+        Get the price histories of several tickers, fetching all misses in one batched request.
+
+        Args:
+            tickers (Iterable[str]): The stock ticker symbols.
+            period (str, optional): The time period to fetch (default is '1y').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            dict: Maps each normalized ticker to its BarSeries, in the order given.
+
+        Raises:
+            ValueError: If the interval is not supported or not available over the period.
+        """
+        keys = list(dict.fromkeys(self.make_key(ticker, period, interval) for ticker in tickers))
+        interval = keys[0][2] if keys else normalize_interval(interval)
+        histories = {key[0]: self.lookup(key) for key in keys}
+        missing = [key[0] for key in keys if histories[key[0]] is None]
+        source = source_interval(interval)
+        if missing and source != interval:
+            sources = self.get_many(missing, period, source)
+            for ticker in missing:
+                histories[ticker] = self._derive(self.make_key(ticker, period, interval),
+                                                 self.make_key(ticker, period, source), sources[ticker])
+            return histories
+        if missing:
+            validate_period(period, interval)
+            found = self._from_shared([self.make_key(ticker, period, interval) for ticker in missing])
+            histories.update((key[0], bars) for key, bars in found.items())
+            missing = [ticker for ticker in missing if histories[ticker] is None]
+        if len(missing) == 1:
+            histories[missing[0]] = self.get(missing[0], period, interval)
+        elif missing:
+            batch_key = ("batch", tuple(missing), period, interval)
+            histories.update(self._flight.do(batch_key, functools.partial(self._load_many, missing, period,
+                                                                          interval)))
+        return histories
+
+    def refresh_many(self, tickers, period='1y', interval='1d'):
+        """
+        Fetch fresh histories for several tickers and replace their cached entries.
+
+        Args:
+            tickers (Iterable[str]): The stock ticker symbols.
+            period (str, optional): The time period to fetch (default is '1y').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            dict: Maps each normalized ticker to its BarSeries.
+        """
+        symbols = list(dict.fromkeys(self.make_key(ticker, period, interval)[0] for ticker in tickers))
+        if len(symbols) == 1:
+            key = self.make_key(symbols[0], period, interval)
+            bars = self._fetch(key)
+            self.put(key, bars)
+            self._to_shared({key: bars})
+            return {symbols[0]: bars}
+        if not symbols:
+            return {}
+        return self._load_many(symbols, period, interval)
+
+    def expires_in(self, ticker, period='1y', interval='1d'):
+        """
+        Get the time left before a cached entry expires, without touching the counters.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str, optional): The time period (default is '1y').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            float: Seconds until expiry, or None if the entry is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(self.make_key(ticker, period, interval))
+            return None if entry is None else entry[2] - self.clock()
+
+    def _load_many(self, tickers, period, interval):
+        """
+        Fetch and store several histories in one batched request.
+
+        Args:
+            tickers (List[str]): The normalized ticker symbols.
+            period (str): The time period to fetch.
+            interval (str): The bar interval.
+
+        Returns:
+            dict: Maps each ticker to its BarSeries.
+        """
+        with FETCH_SECONDS.time(mode="batch"):
+            frames = self.batch_fetcher(tickers, period, interval)
+        for ticker in tickers:
+            FETCHED_TICKERS.inc(ticker=metrics.ticker_label(ticker))
+        histories = {ticker: BarSeries.from_frame(frame) for ticker, frame in frames.items()}
+        for ticker, bars in histories.items():
+            self.put(self.make_key(ticker, period, interval), bars)
+        self._to_shared({self.make_key(ticker, period, interval): bars for ticker, bars in histories.items()})
+        return histories
+
+    def _load(self, key):
+        """
+        Fetch and store a history, unless a call that just finished already stored it.
+
+        Args:
+            key (Tuple[str, str, str]): The (ticker, period, interval) key.
+
+        Returns:
+            BarSeries: The price history.
+        """
+        bars = self.lookup(key, count=False)
+        if bars is not None:
+            return bars
+        ticker, period, interval = key
+        source = source_interval(interval)
+        if source != interval:
+            return self._derive(key, (ticker, period, source), self.get(ticker, period, source))
+        # Prefer the coarsest cached interval that divides this one, as it has the fewest bars
+        for finer in sorted(INTERVAL_RULES, key=interval_rank, reverse=True):
+            if can_resample(finer, interval):
+                finer_bars = self.lookup((ticker, period, finer), count=False)
+                if finer_bars is not None:
+                    return self._derive(key, (ticker, period, finer), finer_bars)
+
+        validate_period(period, interval)
+        bars = self._from_shared([key]).get(key)
+        if bars is None:
+            bars = self._fetch(key)
+            self.put(key, bars)
+            self._to_shared({key: bars})
+        return bars
+
+    def _from_shared(self, keys):
+        """
+        Load histories published by other worker processes into this cache.
+
+        Args:
+            keys (List[Tuple[str, str, str]]): The (ticker, period, interval) keys.
+
+        Returns:
+            dict: Maps each key found to its BarSeries.
+        """
+        if self.shared is None or not keys:
+            return {}
+        entries = self.shared.get_many(_shared_key(key) for key in keys)
+        found = {}
+        for key in keys:
+            entry = entries.get(_shared_key(key))
+            if entry is not None:
+                bars, ttl = entry
+                self.put(key, bars, self.clock() + ttl)
+                found[key] = bars
+        with self._lock:
+            self.shared_hits += len(found)
+        return found
+
+    def _to_shared(self, histories):
+        """
+        Publish freshly fetched histories to the other worker processes.
+
+        Args:
+            histories (dict): Maps (ticker, period, interval) keys to their BarSeries.
+        """
+        if self.shared is not None:
+            self.shared.set_many({_shared_key(key): bars for key, bars in histories.items() if not bars.empty},
+                                 self.ttl())
+
+    def _derive(self, key, source_key, source):
+        """
+        Build and store a history by resampling finer bars of the same ticker and period.
+
+        The derived entry expires with its source, so both are refreshed together. It is not stored
+        when the source is no longer cached, since nothing would then bound its age.
+
+        Args:
+            key (Tuple[str, str, str]): The (ticker, period, interval) key wanted.
+            source_key (Tuple[str, str, str]): The key of the finer bars.
+            source (BarSeries): The finer bars.
+
+        Returns:
+            BarSeries: The price history.
+        """
+        interval = key[2]
+        bars = source.resample(INTERVAL_RULES[interval], origin="start" if is_intraday(interval) else "start_day")
+        with self._lock:
+            self.resampled += 1
+            entry = self._entries.get(source_key)
+        if entry is not None and entry[0] is source and entry[2] > self.clock():
+            self.put(key, bars, entry[2])
+        return bars
+
+    def _fetch(self, key):
+        """
+        Fetch one history, recording how long it took, and convert it to a compact series.
+
+        Args:
+            key (Tuple[str, str, str]): The (ticker, period, interval) key.
+
+        Returns:
+            BarSeries: The price history.
+        """
+        FETCHED_TICKERS.inc(ticker=metrics.ticker_label(key[0]))
+        with FETCH_SECONDS.time(mode="single"):
+            frame = self.fetcher(*key)
+        return BarSeries.from_frame(frame)
+
+    def lookup(self, key, count=True):
+        """
+        Get a cached history without fetching.
+
+        Args:
+            key (Tuple[str, str, str]): The (ticker, period, interval) key.
+            count (bool, optional): Whether to update the hit and miss counters (default is True).
+
+        Returns:
+            BarSeries: The cached history, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                bars, size, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += count
+                    return bars
+                del self._entries[key]
+                self._bytes -= size
+            self.misses += count
+            return None
+
+    def put(self, key, bars, expires_at=None):
+        """
+        Store a history, evicting least recently used entries to stay within the memory budget.
+
+        Empty histories and histories larger than the whole budget are not stored.
+
+        Args:
+            key (Tuple[str, str, str]): The (ticker, period, interval) key.
+            bars (BarSeries): The history to store.
+            expires_at (float, optional): When the entry expires on the cache clock (default is a
+                full TTL from now).
+        """
+        if bars is None or bars.empty:
+            return
+        size = bars.nbytes
+        if size > self.max_bytes:
+            return
+        if expires_at is None:
+            expires_at = self.clock() + self.ttl()
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (bars, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, ticker=None):
+        """
+        Drop cached entries.
+
+        Args:
+            ticker (str, optional): Only drop entries for this ticker (default drops everything).
+        """
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            symbol = ticker.strip().upper()
+            for key in [key for key in self._entries if key[0] == symbol]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, resampled histories, histories loaded from the shared tier,
+                entry count, bytes in use and single-flight counters.
+        """
+        flight = self._flight.stats()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resampled": self.resampled,
+                "shared_hits": self.shared_hits,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "fetches": flight["executions"],
+                "coalesced": flight["coalesced"],
+                "in_flight": flight["in_flight"],
+            }
+
+
+bar_store = (BarStore(BAR_STORE_DIR, _fetch_history, _fetch_history_since, offline=BAR_STORE_OFFLINE)
+             if BAR_STORE_ENABLED else None)
+history_cache = HistoryCache(fetcher=bar_store.read if bar_store is not None else _fetch_history, shared=shared_cache)
+metrics.register_stats("history_cache", "Price history cache counters.", history_cache.stats)
+
+
+def get_history(ticker, period='1y', interval='1d'):
+    """
+    Get a price history through the shared cache.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str, optional): The time period to fetch (default is '1y').
+        interval (str, optional): The bar interval (default is '1d').
+
+    Returns:
+        BarSeries: The price history.
+    """
+    return history_cache.get(ticker, period, interval)
+
+
+def get_histories(tickers, period='1y', interval='1d'):
+    """
+    Get the price histories of several tickers through the shared cache.
+
+    Args:
+        tickers (Iterable[str]): The stock ticker symbols.
+        period (str, optional): The time period to fetch (default is '1y').
+        interval (str, optional): The bar interval (default is '1d').
+
+    Returns:
+        dict: Maps each normalized ticker to its BarSeries.
+    """
+    return history_cache.get_many(tickers, period, interval)
+
+
+def get_history_intervals(ticker, intervals, period='1y'):
+    """
+    Get a price history at several intervals through the shared cache, from one upstream fetch
+    whenever the coarser intervals can be built from the finest.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        intervals (Iterable[str]): The bar intervals.
+        period (str, optional): The time period to fetch (default is '1y').
+
+    Returns:
+        dict: Maps each canonical interval to its BarSeries, finest first.
+    """
+    return history_cache.get_intervals(ticker, period, intervals)
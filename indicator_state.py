@@ -0,0 +1,305 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+from intervals import normalize_interval
+
+DEFAULT_MAX_STATES = 1024
+DEFAULT_PARAMS = {
+    "sma_window": 50,
+    "ema_window": 50,
+    "rsi_window": 14,
+    "short_window": 12,
+    "long_window": 26,
+    "signal_window": 9,
+}
+
+
+def window_error(**windows):
+    """
+    Check indicator window sizes.
+
+    Args:
+        **windows: Window sizes by parameter name, e.g. sma_window=50; None values are skipped.
+
+    Returns:
+        str: A message about the first size that is not a positive whole number, or None if all are valid.
+    """
+    for name, value in windows.items():
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            return f"The {name.replace('_', ' ')} must be a positive whole number, got {value!r}."
+    return None
+
+
+class _RollingMean:
+    """
+    Running mean over the last `window` values, updated in O(1) per value.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.nonzero = 0
+
+    def peek(self, value):
+        """
+        Get the mean the window would have after appending a value, without appending it.
+
+        Args:
+            value (float): The candidate value.
+
+        Returns:
+            float: The mean, or NaN while fewer than `window` values have been seen.
+        """
+        total, nonzero, count = self._after(value)
+        if count < self.window:
+            return math.nan
+        # Avoid floating-point residue when the window only holds zeros
+        return total / self.window if nonzero else 0.0
+
+    def push(self, value):
+        """
+        Append a value, dropping the oldest one once the window is full.
+
+        Args:
+            value (float): The value to append.
+        """
+        self.total, self.nonzero, _ = self._after(value)
+        self.values.append(value)
+
+    def _after(self, value):
+        """Get the (total, nonzero count, length) the window would have after appending a value."""
+        total, nonzero, count = self.total + value, self.nonzero + (value != 0), len(self.values) + 1
+        if len(self.values) == self.window:
+            oldest = self.values[0]
+            total -= oldest
+            nonzero -= oldest != 0
+            count -= 1
+        return total, nonzero, count
+
+
+class IndicatorState:
+    """
+    Incremental SMA, EMA, RSI and MACD state for one closing price series.
+
+    Bars are committed in order and each one costs O(1). The most recent bar is held as pending
+    because a live daily or intraday bar keeps changing until it closes; reporting it again with the
+    same timestamp replaces it instead of appending a new bar. The latest values match
+    `indicators.compute_indicators` run over the same series.
+    """
+
+    def __init__(self, sma_window=50, ema_window=50, rsi_window=14, short_window=12, long_window=26,
+                 signal_window=9):
+        """
+        Args:
+            sma_window (int, optional): The window size for the SMA calculation (default is 50).
+            ema_window (int, optional): The span for the EMA calculation (default is 50).
+            rsi_window (int, optional): The window size for RSI calculation (default is 14).
+            short_window (int, optional): The short MACD window size (default is 12).
+            long_window (int, optional): The long MACD window size (default is 26).
+            signal_window (int, optional): The MACD signal window size (default is 9).
+
+        Raises:
+            ValueError: If a window size is not a positive whole number.
+        """
+        error = window_error(sma_window=sma_window, ema_window=ema_window, rsi_window=rsi_window,
+                             short_window=short_window, long_window=long_window, signal_window=signal_window)
+        if error is not None:
+            raise ValueError(error)
+        self._sma = _RollingMean(sma_window)
+        self._gains = _RollingMean(rsi_window)
+        self._losses = _RollingMean(rsi_window)
+        self._alphas = {
+            "ema": 2 / (ema_window + 1),
+            "short": 2 / (short_window + 1),
+            "long": 2 / (long_window + 1),
+            "signal": 2 / (signal_window + 1),
+        }
+        self._emas = {"ema": None, "short": None, "long": None, "signal": None}
+        self._pending = None
+        self.committed_close = None
+        self.committed_timestamp = None
+        self.last_timestamp = None
+        self.bars = 0
+
+    def update(self, close, timestamp=None):
+        """
+        Add a bar, or revise the latest bar if it has the same timestamp.
+
+        Args:
+            close (float): The bar's closing price.
+            timestamp (Any, optional): The bar's timestamp; bars without one are always appended.
+        """
+        close = float(close)
+        if self._pending is not None and (timestamp is None or timestamp != self.last_timestamp):
+            self._commit(self._pending)
+            self.committed_timestamp = self.last_timestamp
+            self._pending = None
+        if self._pending is None:
+            self.bars += 1
+        self._pending = close
+        self.last_timestamp = timestamp
+
+    def extend(self, closes, timestamps=None):
+        """
+        Add several bars in order.
+
+        Args:
+            closes (Iterable[float]): Closing prices, oldest first.
+            timestamps (Iterable[Any], optional): Matching timestamps.
+        """
+        if timestamps is None:
+            for close in closes:
+                self.update(close)
+        else:
+            for close, timestamp in zip(closes, timestamps):
+                self.update(close, timestamp)
+
+    def values(self):
+        """
+        Get the latest indicator values.
+
+        Returns:
+            dict: The latest 'sma', 'ema', 'rsi' and 'macd' (histogram) values; NaN when no bars
+                have been added or the window is not yet full.
+        """
+        if self._pending is None:
+            return {"sma": math.nan, "ema": math.nan, "rsi": math.nan, "macd": math.nan}
+
+        close = self._pending
+        gain, loss = self._changes(close)
+        emas = self._next_emas(close)
+        return {
+            "sma": self._sma.peek(close),
+            "ema": emas["ema"],
+            "rsi": _rsi(self._gains.peek(gain), self._losses.peek(loss)),
+            "macd": emas["short"] - emas["long"] - emas["signal"],
+        }
+
+    def _changes(self, close):
+        """Get the (gain, loss) of a close relative to the last committed close."""
+        if self.committed_close is None:
+            return 0.0, 0.0
+        delta = close - self.committed_close
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _next_emas(self, close):
+        """Get the EMA values that appending a close would produce."""
+        emas = {}
+        for name in ("ema", "short", "long"):
+            emas[name] = _ema_step(self._emas[name], close, self._alphas[name])
+        emas["signal"] = _ema_step(self._emas["signal"], emas["short"] - emas["long"], self._alphas["signal"])
+        return emas
+
+    def _commit(self, close):
+        """Fold a finished bar into the running state."""
+        gain, loss = self._changes(close)
+        self._emas = self._next_emas(close)
+        self._sma.push(close)
+        self._gains.push(gain)
+        self._losses.push(loss)
+        self.committed_close = close
+
+
+def _ema_step(previous, value, alpha):
+    """Advance an EMA by one value; the first value seeds it, as with ewm(adjust=False)."""
+    return value if previous is None else alpha * value + (1 - alpha) * previous
+
+
+def _rsi(gain, loss):
+    """Compute the RSI from average gain and loss, matching pandas' division semantics."""
+    if math.isnan(gain) or math.isnan(loss):
+        return math.nan
+    if loss == 0:
+        return 100.0 if gain > 0 else math.nan
+    return 100 - (100 / (1 + gain / loss))
+
+
+class IndicatorStateStore:
+    """
+    Per-ticker indicator states kept in sync with cached price histories.
+
+    Each state is keyed by ticker, period, interval and indicator parameters. Syncing with a fresh
+    history only feeds the bars newer than the state's last bar, so serving the latest values costs
+    O(new bars) instead of a full recompute. If the history no longer contains the state's last bar,
+    or the bar before it has a different close than the one folded into the state (e.g. after a
+    split or dividend adjustment), the state is rebuilt from scratch. The least recently used states are dropped beyond `max_states`.
+    """
+
+    def __init__(self, max_states=DEFAULT_MAX_STATES):
+        """
+        Args:
+            max_states (int, optional): Maximum number of states to keep.
+        """
+        self.max_states = max_states
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def latest(self, ticker, period, close, interval='1d', **params):
+        """
+        Get the latest indicator values for a closing price series.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str): The time period the series covers.
+            close (pandas.Series): Closing prices indexed by timestamp, oldest first.
+            interval (str, optional): The bar interval (default is '1d').
+            **params: Indicator parameters accepted by IndicatorState; omitted ones use the defaults.
+
+        Returns:
+            dict: The latest 'sma', 'ema', 'rsi' and 'macd' values.
+
+        Raises:
+            ValueError: If the series is empty, e.g. for an unknown or delisted ticker, or a window
+                size is not a positive whole number.
+        """
+        if len(close) == 0:
+            # Checked before any state is created, so empty histories are never cached
+            raise ValueError(f"No price data found for {ticker} ({period}, {interval} bars).")
+        params = {**DEFAULT_PARAMS, **params}
+        key = (ticker.strip().upper(), period, normalize_interval(interval), tuple(sorted(params.items())))
+        with self._lock:
+            state = self._states.get(key)
+            start = _resume_position(state, close)
+            if start is None:
+                state = IndicatorState(**params)
+                start = 0
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+            state.extend(close.values[start:].tolist(), close.index[start:])
+            return state.values()
+
+
+def _resume_position(state, close):
+    """
+    Find where a state should resume in a history.
+
+    The pending bar may have changed since it was added, as a live bar does, but the committed bar
+    before it must still be in the history with the same close.
+
+    Args:
+        state (IndicatorState): The existing state, or None.
+        close (pandas.Series): Closing prices indexed by timestamp, oldest first.
+
+    Returns:
+        int: The position of the state's last (pending) bar in the history, or None if the state
+            must be rebuilt.
+    """
+    index = close.index
+    if state is None or state.last_timestamp is None or len(index) == 0:
+        return None
+    position = index.searchsorted(state.last_timestamp)
+    if position >= len(index) or index[position] != state.last_timestamp:
+        return None
+    if state.committed_timestamp is not None:
+        if position == 0 or index[position - 1] != state.committed_timestamp \
+                or close.values[position - 1] != state.committed_close:
+            return None
+    return position
+
+
+indicator_states = IndicatorStateStore()
@@ -0,0 +1,118 @@
+from lazy_imports import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+INDICATORS = ("sma", "ema", "rsi", "macd")
+
+
+def _as_frame(close):
+    """
+    Normalize closing prices to a 2-D frame with one column per series.
+
+    Args:
+        close (pandas.Series | pandas.DataFrame | numpy.ndarray): Closing prices, oldest first. A 2-D
+            array holds one ticker per column.
+
+    Returns:
+        Tuple[pandas.DataFrame, bool]: The frame and whether the input was a single series.
+    """
+    if isinstance(close, pd.DataFrame):
+        return close, False
+    if isinstance(close, pd.Series):
+        return close.to_frame(), True
+    values = np.asarray(close, dtype=float)
+    if values.ndim == 1:
+        return pd.DataFrame({0: values}), True
+    if values.ndim == 2:
+        return pd.DataFrame(values), False
+    raise ValueError(f"Expected a 1-D or 2-D array of closing prices, got {values.ndim} dimensions.")
+
+
+def _ema(frame, span, min_periods=0):
+    """
+    Compute a span-based exponential moving average for every column.
+
+    Args:
+        frame (pandas.DataFrame): The input series, one per column.
+        span (int): The EMA span.
+        min_periods (int, optional): Minimum number of observations before a value is emitted.
+
+    Returns:
+        pandas.DataFrame: The EMA of each column.
+    """
+    return frame.ewm(span=span, min_periods=min_periods, adjust=False).mean()
+
+
+def compute_indicators(close, indicators=INDICATORS, sma_window=50, ema_window=50, rsi_window=14,
+                       short_window=12, long_window=26, signal_window=9, latest=True):
+    """
+    Compute several technical indicators in one vectorized pass over the same prices.
+
+    Every indicator is computed column-wise on all series at once, and intermediate results shared
+    by several indicators (such as EMAs with the same span) are computed only once.
+
+    Args:
+        close (pandas.Series | pandas.DataFrame | numpy.ndarray): Closing prices, oldest first. A
+            DataFrame or 2-D array holds one ticker per column.
+        indicators (Iterable[str], optional): Indicators to compute, any of 'sma', 'ema', 'rsi',
+            'macd', 'macd_line' and 'macd_signal' (default is all four main indicators).
+        sma_window (int, optional): The window size for the SMA calculation (default is 50).
+        ema_window (int, optional): The span for the EMA calculation (default is 50).
+        rsi_window (int, optional): The window size for RSI calculation (default is 14).
+        short_window (int, optional): The short MACD window size (default is 12).
+        long_window (int, optional): The long MACD window size (default is 26).
+        signal_window (int, optional): The MACD signal window size (default is 9).
+        latest (bool, optional): Return only the latest value of each indicator instead of the full
+            series (default is True).
+
+    Returns:
+        dict: Maps each indicator name to its result. For a single series, latest values are floats
+            and full results are Series; for several series they are a Series indexed by column and
+            a DataFrame respectively. 'macd' is the MACD histogram.
+    """
+    frame, single = _as_frame(close)
+    requested = set(indicators)
+    unknown = requested - set(INDICATORS) - {"macd_line", "macd_signal"}
+    if unknown:
+        raise ValueError(f"Unknown indicators: {', '.join(sorted(unknown))}")
+
+    frame = frame.astype(float)
+    results = {}
+    emas = {}
+
+    def ema(span, min_periods=0):
+        key = (span, min_periods)
+        if key not in emas:
+            emas[key] = _ema(frame, span, min_periods)
+        return emas[key]
+
+    if "sma" in requested:
+        results["sma"] = frame.rolling(window=sma_window).mean()
+
+    if "ema" in requested:
+        results["ema"] = ema(ema_window)
+
+    if "rsi" in requested:
+        delta = frame.diff()
+        gain = delta.where(delta > 0, 0).rolling(window=rsi_window).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_window).mean()
+        rs = gain / loss
+        results["rsi"] = 100 - (100 / (1 + rs))
+
+    if requested & {"macd", "macd_line", "macd_signal"}:
+        macd_line = ema(short_window, 1) - ema(long_window, 1)
+        signal_line = _ema(macd_line, signal_window, 1)
+        results["macd"] = macd_line - signal_line
+        results["macd_line"] = macd_line
+        results["macd_signal"] = signal_line
+
+    output = {}
+    for name in indicators:
+        values = results[name]
+        if latest:
+            values = values.iloc[-1].rename(name)
+            output[name] = float(values.iloc[0]) if single else values
+        else:
+            output[name] = values.iloc[:, 0] if single else values
+    return output
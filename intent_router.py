@@ -0,0 +1,229 @@
+import re
+
+from intervals import INTRADAY_MINUTES
+
+INDICATOR_FUNCTIONS = {
+    "sma": "calculate_sma",
+    "ema": "calculate_ema",
+    "rsi": "calculate_rsi",
+    "macd": "calculate_macd",
+    "volume": "get_stock_volume",
+    "price": "get_stock_price",
+}
+
+# Technical indicators win over volume, and volume over price, whatever order they are mentioned in
+INDICATOR_PRIORITY = {"sma": 0, "ema": 0, "rsi": 0, "macd": 0, "volume": 1, "price": 2}
+
+VALID_PERIODS = {"1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"}
+
+PERIOD_UNITS = {"d": "d", "day": "d", "w": "wk", "wk": "wk", "week": "wk", "mo": "mo", "month": "mo", "y": "y",
+                "yr": "y", "year": "y"}
+
+INTERVAL_WORDS = {"hourly": "60m", "daily": "1d", "weekly": "1wk", "monthly": "1mo", "quarterly": "3mo"}
+
+KNOWN_TICKERS = ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN"]
+
+# Other symbols count only as cashtags ("$NVDA"), since short uppercase words ("PE", "CEO") are not tickers.
+# Every match starts with "$" or a word character, and the lookahead rejects the other positions before
+# the alternatives are tried, which makes the scan about a third faster.
+ROUTER_PATTERN = re.compile(
+    r"""
+    (?=[$\w])
+    (?:
+    \$(?P<cashtag>[A-Z]{1,5}(?:[.-][A-Z]{1,2})?)\b
+  | \b(?:
+        (?P<exit>exit)
+      | (?P<change>change\s+stock)
+      | (?P<trade>buy(?:ing|s)?|sell(?:ing|s)?)
+      | (?P<comparison>better|worse)\s+than
+      | (?P<macd>macd|moving\s+average\s+convergence\s+divergence)
+      | (?P<rsi>rsi|relative\s+strength\s+index)
+      | (?P<sma>sma|simple\s+moving\s+average)
+      | (?P<ema>ema|exponential\s+moving\s+average)
+      | (?P<volume>volume|trading\s+volume|number\s+of\s+shares\s+traded)
+      | (?P<price>price)
+      | (?P<whole_period>ytd|year\s+to\s+date|max|all\s+time)
+      | window\s*(?:of|=|:)?\s*(?P<window>\d+)
+      | (?P<triple>\d+\s*/\s*\d+\s*/\s*\d+)
+      | (?P<bar_word>hourly|daily|weekly|monthly|quarterly)
+      | (?P<bars>\d+)\s*-?\s*(?P<bar_unit>minutes?|mins?|m|hours?|hrs?|h)
+      | (?P<number>\d+)\s*-?\s*(?P<unit>(?:day|week|month|year|yr|wk|mo|d|w|y)s?)?
+      | (?P<known>aapl|msft|googl|tsla|amzn)
+    )\b
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+ADJACENT_GAP = re.compile(r"[\s\-:(),=]*")
+
+# Groups that end a match inside another group, mapped to the group that names the match kind
+TRAILING_GROUPS = {"unit": "number", "bar_unit": "bars"}
+
+
+class Intent:
+    """
+    The parsed meaning of a chat message.
+
+    Attributes:
+        action (str): 'exit', 'change_stock', 'trade', 'compare', 'function' or None if nothing matched.
+        indicator (str): The main indicator asked about ('sma', 'ema', 'rsi', 'macd', 'volume' or 'price').
+        function_name (str): The stock function for the indicator.
+        params (dict): Keyword arguments for the stock function, e.g. {'window': 21, 'period': '5y'}.
+        tickers (List[str]): Tickers mentioned in the message, in order: the known tickers and cashtags
+            such as "$NVDA".
+        comparison (str): 'better than', 'worse than' or None.
+        intervals (List[str]): Bar intervals mentioned in the message, in order, e.g. ['5m', '60m'].
+            A single interval is also passed to the stock function as params['interval'].
+    """
+
+    __slots__ = ("action", "indicator", "function_name", "params", "tickers", "comparison", "intervals")
+
+    def __init__(self, action=None, indicator=None, params=None, tickers=None, comparison=None, intervals=None):
+        self.action = action
+        self.indicator = indicator
+        self.function_name = INDICATOR_FUNCTIONS.get(indicator)
+        self.params = params or {}
+        self.tickers = tickers or []
+        self.comparison = comparison
+        self.intervals = intervals or []
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"Intent({fields})"
+
+
+def parse_intent(prompt):
+    """
+    Parse a chat message in a single pass of one precompiled pattern.
+
+    Extracts the requested action, the indicator and its parameters (such as "RSI 21-day",
+    "50 day SMA", "MACD 12/26/9" or "over 5 years"), the bar intervals (such as "5-minute",
+    "1h" or "weekly"), the tickers mentioned and the comparison operator. Matches respect word
+    boundaries, so "ema" inside other words is ignored. Tickers are the known ones in any case and
+    other symbols written as cashtags, such as "$NVDA".
+
+    Args:
+        prompt (str): The user's message.
+
+    Returns:
+        Intent: The parsed intent.
+    """
+    flags = set()
+    indicator = None
+    indicator_end = -1
+    pending_numbers = []
+    params = {}
+    tickers = []
+    comparison = None
+    intervals = []
+
+    for match in ROUTER_PATTERN.finditer(prompt):
+        kind = match.lastgroup
+        kind = TRAILING_GROUPS.get(kind, kind)
+        value = match.group(kind)
+
+        if kind in ("exit", "change", "trade"):
+            flags.add(kind)
+        elif kind == "comparison":
+            comparison = f"{value.lower()} than"
+        elif kind in INDICATOR_PRIORITY:
+            if indicator is None or INDICATOR_PRIORITY[kind] < INDICATOR_PRIORITY[indicator]:
+                indicator = kind
+                # A number right before the indicator ("50 day SMA") is its window
+                for number, unit, end in pending_numbers:
+                    if _is_adjacent(prompt, end, match.start()):
+                        _apply_number(params, number, unit, True)
+            indicator_end = match.end() if indicator == kind else indicator_end
+            pending_numbers = []
+        elif kind == "whole_period":
+            params["period"] = "ytd" if value.lower() in ("ytd", "year to date") else "max"
+        elif kind == "window":
+            params["window"] = int(value)
+        elif kind == "triple":
+            short_window, long_window, signal_window = (int(part) for part in re.split(r"\s*/\s*", value))
+            params.update(short_window=short_window, long_window=long_window, signal_window=signal_window)
+        elif kind == "bar_word":
+            _add_unique(intervals, INTERVAL_WORDS[value.lower()])
+        elif kind == "bars":
+            minutes = int(value) * (60 if match.group("bar_unit").lower().startswith("h") else 1)
+            if f"{minutes}m" in INTRADAY_MINUTES:
+                _add_unique(intervals, f"{minutes}m")
+        elif kind == "number":
+            unit = match.group("unit")
+            adjacent = indicator_end >= 0 and _is_adjacent(prompt, indicator_end, match.start())
+            if not _apply_number(params, int(value), unit, adjacent):
+                pending_numbers.append((int(value), unit, match.end()))
+        elif kind in ("known", "cashtag"):
+            _add_unique(tickers, value.upper())
+
+    if indicator != "macd":
+        for name in ("short_window", "long_window", "signal_window"):
+            params.pop(name, None)
+    if indicator in ("price", "volume"):
+        params.pop("window", None)
+    if len(intervals) == 1:
+        params["interval"] = intervals[0]
+
+    if "exit" in flags:
+        action = "exit"
+    elif "change" in flags:
+        action = "change_stock"
+    elif "trade" in flags:
+        action = "trade"
+    elif comparison is not None:
+        action = "compare"
+    elif indicator is not None:
+        action = "function"
+    else:
+        action = None
+    return Intent(action, indicator, params, tickers, comparison, intervals)
+
+
+def _is_adjacent(prompt, end, start):
+    """
+    Check whether two matches are separated only by spaces and light punctuation.
+
+    Args:
+        prompt (str): The user's message.
+        end (int): End offset of the first match, or -1 if there is none.
+        start (int): Start offset of the second match.
+
+    Returns:
+        bool: True if the matches are adjacent.
+    """
+    return 0 <= end <= start and ADJACENT_GAP.fullmatch(prompt, end, start) is not None
+
+
+def _apply_number(params, number, unit, adjacent):
+    """
+    Interpret a number as an indicator window or a history period.
+
+    Plain numbers and day counts next to an indicator are windows; week, month and year counts are
+    periods when yfinance supports them.
+
+    Args:
+        params (dict): The parameters to update.
+        number (int): The number.
+        unit (str): The unit that followed the number, or None.
+        adjacent (bool): Whether the number is next to the indicator.
+
+    Returns:
+        bool: True if the number was used.
+    """
+    if unit is not None:
+        unit = unit.lower()
+        unit = PERIOD_UNITS[unit[:-1] if len(unit) > 1 and unit.endswith("s") else unit]
+    if adjacent and unit in (None, "d"):
+        params["window"] = number
+        return True
+    if unit is not None and f"{number}{unit}" in VALID_PERIODS:
+        params["period"] = f"{number}{unit}"
+        return True
+    return False
+
+
+def _add_unique(values, value):
+    """Append a value, such as a ticker or an interval, unless it is already listed."""
+    if value not in values:
+        values.append(value)
@@ -0,0 +1,166 @@
+from bar_store import period_start
+from lazy_imports import LazyModule
+
+pd = LazyModule("pandas")
+
+DEFAULT_INTERVAL = "1d"
+
+# Bar intervals served, finest first, with the pandas rule that builds them from finer bars.
+# Intraday bins start at the first bar (the session open) so they line up with yfinance's own bars.
+INTERVAL_RULES = {
+    "1m": "1min",
+    "2m": "2min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "60min",
+    "90m": "90min",
+    "1d": "D",
+    "1wk": "W-MON",
+    "1mo": "MS",
+    "3mo": "QS",
+}
+
+INTERVAL_ALIASES = {
+    "1h": "60m",
+    "1w": "1wk",
+}
+
+INTRADAY_MINUTES = {
+    "1m": 1,
+    "2m": 2,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "90m": 90,
+}
+
+# How far back yfinance serves intraday bars
+INTRADAY_MAX_DAYS = {
+    "1m": 7,
+    "2m": 60,
+    "5m": 60,
+    "15m": 60,
+    "30m": 60,
+    "60m": 730,
+    "90m": 60,
+}
+
+INTRADAY_DEFAULT_PERIOD = "1mo"
+
+
+def normalize_interval(interval):
+    """
+    Get the canonical name of a bar interval.
+
+    Args:
+        interval (str): A yfinance interval such as '5m', '1h', '1d' or '1wk'.
+
+    Returns:
+        str: The canonical interval, e.g. '60m' for '1h'.
+
+    Raises:
+        ValueError: If the interval is not supported.
+    """
+    name = str(interval).strip().lower()
+    name = INTERVAL_ALIASES.get(name, name)
+    if name not in INTERVAL_RULES:
+        raise ValueError(f"Unknown interval '{interval}'. Use one of: {', '.join(INTERVAL_RULES)}.")
+    return name
+
+
+def is_intraday(interval):
+    """
+    Check whether an interval is shorter than a day.
+
+    Args:
+        interval (str): A canonical interval.
+
+    Returns:
+        bool: True for minute and hour bars.
+    """
+    return interval in INTRADAY_MINUTES
+
+
+def default_period(interval):
+    """
+    Get the period used when a question gives an interval but no period.
+
+    Args:
+        interval (str): A canonical interval.
+
+    Returns:
+        str: '5d' for one-minute bars, '1mo' for other intraday bars and '1y' otherwise.
+    """
+    if interval == "1m":
+        return "5d"
+    return INTRADAY_DEFAULT_PERIOD if is_intraday(interval) else "1y"
+
+
+def validate_period(period, interval):
+    """
+    Check that yfinance serves an interval over a period.
+
+    Args:
+        period (str): A yfinance period such as '5d' or '1y'.
+        interval (str): A canonical interval.
+
+    Raises:
+        ValueError: If the period reaches further back than the interval is available.
+    """
+    if not is_intraday(interval):
+        return
+    limit = INTRADAY_MAX_DAYS[interval]
+    now = pd.Timestamp.now(tz="UTC")
+    start = period_start(period, now)
+    if start is None or start < period_start(f"{limit}d", now):
+        raise ValueError(f"{interval} bars are only available for the last {limit} days; use a shorter period.")
+
+
+def source_interval(interval):
+    """
+    Get the interval fetched upstream to serve an interval.
+
+    Daily and coarser bars are resampled from daily bars, so a weekly and a daily question share one
+    fetch. Intraday bars are fetched as they are, and coarser intraday bars are derived from them
+    when they are already cached.
+
+    Args:
+        interval (str): A canonical interval.
+
+    Returns:
+        str: The interval to fetch.
+    """
+    return interval if is_intraday(interval) else DEFAULT_INTERVAL
+
+
+def can_resample(source, target):
+    """
+    Check whether bars of one interval can be built exactly from bars of another.
+
+    Args:
+        source (str): The canonical interval of the available bars.
+        target (str): The canonical interval wanted.
+
+    Returns:
+        bool: True if `target` is coarser than `source` and made of whole `source` bars.
+    """
+    if source == target:
+        return False
+    if is_intraday(source) and is_intraday(target):
+        return INTRADAY_MINUTES[target] % INTRADAY_MINUTES[source] == 0
+    return source == DEFAULT_INTERVAL and not is_intraday(target)
+
+
+def interval_rank(interval):
+    """
+    Get the position of an interval from finest to coarsest, for sorting.
+
+    Args:
+        interval (str): A canonical interval.
+
+    Returns:
+        int: The rank.
+    """
+    return list(INTERVAL_RULES).index(interval)
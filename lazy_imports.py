@@ -0,0 +1,61 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    A stand-in for a module that is imported on first attribute access.
+
+    Heavy dependencies such as pandas, yfinance and openai are bound to a LazyModule at import time,
+    so starting the app (and answering requests that never touch them) does not pay for importing
+    them. Attribute reads and writes are forwarded to the real module once it is loaded, and loading
+    is safe from several threads at once.
+    """
+
+    def __init__(self, name, on_load=None):
+        """
+        Args:
+            name (str): The module to import, e.g. 'pandas'.
+            on_load (Callable[[module], None], optional): Called once with the module right after it
+                is imported, e.g. to configure it.
+        """
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_on_load", on_load)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def loaded(self):
+        """Whether the module has been imported."""
+        return self._module is not None
+
+    def load(self):
+        """
+        Import the module if it is not loaded yet.
+
+        Returns:
+            module: The real module.
+        """
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                object.__setattr__(self, "_module", module)
+            return self._module
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule '{self._name}' ({state})>"
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+from shared_cache import shared_cache
+
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", "900"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+DEFAULT_SIGNIFICANT_DIGITS = int(os.getenv("LLM_CACHE_SIGNIFICANT_DIGITS", "4"))
+
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def bucket_numbers(text, significant_digits):
+    """
+    Round every number in a text to a number of significant digits.
+
+    Args:
+        text (str): The text to normalize.
+        significant_digits (int): Digits to keep; 0 leaves numbers unchanged.
+
+    Returns:
+        str: The text with rounded numbers.
+    """
+    if not significant_digits:
+        return text
+    return NUMBER_PATTERN.sub(lambda match: f"{float(match.group()):.{significant_digits}g}", text)
+
+
+def normalize_prompt(messages, significant_digits=DEFAULT_SIGNIFICANT_DIGITS, **params):
+    """
+    Build a canonical form of a chat request so equivalent prompts share a cache key.
+
+    Whitespace is collapsed, text is lowercased and numbers are optionally bucketed. Tool calls
+    requested by the model are part of the form, as their results follow them.
+
+    Args:
+        messages (List[Dict[str, str]]): The messages to send to the API.
+        significant_digits (int, optional): Significant digits kept when bucketing numbers.
+        **params: Generation parameters that change the output, such as model and max_tokens.
+
+    Returns:
+        str: The normalized prompt.
+    """
+    parts = []
+    for message in messages:
+        content = WHITESPACE_PATTERN.sub(" ", message.get("content") or "").strip().lower()
+        for call in message.get("tool_calls", ()):
+            content = f"{content} {call['function']['name']}({call['function']['arguments']})"
+        parts.append(f"{message['role']}: {bucket_numbers(content, significant_digits)}")
+    parts.append(json.dumps(params, sort_keys=True))
+    return "\n".join(parts)
+
+
+class ResponseCache:
+    """
+    TTL and size-bounded LRU cache of LLM completions keyed by normalized prompt.
+
+    With a shared cache tier, completions are also published to the other worker processes, and
+    local misses are looked up there before calling the API.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 significant_digits=DEFAULT_SIGNIFICANT_DIGITS, clock=time.monotonic, shared=None):
+        """
+        Args:
+            ttl (float, optional): Seconds a completion stays valid.
+            max_entries (int, optional): Maximum number of cached completions.
+            significant_digits (int, optional): Significant digits kept when bucketing numbers in
+                prompts; 0 caches exact numbers only.
+            clock (Callable[[], float], optional): Monotonic clock used for expiry.
+            shared (SharedCache, optional): The cache tier shared with other worker processes.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.significant_digits = significant_digits
+        self.clock = clock
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, messages, **params):
+        """
+        Build the cache key for a chat request.
+
+        Args:
+            messages (List[Dict[str, str]]): The messages to send to the API.
+            **params: Generation parameters that change the output.
+
+        Returns:
+            str: The key.
+        """
+        normalized = normalize_prompt(messages, self.significant_digits, **params)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Get a cached completion.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: The completion, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+                self.expirations += 1
+
+        entry = self.shared.get("llm:" + key) if self._shares() else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            response, ttl = entry
+            self._store(key, response, self.clock() + ttl)
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        """
+        Store a completion, evicting the least recently used ones beyond the size bound.
+
+        Args:
+            key (str): The cache key.
+            response (str): The completion.
+        """
+        with self._lock:
+            self._store(key, response, self.clock() + self.ttl)
+        if self._shares():
+            self.shared.set("llm:" + key, response, self.ttl)
+
+    def _shares(self):
+        """Whether completions go to the shared tier; a cache sized to zero is off there too."""
+        return self.shared is not None and self.max_entries > 0
+
+    def _store(self, key, response, expires_at):
+        """Store a completion locally and evict beyond the size bound; the caller holds the lock."""
+        self._entries.pop(key, None)
+        self._entries[key] = (response, expires_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Hits, misses, hit rate, evictions, expirations and entry count.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+            }
+
+
+response_cache = ResponseCache(shared=shared_cache)
+metrics.register_stats("llm_cache", "LLM response cache counters.", response_cache.stats)
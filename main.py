@@ -1,52 +1,327 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import openai
+import asyncio
+import functools
 import json
+import math
+import multiprocessing
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
-from stock_functions import function_mapping
-import numpy as np
+from charts import CHART_FORMATS, CHART_WORKERS, chart_cache, parse_overlays, render_chart, validate_size
+from llm_cache import response_cache
+from history_cache import get_histories, get_history_intervals, history_cache
+from intent_router import INDICATOR_FUNCTIONS, parse_intent
+from intervals import default_period
+from lazy_imports import LazyModule
+from market_data import MarketDataError, market_data
+from metrics import metrics
+from prefetch import PREFETCH_ENABLED, PrefetchScheduler
+from prompts import (PROMPT_MAX_RESULT_TOKENS, PROMPT_TOKENS, count_message_tokens, fit_messages, format_result,
+                     max_tokens_for, truncate_tokens)
+from profiler import PROFILER_ENABLED, PROFILER_MAX_SECONDS, ProfilerBusyError, profiler
+from sessions import Session, SessionStore, session_store
+from shared_cache import shared_cache
+from stock_functions import (COMPARABLE_INDICATORS, calculate_indicators, function_mapping, function_metadata,
+                             get_chart_data, rank_stocks)
+from volume_stream import DEFAULT_CHUNK_SIZE, get_volume_series, iter_volume_arrow, iter_volume_ndjson
 
 load_dotenv()
 
-openai.api_key = os.getenv("API_KEY")
 
-app = FastAPI()
+def configure_openai(module):
+    """Configure the OpenAI client once, when it is first used."""
+    module.api_key = os.getenv("API_KEY")
+
+
+openai = LazyModule("openai", on_load=configure_openai)
+
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+MAX_COMPARE_TICKERS = int(os.getenv("MAX_COMPARE_TICKERS", "100"))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "20"))
+CHART_TIMEOUT = float(os.getenv("CHART_TIMEOUT", "30"))
+MAX_TOOL_CALLS = int(os.getenv("MAX_TOOL_CALLS", "8"))
+
+RATE_LIMIT_MESSAGE = "I'm currently unable to process your request due to high demand. Please try again later."
+TIMEOUT_MESSAGE = ("I'm currently unable to process your request because the response took too long. "
+                   "Please try again later.")
+
+COMPLETION_PARAMS = {
+    "model": "gpt-3.5-turbo-0125",
+    "max_tokens": 150,
+    "temperature": 0.5,
+    "stop": ["\n", "User:", "System:"],
+}
+
+# The answer to a tool-calling question may cover several results, so it is not cut at the first line
+TOOL_ANSWER_PARAMS = {
+    "model": COMPLETION_PARAMS["model"],
+    "max_tokens": 300,
+    "temperature": COMPLETION_PARAMS["temperature"],
+}
+
+TOOLS = [{"type": "function", "function": metadata} for metadata in function_metadata.values()]
+
+TOOL_INSTRUCTIONS = ("You answer questions about stocks. Call the functions to get the data you need, several at "
+                     "once when the question has several parts, then answer briefly using their results.")
+
+FUNCTION_INDICATORS = {function_name: indicator for indicator, function_name in INDICATOR_FUNCTIONS.items()}
+
+BATCH_INSTRUCTIONS = ("You are explaining several stock results at once. Answer every numbered item on its own line, "
+                      "starting with the item's number followed by a period, and write nothing else.")
+
+NUMBERED_LINE_PATTERN = re.compile(r"^\s*(\d+)[.):]\s*(.+?)\s*$", re.MULTILINE)
+
+FUNCTION_CONTEXTS = {
+    "calculate_sma": ("(Simple Moving Average is a commonly used indicator to analyze stock trends. A higher SMA "
+                      "value may indicate a bullish trend, while a lower value may suggest a bearish trend.)"),
+    "calculate_ema": ("(Exponential Moving Average is a type of moving average that places more weight on recent "
+                      "data points. It is often used to identify trend direction.)"),
+    "calculate_rsi": ("(Relative Strength Index is a momentum oscillator that measures the speed and change of "
+                      "price movements. RSI values above 70 may indicate overbought conditions, while values "
+                      "below 30 may indicate oversold conditions.)"),
+    "calculate_macd": ("(Moving Average Convergence Divergence is a trend-following momentum indicator that "
+                       "shows the relationship between two moving averages of a security’s price. MACD signals "
+                       "potential buy and sell opportunities.)"),
+    "get_stock_price": "(Price refers to the current trading price of the selected stock.)",
+    "get_stock_volume": "(Volume refers to the number of shares traded for the selected stock.)",
+}
+
+executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="stock-worker")
+# With several workers, only the one holding the lease prefetches, and the others read what it shares
+prefetcher = PrefetchScheduler(history_cache, calculate_indicators,
+                               leader=(functools.partial(shared_cache.claim, "prefetch-leader")
+                                       if shared_cache is not None else None))
+# Rendering holds the GIL for long stretches, so charts are drawn in separate processes, started on first use
+chart_pool = None
+
+STAGE_SECONDS = metrics.histogram("stock_info_stage_seconds", "Time spent in each stage of a /stock-info/ request.",
+                                  ("stage",))
+FUNCTION_SECONDS = metrics.histogram("stock_function_seconds", "Time spent in stock functions.",
+                                     ("function", "ticker"))
+FUNCTION_CALLS = metrics.counter("stock_function_calls_total", "Stock function calls by outcome.",
+                                 ("function", "ticker", "outcome"))
+LLM_SECONDS = metrics.histogram("llm_request_seconds", "Time spent getting explanations from the OpenAI API.",
+                                ("mode", "outcome"))
+metrics.register_stats("prefetch", "Background prefetch counters.", prefetcher.stats)
+metrics.register_stats("chart_cache", "Rendered chart cache counters.", chart_cache.stats)
+metrics.register_stats("sessions", "Conversation session store counters.", session_store.stats)
+# Explanations and sessions kept in another process are reached over a socket
+REMOTE_STORES = shared_cache is not None or not isinstance(session_store, SessionStore)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    prefetch_task = asyncio.create_task(prefetcher.run(executor)) if PREFETCH_ENABLED else None
+    yield
+    if prefetch_task is not None:
+        prefetch_task.cancel()
+    executor.shutdown(wait=False)
+    if chart_pool is not None:
+        chart_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 class UserInput(BaseModel):
-    selected_stock: str
+    selected_stock: Optional[str] = None
     user_input: str
+    session_id: Optional[str] = None
+
+
+class BatchInput(BaseModel):
+    items: List[UserInput]
 
 
-def generate_response(messages):
+class CompareInput(BaseModel):
+    tickers: List[str]
+    indicator: str = "rsi"
+    period: str = "1y"
+    interval: str = "1d"
+    window: Optional[int] = None
+    ascending: bool = False
+
+
+async def run_blocking(func, *args, timeout=FETCH_TIMEOUT):
     """
-    Generate a response using the OpenAI API.
+    Run a blocking function on the worker pool without blocking the event loop.
+
+    Args:
+        func (Callable): The blocking function to run.
+        *args: Positional arguments for the function.
+        timeout (float, optional): Seconds to wait before giving up (default is FETCH_TIMEOUT).
+
+    Returns:
+        Any: The function's return value.
+
+    Raises:
+        HTTPException: If the function does not finish within the timeout, or with a 503 if the
+            market data provider is unavailable or rate limiting.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(executor, functools.partial(func, *args)), timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Error: Fetching stock data timed out. Please try again.")
+    except MarketDataError as e:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=503, detail=f"Error: {str(e)} Please try again later.", headers=headers)
+
+
+async def run_store(func, *args):
+    """
+    Call the response cache or the session store without blocking the event loop.
+
+    Stores in this process are called directly, which is cheaper than a thread hop, and stores
+    reached over a socket (the shared cache or Redis) are called on the worker pool.
+
+    Args:
+        func (Callable): The store method.
+        *args: Its arguments.
+
+    Returns:
+        Any: The method's return value.
+    """
+    if not REMOTE_STORES:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+def is_error_result(result):
+    """
+    Check whether a stock function result is an error message rather than a value to explain.
+
+    Args:
+        result (Any): The result.
+
+    Returns:
+        bool: Whether the result is an error message.
+    """
+    return isinstance(result, str) and result.startswith("Error")
+
+
+async def generate_response(messages, params=COMPLETION_PARAMS):
+    """
+    Generate a response using the OpenAI API, reusing cached responses to equivalent prompts.
 
     Args:
         messages (List[Dict[str, str]]): The messages to send to the API.
+        params (dict, optional): The completion parameters (default is COMPLETION_PARAMS).
 
     Returns:
         str: The generated response.
     """
+    started = time.perf_counter()
+    cache_key = response_cache.make_key(messages, **params)
+    cached = await run_store(response_cache.get, cache_key)
+    if cached is not None:
+        LLM_SECONDS.observe(time.perf_counter() - started, mode="complete", outcome="cached")
+        return cached
+
+    PROMPT_TOKENS.observe(count_message_tokens(messages), mode="complete")
+    outcome = "error"
+    try:
+        response = await asyncio.wait_for(
+            openai.ChatCompletion.acreate(messages=messages, **params),
+            LLM_TIMEOUT
+        )
+
+        content = response.choices[0].message.content
+        await run_store(response_cache.put, cache_key, content)
+        outcome = "ok"
+        return content
+    except openai.error.RateLimitError:
+        outcome = "rate_limited"
+        return RATE_LIMIT_MESSAGE
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        return TIMEOUT_MESSAGE
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, mode="complete", outcome=outcome)
+
+
+async def stream_response(messages, params=COMPLETION_PARAMS):
+    """
+    Stream a response from the OpenAI API token by token.
+
+    A cached response to an equivalent prompt is yielded in one piece; a streamed response is cached
+    once it completes.
+
+    Args:
+        messages (List[Dict[str, str]]): The messages to send to the API.
+        params (dict, optional): The completion parameters (default is COMPLETION_PARAMS).
+
+    Yields:
+        str: Pieces of the generated response as they arrive.
+    """
+    started = time.perf_counter()
+    cache_key = response_cache.make_key(messages, **params)
+    cached = await run_store(response_cache.get, cache_key)
+    if cached is not None:
+        LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome="cached")
+        yield cached
+        return
+    PROMPT_TOKENS.observe(count_message_tokens(messages), mode="stream")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT
+    tokens = []
+    outcome = "error"
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-0125",
-            messages=messages,
-            max_tokens=150,
-            temperature=0.5,
-            stop=["\n", "User:", "System:"]
+        stream = await asyncio.wait_for(
+            openai.ChatCompletion.acreate(messages=messages, stream=True, **params),
+            LLM_TIMEOUT
         )
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            token = chunk["choices"][0]["delta"].get("content")
+            if token:
+                tokens.append(token)
+                yield token
+        outcome = "ok"
+    except openai.error.RateLimitError:
+        outcome = "rate_limited"
+        yield RATE_LIMIT_MESSAGE
+        return
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        yield TIMEOUT_MESSAGE
+        return
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome=outcome)
 
-        return response.choices[0].message.content
-    except openai.error.RateLimitError as e:
-        return "I'm currently unable to process your request due to high demand. Please try again later."
+    await run_store(response_cache.put, cache_key, "".join(tokens))
+
+
+def format_sse(event, data):
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event (str): The event name.
+        data (Any): The JSON-serializable payload.
+
+    Returns:
+        str: The encoded event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 def find_matching_function(prompt):
     """
-    Find the matching stock function based on the user prompt using regex.
+    Find the matching stock function based on the user prompt.
 
     Args:
         prompt (str): The user's prompt related to the stock.
@@ -54,20 +329,7 @@ def find_matching_function(prompt):
     Returns:
         str: The name of the matching stock function.
     """
-    patterns = {
-        "get_stock_price": r"price|current price|stock price|price of",
-        "get_stock_volume": r"volume|stock volume|trading volume|number of shares traded",
-        "calculate_sma": r"SMA|simple moving average",
-        "calculate_ema": r"EMA|exponential moving average",
-        "calculate_rsi": r"RSI|relative strength index",
-        "calculate_macd": r"MACD|moving average convergence divergence"
-    }
-
-    for func_name, pattern in patterns.items():
-        if re.search(pattern, prompt, re.IGNORECASE):
-            return func_name
-
-    return None
+    return parse_intent(prompt).function_name
 
 
 def handle_trading_decision(selected_stock, prompt):
@@ -84,36 +346,46 @@ def handle_trading_decision(selected_stock, prompt):
     return "It's important to conduct thorough research before making trading decisions. Consider factors such as the company's financial health, growth prospects, and market conditions before deciding whether to buy or sell stocks."
 
 
-def handle_user_input(selected_stock, prompt):
+def handle_user_input(selected_stock, prompt, intent=None):
     """
     Handle user input and call the appropriate stock function based on the prompt.
 
     Args:
         selected_stock (str): The selected stock ticker.
         prompt (str): The user's prompt related to the stock.
+        intent (Intent, optional): The already parsed prompt (default parses it).
 
     Returns:
         str: The result of the called function or a response to the user query.
     """
-    prompt_lower = prompt.lower()
+    intent = intent or parse_intent(prompt)
 
-    if "exit" in prompt_lower:
+    if intent.action == "exit":
         return {"response": "Chat ended. Type a stock symbol to start a new chat."}
 
-    if "change stock" in prompt_lower:
+    if intent.action == "change_stock":
         return {"response": "Enter a new stock symbol to continue."}
 
-    if any(word in prompt_lower for word in ["buy", "sell"]):
+    if intent.action == "trade":
         return handle_trading_decision(selected_stock, prompt)
 
-    if "better than" in prompt_lower or "worse than" in prompt_lower:
-        return compare_stocks(prompt, selected_stock, None)
+    if intent.action == "compare":
+        return compare_stocks(prompt, selected_stock, None, intent)
 
-    function_name = find_matching_function(prompt)
+    function_name = intent.function_name
 
     if function_name:
         if function_name in function_mapping:
-            result = function_mapping[function_name](selected_stock)
+            ticker = metrics.ticker_label(selected_stock)
+            with FUNCTION_SECONDS.time(function=function_name, ticker=ticker):
+                if len(intent.intervals) > 1:
+                    result = call_for_intervals(function_mapping[function_name], selected_stock, intent)
+                else:
+                    if "interval" in intent.params and "period" not in intent.params:
+                        intent.params["period"] = default_period(intent.params["interval"])
+                    result = function_mapping[function_name](selected_stock, **intent.params)
+            outcome = "error" if is_error_result(result) else "ok"
+            FUNCTION_CALLS.inc(function=function_name, ticker=ticker, outcome=outcome)
             return result
         else:
             return f"Error: Unknown function '{function_name}'."
@@ -121,178 +393,792 @@ def handle_user_input(selected_stock, prompt):
         return "Error: No matching function found for the given prompt."
 
 
+def call_for_intervals(function, selected_stock, intent):
+    """
+    Call a stock function once per bar interval asked about, e.g. for "5m and 1h RSI".
+
+    Intervals sharing a period are served from one fetch of the finest of them.
+
+    Args:
+        function (Callable): The stock function.
+        selected_stock (str): The selected stock ticker.
+        intent (Intent): The parsed prompt, with at least two intervals.
+
+    Returns:
+        str: The results labelled by interval, e.g. '5m: 61.2; 60m: 55.8'.
+    """
+    periods = {interval: intent.params.get("period") or default_period(interval) for interval in intent.intervals}
+    for period in set(periods.values()):
+        try:
+            get_history_intervals(selected_stock, [interval for interval in periods if periods[interval] == period],
+                                  period)
+        except ValueError:
+            # Intervals not available over the period are reported by the stock function below
+            pass
+    results = [function(selected_stock, **{**intent.params, "interval": interval, "period": period})
+               for interval, period in periods.items()]
+    return "; ".join(f"{interval}: {result}" for interval, result in zip(periods, results))
+
+
 @app.post("/stock-info/")
 async def get_stock_info(user_input: UserInput):
-    selected_stock = user_input.selected_stock
+    with STAGE_SECONDS.time(stage="total"):
+        reply, result, messages, params, session = await prepare_stock_info(user_input)
+        if reply is not None:
+            return reply
+
+        with STAGE_SECONDS.time(stage="llm"):
+            response = await generate_response(messages, params)
+        return {"response": response, "session_id": session.session_id}
+
+
+@app.post("/stock-info/stream")
+async def stream_stock_info(user_input: UserInput):
+    """
+    Answer a stock question as Server-Sent Events.
+
+    The computed result is sent as a 'result' event as soon as it is available, followed by 'token'
+    events as the explanation is generated and a final 'done' event with the full response. Replies
+    that need no explanation are sent as a single 'reply' event followed by 'done'.
+
+    Args:
+        user_input (UserInput): The selected stock and the user's question.
+
+    Returns:
+        StreamingResponse: The event stream.
+    """
+    reply, result, messages, params, session = await prepare_stock_info(user_input)
+    return StreamingResponse(stock_info_events(reply, result, messages, params, session),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def stock_info_events(reply, result, messages, params=COMPLETION_PARAMS, session=None):
+    """
+    Produce the Server-Sent Events for a stock question.
+
+    Args:
+        reply (dict): A final reply that needs no explanation, or None.
+        result (Any): The computed result to explain.
+        messages (List[Dict[str, str]]): The messages asking for the explanation.
+        params (dict, optional): The completion parameters (default is COMPLETION_PARAMS).
+        session (Session, optional): The conversation, whose id is sent with the 'done' event.
+
+    Yields:
+        str: Encoded events.
+    """
+    if reply is not None:
+        yield format_sse("reply", reply)
+        yield format_sse("done", reply)
+        return
+
+    yield format_sse("result", {"result": str(result)})
+    tokens = []
+    async for token in stream_response(messages, params):
+        tokens.append(token)
+        yield format_sse("token", {"token": token})
+    done = {"response": "".join(tokens)}
+    if session is not None:
+        done["session_id"] = session.session_id
+    yield format_sse("done", done)
+
+
+async def prepare_stock_info(user_input):
+    """
+    Compute the result for a stock question and build the prompt that explains it.
+
+    The conversation's session supplies the stock and period when a follow-up question leaves them
+    out, and a summary of its earlier results is added to the prompt.
+
+    Args:
+        user_input (UserInput): The selected stock, the user's question and the session id.
+
+    Returns:
+        Tuple[dict, Any, List[Dict[str, str]], dict, Session]: Either a final reply that needs no
+            explanation (with the next three items None), or None followed by the computed result, the
+            messages for the explanation and the completion parameters; then the conversation's session.
+    """
+    session = await run_store(load_session, user_input.session_id)
     user_input_text = user_input.user_input
 
     if user_input_text.strip().lower() == "exit":
-        return {"response": "Chat ended. Type a stock symbol to start a new chat."}
+        await run_store(session_store.delete, session.session_id)
+        return {"response": "Chat ended. Type a stock symbol to start a new chat."}, None, None, None, session
 
     if user_input_text.strip().lower() == "change stock":
-        return {"response": "Enter a new stock symbol to continue."}
+        session.select(None)
+        await run_store(session_store.save, session)
+        return ({"response": "Enter a new stock symbol to continue.", "session_id": session.session_id}, None, None,
+                None, session)
 
     if user_input_text.strip():
-        result = handle_user_input(selected_stock, user_input_text)
+        if user_input.selected_stock:
+            session.select(user_input.selected_stock)
+        selected_stock = session.selected_stock
+        if selected_stock is None:
+            raise HTTPException(status_code=400, detail="Error: Please select a stock.")
 
-        if "better than" in user_input_text.lower() or "worse than" in user_input_text.lower():
-            comparison_result = compare_stocks(user_input_text, selected_stock, result)
-            return {"result": comparison_result}
+        with STAGE_SECONDS.time(stage="parse"):
+            intent = parse_intent(user_input_text)
+        if intent.action == "function" and len(intent.intervals) <= 1:
+            # A follow-up such as "and the MACD?" keeps the interval of the previous question, and its
+            # period unless the interval changed
+            interval = intent.params.get("interval", session.interval)
+            if interval != session.interval:
+                session.interval = interval
+                session.period = None
+            if interval is not None:
+                intent.params["interval"] = interval
+            if "period" in intent.params:
+                session.period = intent.params["period"]
+            elif session.period is not None:
+                intent.params["period"] = session.period
+        for ticker in [selected_stock] + intent.tickers:
+            prefetcher.record(ticker)
+        with STAGE_SECONDS.time(stage="compute"):
+            result = await run_blocking(handle_user_input, selected_stock, user_input_text, intent)
+
+        if intent.action == "compare" or is_error_result(result):
+            # Comparisons need no explanation, and errors are returned as they are
+            await run_store(session_store.save, session)
+            return {"result": result, "session_id": session.session_id}, None, None, None, session
         else:
-            function_context = get_function_context(user_input_text)
-            messages = [
-                {"role": "system", "content": f"You are asking about {selected_stock} stock."},
-                {"role": "user", "content": f"Explain this result: {result} {function_context}"}
-            ]
-            response = generate_response(messages)
-            return {"response": response}
+            with STAGE_SECONDS.time(stage="prompt"):
+                label = None
+                if intent.action == "function":
+                    # Questions about several intervals use each interval's default period
+                    label = session.remember(intent.indicator,
+                                             intent.params.get("period", None if intent.intervals else "1y"), result,
+                                             intent.params.get("interval", "/".join(intent.intervals) or None))
+                messages = build_messages(selected_stock, user_input_text, result, intent,
+                                          session.summary(exclude=label))
+            await run_store(session_store.save, session)
+            return None, result, messages, completion_params(intent), session
     else:
         raise HTTPException(status_code=400, detail="Error: Please provide a valid input.")
 
 
-def get_function_context(user_input):
+def load_session(session_id):
+    """
+    Get a conversation's session, starting a new one if it is unknown or has expired.
+
+    Args:
+        session_id (str): The session id sent by the client, or None.
+
+    Returns:
+        Session: The session.
+    """
+    session = session_store.get(session_id) if session_id else None
+    return session if session is not None else Session(session_id)
+
+
+def build_messages(selected_stock, prompt, result, intent=None, summary=""):
+    """
+    Build the messages asking the OpenAI API to explain a result.
+
+    Args:
+        selected_stock (str): The selected stock ticker.
+        prompt (str): The user's question.
+        result (Any): The computed result to explain.
+        intent (Intent, optional): The already parsed question (default parses it).
+        summary (str, optional): A summary of the earlier results in the conversation.
+
+    Returns:
+        List[Dict[str, str]]: The messages, within the input token budget.
+    """
+    intent = intent or parse_intent(prompt)
+    function_context = get_function_context(prompt, intent)
+    return fit_messages(f"You are asking about {selected_stock} stock.", summary,
+                        f"Explain this result: {{result}} {function_context}",
+                        format_result(result, intent.function_name))
+
+
+def completion_params(intent):
+    """
+    Get the completion parameters for explaining the result of a question.
+
+    Args:
+        intent (Intent): The parsed question.
+
+    Returns:
+        dict: COMPLETION_PARAMS with max_tokens sized for the stock function and number of intervals.
+    """
+    return {**COMPLETION_PARAMS, "max_tokens": max_tokens_for(intent.function_name, len(intent.intervals))}
+
+
+@app.post("/stock-info/tools")
+async def get_stock_info_tools(user_input: UserInput):
+    """
+    Answer a stock question by letting the model choose the stock functions and their arguments.
+
+    The model is offered every function in `function_metadata`. The calls it asks for in its first
+    reply run in parallel on the worker pool, after fetching their histories in one batched
+    download, and all results go back to it in a single follow-up completion that writes the
+    answer. Calls without a ticker use the selected stock.
+
+    Args:
+        user_input (UserInput): The user's question, with an optional selected stock and session id.
+
+    Returns:
+        dict: The answer as 'response', the 'tool_calls' made with their 'name', 'arguments' and
+            'result', and the 'session_id'.
+    """
+    if not user_input.user_input.strip():
+        raise HTTPException(status_code=400, detail="Error: Please provide a valid input.")
+    session = await run_store(load_session, user_input.session_id)
+    if user_input.selected_stock:
+        session.select(user_input.selected_stock)
+    selected_stock = session.selected_stock
+
+    system_content = TOOL_INSTRUCTIONS
+    if selected_stock is not None:
+        system_content = f"{system_content} The selected stock is {selected_stock}."
+    summary = session.summary()
+    if summary:
+        system_content = f"{system_content} {summary}"
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_input.user_input},
+    ]
+
+    with STAGE_SECONDS.time(stage="llm_tools"):
+        message = await request_tool_calls(messages)
+    if isinstance(message, str):
+        # Rate limited or timed out; keep the session so the client can retry with its id
+        await run_store(session_store.save, session)
+        return {"response": message, "tool_calls": [], "session_id": session.session_id}
+    calls = [parse_tool_call(call, selected_stock) for call in (message.get("tool_calls") or [])[:MAX_TOOL_CALLS]]
+    if not calls:
+        await run_store(session_store.save, session)
+        return {"response": message.get("content") or "", "tool_calls": [], "session_id": session.session_id}
+
+    for _, _, arguments in calls:
+        if isinstance(arguments.get("ticker"), str):
+            prefetcher.record(arguments["ticker"])
+    with STAGE_SECONDS.time(stage="compute"):
+        await run_blocking(prefetch_tool_histories, [arguments for _, _, arguments in calls])
+        results = await asyncio.gather(*(run_blocking(run_tool, name, arguments) for _, name, arguments in calls))
+
+    messages.append({
+        "role": "assistant",
+        "content": message.get("content"),
+        "tool_calls": [{"id": call_id, "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)}}
+                       for call_id, name, arguments in calls],
+    })
+    messages.extend({"role": "tool", "tool_call_id": call_id,
+                     "content": truncate_tokens(format_result(result, name), PROMPT_MAX_RESULT_TOKENS)}
+                    for (call_id, name, _), result in zip(calls, results))
+    for (_, name, arguments), result in zip(calls, results):
+        if str(arguments.get("ticker", "")).strip().upper() == selected_stock and name in FUNCTION_INDICATORS:
+            session.remember(FUNCTION_INDICATORS[name], arguments.get("period", "1y"), result,
+                             arguments.get("interval"))
+
+    with STAGE_SECONDS.time(stage="llm"):
+        response = await generate_response(messages, TOOL_ANSWER_PARAMS)
+    await run_store(session_store.save, session)
+    return {
+        "response": response,
+        "tool_calls": [{"name": name, "arguments": arguments, "result": result}
+                       for (_, name, arguments), result in zip(calls, results)],
+        "session_id": session.session_id,
+    }
+
+
+async def request_tool_calls(messages):
+    """
+    Ask the OpenAI API which stock functions to call for a question.
+
+    Args:
+        messages (List[Dict[str, str]]): The messages to send to the API.
+
+    Returns:
+        dict: The model's message, with its 'tool_calls' if it asked for any, or a message for the
+            user if the API is rate limiting or timed out.
+    """
+    started = time.perf_counter()
+    PROMPT_TOKENS.observe(count_message_tokens(messages), mode="tools")
+    outcome = "error"
+    try:
+        response = await asyncio.wait_for(
+            openai.ChatCompletion.acreate(messages=messages, tools=TOOLS, tool_choice="auto", **TOOL_ANSWER_PARAMS),
+            LLM_TIMEOUT
+        )
+        outcome = "ok"
+        return response.choices[0].message
+    except openai.error.RateLimitError:
+        outcome = "rate_limited"
+        return RATE_LIMIT_MESSAGE
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        return TIMEOUT_MESSAGE
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, mode="tools", outcome=outcome)
+
+
+def parse_tool_call(call, selected_stock=None):
+    """
+    Get the function and arguments of a tool call requested by the model.
+
+    Arguments that are not valid JSON are dropped, as are arguments the function's schema does not
+    declare. A missing ticker defaults to the selected stock.
+
+    Args:
+        call (dict): The tool call from the model's message.
+        selected_stock (str, optional): The selected stock ticker.
+
+    Returns:
+        Tuple[str, str, dict]: The call id, the function name and its arguments.
+    """
+    function = call["function"]
+    try:
+        arguments = json.loads(function.get("arguments") or "{}")
+    except ValueError:
+        arguments = {}
+    if not isinstance(arguments, dict):
+        arguments = {}
+    if selected_stock is not None and not arguments.get("ticker"):
+        arguments["ticker"] = selected_stock
+    properties = function_metadata.get(function["name"], {}).get("parameters", {}).get("properties", {})
+    return call["id"], function["name"], {name: value for name, value in arguments.items() if name in properties}
+
+
+def prefetch_tool_histories(calls):
+    """
+    Fetch the histories needed by several tool calls, one batched download per period and interval.
+
+    Args:
+        calls (List[dict]): The arguments of each tool call.
+    """
+    tickers_by_period = {}
+    for arguments in calls:
+        if isinstance(arguments.get("ticker"), str):
+            key = (str(arguments.get("period", "1y")), str(arguments.get("interval", "1d")))
+            tickers_by_period.setdefault(key, []).append(arguments["ticker"])
+    for (period, interval), tickers in tickers_by_period.items():
+        try:
+            get_histories(tickers, period, interval)
+        except ValueError:
+            # Invalid arguments are reported by each call's stock function
+            pass
+
+
+def run_tool(name, arguments):
+    """
+    Run a stock function requested by the model.
+
+    Args:
+        name (str): The function name.
+        arguments (dict): The keyword arguments, including the ticker.
+
+    Returns:
+        str: The function's result, or an error message for unknown functions and missing tickers.
+    """
+    if name not in function_mapping:
+        return f"Error: Unknown function '{name}'."
+    if not isinstance(arguments.get("ticker"), str):
+        return "Error: Please select a stock."
+    ticker = metrics.ticker_label(arguments["ticker"])
+    with FUNCTION_SECONDS.time(function=name, ticker=ticker):
+        result = function_mapping[name](**arguments)
+    FUNCTION_CALLS.inc(function=name, ticker=ticker, outcome="error" if is_error_result(result) else "ok")
+    return result
+
+
+@app.post("/stock-info/batch")
+async def get_stock_info_batch(batch_input: BatchInput):
+    """
+    Answer several stock questions in one request.
+
+    The histories of all distinct tickers are fetched once, in a batched download per period, and
+    the results that need an explanation and are not cached are explained by a single completion.
+    Answers are returned in the order of the questions.
+
+    Args:
+        batch_input (BatchInput): The questions.
+
+    Returns:
+        dict: One answer per question under 'results'. Answers hold the computed 'result' and its
+            explanation as 'response', a final 'response' or 'result' for questions that need no
+            explanation, or an 'error' for empty questions and questions without a stock.
+    """
+    items = batch_input.items
+    if not items:
+        raise HTTPException(status_code=400, detail="Error: Please provide at least one question.")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Error: At most {MAX_BATCH_ITEMS} questions can be sent at once.")
+
+    with STAGE_SECONDS.time(stage="batch_parse"):
+        intents = [parse_intent(item.user_input) if item.user_input.strip() and item.selected_stock else None
+                   for item in items]
+    for item, intent in zip(items, intents):
+        if intent is not None:
+            for ticker in [item.selected_stock] + intent.tickers:
+                prefetcher.record(ticker)
+
+    with STAGE_SECONDS.time(stage="batch_compute"):
+        results = await run_blocking(handle_batch_input, items, intents)
+
+    answers = []
+    pending = {}
+    for position, (item, intent, result) in enumerate(zip(items, intents, results)):
+        if not item.user_input.strip():
+            answers.append({"error": "Error: Please provide a valid input."})
+        elif intent is None:
+            answers.append({"error": "Error: Please select a stock."})
+        elif isinstance(result, dict):
+            answers.append(result)
+        elif intent.action == "compare" or is_error_result(result):
+            answers.append({"result": result})
+        else:
+            answers.append({"result": str(result)})
+            pending[position] = (build_messages(item.selected_stock, item.user_input, result, intent),
+                                 completion_params(intent))
+
+    with STAGE_SECONDS.time(stage="batch_llm"):
+        explanations = await explain_batch([messages for messages, _ in pending.values()],
+                                           [params for _, params in pending.values()])
+    for position, explanation in zip(pending, explanations):
+        answers[position]["response"] = explanation
+    return {"results": answers}
+
+
+def handle_batch_input(items, intents):
+    """
+    Compute the results of several questions, fetching each distinct history once.
+
+    Args:
+        items (List[UserInput]): The questions.
+        intents (List[Intent]): The parsed questions, None for empty ones.
+
+    Returns:
+        List[Any]: The result of each question, None for empty ones. Questions that failed because
+            the market data provider is unavailable get an 'error' reply instead.
+    """
+    tickers_by_period = {}
+    for item, intent in zip(items, intents):
+        if intent is not None and intent.action == "function" and len(intent.intervals) <= 1:
+            interval = intent.params.get("interval", "1d")
+            period = intent.params.get("period") or default_period(interval)
+            tickers_by_period.setdefault((period, interval), []).append(item.selected_stock)
+    for (period, interval), tickers in tickers_by_period.items():
+        try:
+            get_histories(tickers, period, interval)
+        except ValueError:
+            # An interval not available over the period is reported by each question's stock function
+            pass
+
+    results = []
+    for item, intent in zip(items, intents):
+        try:
+            results.append(handle_user_input(item.selected_stock, item.user_input, intent)
+                           if intent is not None else None)
+        except MarketDataError as e:
+            results.append({"error": f"Error: {str(e)} Please try again later."})
+    return results
+
+
+async def explain_batch(messages_list, params_list=None):
+    """
+    Explain several results with as few completions as possible.
+
+    Cached explanations are reused, and the rest are requested together in one numbered prompt.
+    Each answer is cached under its own prompt, so a later single question gets it too. Items the
+    model leaves out are explained one by one.
+
+    Args:
+        messages_list (List[List[Dict[str, str]]]): The single-question messages of each result.
+        params_list (List[dict], optional): The completion parameters of each result (default is
+            COMPLETION_PARAMS for all).
+
+    Returns:
+        List[str]: The explanation of each result, in order.
+    """
+    params_list = params_list or [COMPLETION_PARAMS] * len(messages_list)
+    keys = [response_cache.make_key(messages, **params) for messages, params in zip(messages_list, params_list)]
+    explanations = await run_store(lambda: [response_cache.get(key) for key in keys])
+    missing = [position for position, explanation in enumerate(explanations) if explanation is None]
+    if len(missing) > 1:
+        numbered = "\n".join(f"{number}. {messages_list[position][0]['content']} "
+                              f"{messages_list[position][1]['content']}"
+                              for number, position in enumerate(missing, start=1))
+        messages = [
+            {"role": "system", "content": BATCH_INSTRUCTIONS},
+            {"role": "user", "content": numbered},
+        ]
+        params = {**COMPLETION_PARAMS, "max_tokens": sum(params_list[position]["max_tokens"] for position in missing),
+                  "stop": ["User:", "System:"]}
+        response = await generate_response(messages, params)
+        if response in (RATE_LIMIT_MESSAGE, TIMEOUT_MESSAGE):
+            return [explanation or response for explanation in explanations]
+
+        lines = {int(number): text for number, text in NUMBERED_LINE_PATTERN.findall(response)}
+        answered = {position: lines[number] for number, position in enumerate(missing, start=1) if lines.get(number)}
+
+        def cache_answers():
+            for position, text in answered.items():
+                response_cache.put(keys[position], text)
+
+        for position, text in answered.items():
+            explanations[position] = text
+        await run_store(cache_answers)
+
+    missing = [position for position, explanation in enumerate(explanations) if explanation is None]
+    singles = await asyncio.gather(*(generate_response(messages_list[position], params_list[position])
+                                     for position in missing))
+    for position, explanation in zip(missing, singles):
+        explanations[position] = explanation
+    return explanations
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Expose request timings and cache counters in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: The metrics.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = 10):
+    """
+    Sample the stacks of all threads for a while, when the profiler is enabled.
+
+    Args:
+        seconds (float, optional): How long to record (default is 10).
+
+    Returns:
+        PlainTextResponse: The sampled stacks in collapsed-stack format, for flame graph tools.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Error: The profiler is disabled.")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400,
+                            detail=f"Error: seconds must be between 0 and {PROFILER_MAX_SECONDS:g}.")
+
+    try:
+        profiler.start()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=f"Error: {str(e)}")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        stacks = profiler.stop()
+    return PlainTextResponse(stacks)
+
+
+@app.get("/chart/{ticker}")
+async def get_chart(ticker: str, request: Request, period: str = "1y", overlays: str = "", width: int = 800,
+                    height: int = 480, format: str = "png", interval: str = "1d"):
+    """
+    Render a price chart with optional indicator overlays.
+
+    Images are cached by ticker, period, interval, overlays, size, format and the latest bar, and carry an ETag
+    so clients can revalidate with If-None-Match and get a 304 without a new render.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        request (Request): The HTTP request, for conditional headers.
+        period (str, optional): The time period to plot (default is '1y').
+        overlays (str, optional): Comma-separated overlays: 'sma', 'ema' and 'macd'.
+        width (int, optional): The image width in pixels (default is 800).
+        height (int, optional): The image height in pixels (default is 480).
+        format (str, optional): 'png' or 'svg' (default is 'png').
+        interval (str, optional): The bar interval, e.g. '5m' or '1wk' (default is '1d').
+
+    Returns:
+        Response: The image, or an empty 304 response if the client's copy is current.
+    """
+    if format not in CHART_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Error: format must be one of: {', '.join(CHART_FORMATS)}.")
+    try:
+        overlays = parse_overlays(overlays)
+        validate_size(width, height)
+        data = await run_blocking(get_chart_data, ticker, period, overlays, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+
+    etag = data.etag(width, height, format)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    image = chart_cache.get(etag)
+    if image is None:
+        image = await render_in_pool(data.ticker, data.dates, data.close, data.series, data.overlays, width,
+                                     height, format)
+        chart_cache.put(etag, image)
+    return Response(image, media_type=CHART_FORMATS[format], headers=headers)
+
+
+async def render_in_pool(*args):
+    """
+    Render a chart in the chart process pool.
+
+    Args:
+        *args: Positional arguments for render_chart.
+
+    Returns:
+        bytes: The encoded image.
+
+    Raises:
+        HTTPException: If rendering does not finish within CHART_TIMEOUT.
+    """
+    global chart_pool
+    if chart_pool is None:
+        chart_pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(chart_pool, functools.partial(render_chart, *args)),
+                                      CHART_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Error: Rendering the chart timed out. Please try again.")
+
+
+@app.get("/volume/{ticker}")
+async def get_volume(ticker: str, start: str = None, end: str = None, resample: str = "daily",
+                     format: str = "ndjson", offset: int = 0, limit: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream the trading volume history for a stock.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        start (str, optional): First date to include, e.g. '2020-01-01'.
+        end (str, optional): Last date to include.
+        resample (str, optional): 'daily', 'weekly' or 'monthly' (default is 'daily').
+        format (str, optional): 'ndjson' for JSON lines or 'arrow' for an Arrow IPC stream.
+        offset (int, optional): Number of rows to skip (default is 0).
+        limit (int, optional): Maximum number of rows to return (default is all).
+        chunk_size (int, optional): Rows serialized per chunk (default is 1000).
+
+    Returns:
+        StreamingResponse: The volume rows, streamed in chunks.
+    """
+    if format not in ("ndjson", "arrow"):
+        raise HTTPException(status_code=400, detail="Error: format must be 'ndjson' or 'arrow'.")
+    if offset < 0 or (limit is not None and limit < 0) or chunk_size < 1:
+        raise HTTPException(status_code=400, detail="Error: offset, limit and chunk_size must be positive.")
+
+    try:
+        volume = await run_blocking(get_volume_series, ticker, start, end, resample, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+
+    if format == "arrow":
+        return StreamingResponse(iter_volume_arrow(volume, chunk_size),
+                                 media_type="application/vnd.apache.arrow.stream")
+    return StreamingResponse(iter_volume_ndjson(volume, chunk_size), media_type="application/x-ndjson")
+
+
+def get_function_context(user_input, intent=None):
     """
     Get additional context based on the function selected by the user.
 
     Args:
         user_input (str): The user input indicating the selected function.
+        intent (Intent, optional): The already parsed user input (default parses it).
 
     Returns:
         str: Additional context or commentary based on the function.
     """
-    patterns = {
-        "get_stock_price": r"price|current price|stock price|price of",
-        "get_stock_volume": r"volume|stock volume|trading volume|number of shares traded",
-        "calculate_sma": r"SMA|simple moving average",
-        "calculate_ema": r"EMA|exponential moving average",
-        "calculate_rsi": r"RSI|relative strength index",
-        "calculate_macd": r"MACD|moving average convergence divergence"
-    }
+    intent = intent or parse_intent(user_input)
+    if intent.function_name is None:
+        return "(No specific context found for the given function.)"
+    return FUNCTION_CONTEXTS.get(intent.function_name,
+                                 "(Additional context or commentary for the selected function can be added here.)")
 
-    for func_name, pattern in patterns.items():
-        if re.search(pattern, user_input, re.IGNORECASE):
-            if "sma" in user_input.lower():
-                return ("(Simple Moving Average is a commonly used indicator to analyze stock trends. A higher SMA "
-                        "value may indicate a bullish trend, while a lower value may suggest a bearish trend.)")
-            elif "ema" in user_input.lower():
-                return ("(Exponential Moving Average is a type of moving average that places more weight on recent "
-                        "data points. It is often used to identify trend direction.)")
-            elif "rsi" in user_input.lower():
-                return ("(Relative Strength Index is a momentum oscillator that measures the speed and change of "
-                        "price movements. RSI values above 70 may indicate overbought conditions, while values "
-                        "below 30 may indicate oversold conditions.)")
-            elif "macd" in user_input.lower():
-                return ("(Moving Average Convergence Divergence is a trend-following momentum indicator that "
-                        "shows the relationship between two moving averages of a security’s price. MACD signals "
-                        "potential buy and sell opportunities.)")
-            elif "price" in user_input.lower():
-                return "(Price refers to the current trading price of the selected stock.)"
-            elif "volume" in user_input.lower():
-                return "(Volume refers to the number of shares traded for the selected stock.)"
-            else:
-                return "(Additional context or commentary for the selected function can be added here.)"
-
-    return "(No specific context found for the given function.)"
-
-
-def compare_stocks(user_input, selected_stock, result):
-    """
-    Compare two stocks based on the user input function and comparison operators.
+
+def compare_stocks(user_input, selected_stock, result, intent=None):
+    """
+    Compare the selected stock with other stocks based on the user input function and comparison operators.
 
     Args:
         user_input (str): The user input containing the comparison query.
         selected_stock (str): The selected stock ticker.
         result (str): The result of the called function for the selected stock.
+        intent (Intent, optional): The already parsed user input (default parses it).
 
     Returns:
         str: The comparison result.
     """
-    other_stock = None
-    comparison_operator = None
-
-    for stock in ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN"]:
-        if stock != selected_stock and stock.lower() in user_input.lower():
-            other_stock = stock
-            break
-
-    if other_stock:
-        if "rsi" in user_input.lower():
-            # For demonstration purposes, assume random RSI values
-            rsi_selected = np.random.uniform(0, 100)
-            rsi_other = np.random.uniform(0, 100)
-            if "better than" in user_input.lower():
-                comparison_operator = "better than"
-                if rsi_selected > rsi_other:
-                    return f"The RSI for {selected_stock} ({rsi_selected:.2f}) is {comparison_operator} the RSI for {other_stock} ({rsi_other:.2f})."
-                else:
-                    return f"The RSI for {selected_stock} ({rsi_selected:.2f}) is not {comparison_operator} the RSI for {other_stock} ({rsi_other:.2f})."
-            elif "worse than" in user_input.lower():
-                comparison_operator = "worse than"
-                if rsi_selected < rsi_other:
-                    return f"The RSI for {selected_stock} ({rsi_selected:.2f}) is {comparison_operator} the RSI for {other_stock} ({rsi_other:.2f})."
-                else:
-                    return f"The RSI for {selected_stock} ({rsi_selected:.2f}) is not {comparison_operator} the RSI for {other_stock} ({rsi_other:.2f})."
-            else:
-                return f"Please specify 'better than' or 'worse than' for comparison."
-        elif "sma" in user_input.lower():
-            # For demonstration purposes, assume random SMA values
-            sma_selected = np.random.uniform(0, 100)
-            sma_other = np.random.uniform(0, 100)
-            if "better than" in user_input.lower():
-                comparison_operator = "better than"
-                if sma_selected > sma_other:
-                    return f"The SMA for {selected_stock} ({sma_selected:.2f}) is {comparison_operator} the SMA for {other_stock} ({sma_other:.2f})."
-                else:
-                    return f"The SMA for {selected_stock} ({sma_selected:.2f}) is not {comparison_operator} the SMA for {other_stock} ({sma_other:.2f})."
-            elif "worse than" in user_input.lower():
-                comparison_operator = "worse than"
-                if sma_selected < sma_other:
-                    return f"The SMA for {selected_stock} ({sma_selected:.2f}) is {comparison_operator} the SMA for {other_stock} ({sma_other:.2f})."
-                else:
-                    return f"The SMA for {selected_stock} ({sma_selected:.2f}) is not {comparison_operator} the SMA for {other_stock} ({sma_other:.2f})."
-            else:
-                return f"Please specify 'better than' or 'worse than' for comparison."
-        elif "ema" in user_input.lower():
-            # For demonstration purposes, assume random EMA values
-            ema_selected = np.random.uniform(0, 100)
-            ema_other = np.random.uniform(0, 100)
-            if "better than" in user_input.lower():
-                comparison_operator = "better than"
-                if ema_selected > ema_other:
-                    return f"The EMA for {selected_stock} ({ema_selected:.2f}) is {comparison_operator} the EMA for {other_stock} ({ema_other:.2f})."
-                else:
-                    return f"The EMA for {selected_stock} ({ema_selected:.2f}) is not {comparison_operator} the EMA for {other_stock} ({ema_other:.2f})."
-            elif "worse than" in user_input.lower():
-                comparison_operator = "worse than"
-                if ema_selected < ema_other:
-                    return f"The EMA for {selected_stock} ({ema_selected:.2f}) is {comparison_operator} the EMA for {other_stock} ({ema_other:.2f})."
-                else:
-                    return f"The EMA for {selected_stock} ({ema_selected:.2f}) is not {comparison_operator} the EMA for {other_stock} ({ema_other:.2f})."
-            else:
-                return f"Please specify 'better than' or 'worse than' for comparison."
-        elif "macd" in user_input.lower():
-            # For demonstration purposes, assume random MACD values
-            macd_selected = np.random.uniform(0, 100)
-            macd_other = np.random.uniform(0, 100)
-            if "better than" in user_input.lower():
-                comparison_operator = "better than"
-                if macd_selected > macd_other:
-                    return f"The MACD for {selected_stock} ({macd_selected:.2f}) is {comparison_operator} the MACD for {other_stock} ({macd_other:.2f})."
-                else:
-                    return f"The MACD for {selected_stock} ({macd_selected:.2f}) is not {comparison_operator} the MACD for {other_stock} ({macd_other:.2f})."
-            elif "worse than" in user_input.lower():
-                comparison_operator = "worse than"
-                if macd_selected < macd_other:
-                    return f"The MACD for {selected_stock} ({macd_selected:.2f}) is {comparison_operator} the MACD for {other_stock} ({macd_other:.2f})."
-                else:
-                    return f"The MACD for {selected_stock} ({macd_selected:.2f}) is not {comparison_operator} the MACD for {other_stock} ({macd_other:.2f})."
-            else:
-                return f"Please specify 'better than' or 'worse than' for comparison."
-        else:
-            return f"Comparison for the specified function is not supported."
-    else:
+    intent = intent or parse_intent(user_input)
+    other_stocks = [ticker for ticker in intent.tickers if ticker != selected_stock.strip().upper()]
+    if not other_stocks:
         return f"Comparison requires two stocks. Please mention the other stock for comparison."
 
+    indicator = intent.indicator
+    if indicator not in COMPARABLE_INDICATORS:
+        return f"Comparison for the specified function is not supported."
+
+    comparison_operator = intent.comparison
+    if comparison_operator is None:
+        return f"Please specify 'better than' or 'worse than' for comparison."
+
+    label = indicator.upper()
+    interval = intent.params.get("interval", "1d")
+    try:
+        ranking = rank_stocks([selected_stock] + other_stocks, indicator,
+                              intent.params.get("period") or default_period(interval), intent.params.get("window"),
+                              interval=interval)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    values = {entry["ticker"]: entry["value"] for entry in ranking}
+    selected_value = values.get(selected_stock.strip().upper())
+    if selected_value is None:
+        return f"Error calculating {label} for {selected_stock}."
+
+    comparisons = []
+    for other_stock in other_stocks:
+        other_value = values.get(other_stock)
+        if other_value is None:
+            comparisons.append(f"Error calculating {label} for {other_stock}.")
+            continue
+        if comparison_operator == "better than":
+            holds = selected_value > other_value
+        else:
+            holds = selected_value < other_value
+        verb = "is" if holds else "is not"
+        comparisons.append(f"The {label} for {selected_stock} ({selected_value:.2f}) {verb} {comparison_operator} "
+                           f"the {label} for {other_stock} ({other_value:.2f}).")
+    return " ".join(comparisons)
+
+
+@app.post("/compare")
+async def compare(compare_input: CompareInput):
+    """
+    Rank several stocks by an indicator, fetching all of them in one batched download.
+
+    Args:
+        compare_input (CompareInput): The tickers, indicator and ranking options.
+
+    Returns:
+        dict: The indicator, period and ranked results.
+    """
+    if not compare_input.tickers:
+        raise HTTPException(status_code=400, detail="Error: Please provide at least one ticker.")
+    if len(compare_input.tickers) > MAX_COMPARE_TICKERS:
+        raise HTTPException(status_code=400,
+                            detail=f"Error: At most {MAX_COMPARE_TICKERS} tickers can be compared at once.")
+
+    for ticker in compare_input.tickers:
+        prefetcher.record(ticker)
+
+    # Cold tickers are fetched at the upstream rate, so a long list gets the time the rate limit needs
+    timeout = FETCH_TIMEOUT + market_data.queue_time(len(compare_input.tickers))
+    try:
+        ranking = await run_blocking(rank_stocks, compare_input.tickers, compare_input.indicator,
+                                     compare_input.period, compare_input.window, compare_input.ascending,
+                                     compare_input.interval, timeout=timeout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+
+    return {"indicator": compare_input.indicator, "period": compare_input.period,
+            "interval": compare_input.interval, "results": ranking}
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,529 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import LazyModule
+from metrics import metrics
+
+yf = LazyModule("yfinance")
+
+MARKET_DATA_RATE = float(os.getenv("MARKET_DATA_RATE", "5"))
+MARKET_DATA_BURST = int(os.getenv("MARKET_DATA_BURST", "20"))
+MARKET_DATA_MAX_WAIT = float(os.getenv("MARKET_DATA_MAX_WAIT", "5"))
+MARKET_DATA_MAX_RETRIES = int(os.getenv("MARKET_DATA_MAX_RETRIES", "3"))
+MARKET_DATA_BACKOFF_BASE = float(os.getenv("MARKET_DATA_BACKOFF_BASE", "0.5"))
+MARKET_DATA_BACKOFF_MAX = float(os.getenv("MARKET_DATA_BACKOFF_MAX", "8"))
+MARKET_DATA_BREAKER_THRESHOLD = int(os.getenv("MARKET_DATA_BREAKER_THRESHOLD", "5"))
+MARKET_DATA_BREAKER_RESET = float(os.getenv("MARKET_DATA_BREAKER_RESET", "30"))
+MARKET_DATA_POOL_SIZE = int(os.getenv("MARKET_DATA_POOL_SIZE", "20"))
+
+UPSTREAM_REQUESTS = metrics.counter("market_data_requests_total", "HTTP requests to the market data provider.",
+                                    ("outcome",))
+
+
+class MarketDataError(Exception):
+    """
+    Base class for market data failures that are not about the requested ticker.
+
+    Attributes:
+        retry_after (float): Seconds after which the call may succeed, or None if unknown.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitedError(MarketDataError):
+    """The market data provider rejected a request because its quota was exceeded."""
+
+
+class ThrottledError(RateLimitedError):
+    """No request token became available in time, so the request was not sent."""
+
+
+class UpstreamUnavailableError(MarketDataError):
+    """The market data provider failed with a server error, a timeout or a connection error."""
+
+
+class CircuitOpenError(MarketDataError):
+    """Requests are paused after repeated upstream failures."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of upstream requests.
+
+    Tokens are added at `rate` per second up to `capacity`, which allows short bursts. A caller that
+    finds the bucket empty reserves the next token and sleeps until it is due, so waiting callers
+    are served in order.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int): Maximum number of tokens, i.e. the largest burst.
+            clock (Callable[[], float], optional): Monotonic clock.
+            sleep (Callable[[float], None], optional): Sleeps for a number of seconds.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def acquire(self, max_wait=None):
+        """
+        Take a token, waiting for one if the bucket is empty.
+
+        Args:
+            max_wait (float, optional): Give up instead of waiting longer than this (default waits).
+
+        Returns:
+            bool: Whether a token was taken.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+        if wait > 0:
+            self.sleep(wait)
+        return True
+
+    def available(self):
+        """
+        Get the number of tokens that could be taken now.
+
+        Returns:
+            float: The tokens, negative while waiting callers hold reservations.
+        """
+        with self._lock:
+            return min(self.capacity, self._tokens + (self.clock() - self._updated) * self.rate)
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing upstream for a while instead of piling up slow failures.
+
+    The circuit opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. It then lets a single trial call through (half-open): a success closes
+    the circuit and a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a trial call.
+            clock (Callable[[], float], optional): Monotonic clock.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check that a call may go ahead.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a trial call in flight.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - self.clock()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError("Market data requests are paused after repeated upstream failures.",
+                                           retry_after=remaining)
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    self.rejected += 1
+                    raise CircuitOpenError("Market data requests are paused while the upstream recovers.",
+                                           retry_after=self.reset_timeout)
+                self._trial = True
+
+    def record_success(self):
+        """Close the circuit and reset the failure count."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        """Count a failure, opening the circuit at the threshold or after a failed trial call."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+            self._trial = False
+
+    def release(self):
+        """End a call that says nothing about the upstream's health, such as one throttled locally."""
+        with self._lock:
+            self._trial = False
+
+
+class _CallContext:
+    """
+    The outcome of one upstream call, written by the transport adapter for requests made on its behalf.
+
+    Attributes:
+        max_wait (float): Longest wait for a request token, or None to wait as long as needed.
+        error (MarketDataError): The last upstream failure seen during the call, or None.
+    """
+
+    __slots__ = ("max_wait", "error")
+
+    def __init__(self, max_wait):
+        self.max_wait = max_wait
+        self.error = None
+
+
+class _ThrottledAdapter:
+    """
+    A requests transport adapter that rate-limits and classifies every upstream request.
+
+    It wraps a pooled HTTPAdapter, so connections are kept alive and reused across calls. Failures
+    are reported to the call the request belongs to only, so one failed request never fails the
+    other calls in flight.
+    """
+
+    def __init__(self, client, adapter):
+        self.client = client
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        if not self.client.limiter.acquire(self.client.token_wait()):
+            UPSTREAM_REQUESTS.inc(outcome="throttled")
+            error = ThrottledError("The market data request quota is exhausted.", retry_after=1 / self.client.rate)
+            self.client.record_failure(error)
+            raise error
+        try:
+            response = self.adapter.send(request, **kwargs)
+        except Exception as e:
+            UPSTREAM_REQUESTS.inc(outcome="connection_error")
+            self.client.record_failure(UpstreamUnavailableError(
+                f"The market data provider could not be reached ({type(e).__name__})."))
+            raise
+        if response.status_code == 429:
+            UPSTREAM_REQUESTS.inc(outcome="rate_limited")
+            self.client.record_failure(RateLimitedError("The market data provider is rate limiting requests.",
+                                                        retry_after=_retry_after(response)))
+        elif response.status_code >= 500:
+            UPSTREAM_REQUESTS.inc(outcome="server_error")
+            self.client.record_failure(UpstreamUnavailableError(
+                f"The market data provider is unavailable (HTTP {response.status_code}).",
+                retry_after=_retry_after(response)))
+        else:
+            UPSTREAM_REQUESTS.inc(outcome="ok")
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+def _retry_after(response):
+    """
+    Read the Retry-After header of a response.
+
+    Args:
+        response (requests.Response): The response.
+
+    Returns:
+        float: The delay in seconds, or None if the header is missing or not a number of seconds.
+    """
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+class MarketDataClient:
+    """
+    Rate-limited, retrying access to yfinance over a shared pooled HTTP session.
+
+    Every HTTP request takes a token from a bucket sized to the upstream quota. Failed calls are
+    retried with jittered exponential backoff, and a circuit breaker stops calling the upstream after
+    repeated failures. Failures surface as MarketDataError subclasses instead of the empty frames
+    yfinance returns, so callers can tell an outage apart from a ticker without data.
+    """
+
+    def __init__(self, rate=MARKET_DATA_RATE, burst=MARKET_DATA_BURST, max_wait=MARKET_DATA_MAX_WAIT,
+                 max_retries=MARKET_DATA_MAX_RETRIES, backoff_base=MARKET_DATA_BACKOFF_BASE,
+                 backoff_max=MARKET_DATA_BACKOFF_MAX, failure_threshold=MARKET_DATA_BREAKER_THRESHOLD,
+                 reset_timeout=MARKET_DATA_BREAKER_RESET, pool_size=MARKET_DATA_POOL_SIZE, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Args:
+            rate (float, optional): Upstream requests per second.
+            burst (int, optional): Requests that may be sent at once after a quiet period.
+            max_wait (float, optional): Longest wait for a request token before giving up.
+            max_retries (int, optional): Retries after a failed call.
+            backoff_base (float, optional): Backoff ceiling in seconds for the first retry; it doubles
+                with every retry.
+            backoff_max (float, optional): Largest backoff in seconds.
+            failure_threshold (int, optional): Consecutive failures that open the circuit.
+            reset_timeout (float, optional): Seconds the circuit stays open.
+            pool_size (int, optional): Connections kept alive to the upstream.
+            clock (Callable[[], float], optional): Monotonic clock.
+            sleep (Callable[[float], None], optional): Sleeps for a number of seconds.
+        """
+        self.rate = rate
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.sleep = sleep
+        self.limiter = TokenBucket(rate, burst, clock, sleep)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self._session = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.calls = 0
+        self.retries = 0
+
+    @property
+    def session(self):
+        """The shared requests.Session, created on first use."""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = _ThrottledAdapter(self, HTTPAdapter(pool_connections=self.pool_size,
+                                                              pool_maxsize=self.pool_size))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def history(self, ticker, period=None, interval='1d', start=None):
+        """
+        Download the price history of a ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            period (str, optional): The time period to fetch (e.g. '1y', 'max').
+            interval (str, optional): The bar interval (default is '1d').
+            start (pandas.Timestamp, optional): Fetch from this bar onwards instead of a period.
+
+        Returns:
+            pandas.DataFrame: The OHLCV history; empty if the ticker has no data.
+
+        Raises:
+            MarketDataError: If the upstream is unavailable or rate limiting.
+        """
+        range_args = {"start": start} if start is not None else {"period": period}
+        return self.call(lambda: yf.Ticker(ticker, session=self.session).history(interval=interval, **range_args))
+
+    def download(self, tickers, period, interval='1d'):
+        """
+        Download the price histories of several tickers concurrently.
+
+        yfinance requests each ticker separately, so the requests are sent in parallel over the
+        pooled session. Each ticker is its own call, retried and counted by the circuit breaker on
+        its own, so a failed ticker is retried without fetching the others again. The caller sized
+        the batch, so its requests wait for tokens as long as the rate limit needs instead of being
+        throttled after max_wait; see queue_time.
+
+        Args:
+            tickers (List[str]): The stock ticker symbols.
+            period (str): The time period to fetch (e.g. '1y', 'max').
+            interval (str, optional): The bar interval (default is '1d').
+
+        Returns:
+            dict: Maps each ticker to its OHLCV history; empty for tickers without data.
+
+        Raises:
+            MarketDataError: If a ticker still fails after its retries, once every ticker is done.
+        """
+        def fetch(ticker):
+            return self.call(lambda: yf.Ticker(ticker, session=self.session).history(period=period,
+                                                                                     interval=interval),
+                             patient=True)
+
+        futures = [self.pool.submit(fetch, ticker) for ticker in tickers]
+        histories, error = {}, None
+        for ticker, future in zip(tickers, futures):
+            try:
+                histories[ticker] = future.result()
+            except MarketDataError as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return histories
+
+    @property
+    def pool(self):
+        """The threads that fetch the tickers of a download, started on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="market-data")
+            return self._pool
+
+    def call(self, func, patient=False):
+        """
+        Run an upstream call through the circuit breaker, retrying failures with backoff.
+
+        yfinance catches most HTTP errors and returns an empty frame instead, so a call counts as
+        failed when the adapter saw an upstream failure in one of the call's own requests. Each
+        failed attempt counts once toward the circuit breaker.
+
+        Args:
+            func (Callable[[], Any]): The call.
+            patient (bool, optional): Wait for request tokens as long as the rate limit needs instead
+                of at most max_wait.
+
+        Returns:
+            Any: The call's return value.
+
+        Raises:
+            MarketDataError: If the circuit is open or the call still fails after the retries.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            with self._lock:
+                self.calls += 1
+            context = _CallContext(None if patient else self.max_wait)
+            try:
+                result = self._run_in(context, func)
+                exception = None
+            except Exception as e:
+                result, exception = None, e
+            error = context.error
+
+            if error is None:
+                self.breaker.record_success()
+                if exception is not None:
+                    raise exception
+                return result
+            if isinstance(error, ThrottledError):
+                self.breaker.release()
+                raise error
+
+            self.breaker.record_failure()
+            delay = self.backoff(attempt, error.retry_after)
+            if attempt >= self.max_retries or delay is None:
+                raise error
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            self.sleep(delay)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Get the delay before a retry, using exponential backoff with full jitter.
+
+        Args:
+            attempt (int): The number of retries so far.
+            retry_after (float, optional): The delay the upstream asked for.
+
+        Returns:
+            float: Seconds to wait, or None if the upstream asked for a longer wait than backoff_max.
+        """
+        if retry_after is not None and retry_after > self.backoff_max:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    def queue_time(self, requests):
+        """
+        Estimate how long the rate limit holds back a number of requests sent at once.
+
+        Args:
+            requests (int): The number of upstream requests.
+
+        Returns:
+            float: Seconds until the last of them gets its token.
+        """
+        return max(0.0, requests - self.limiter.available()) / self.rate
+
+    def token_wait(self):
+        """
+        Get the longest wait for a request token allowed to the call running on this thread.
+
+        Returns:
+            float: Seconds, or None to wait as long as needed.
+        """
+        context = getattr(self._local, "context", None)
+        return self.max_wait if context is None else context.max_wait
+
+    def record_failure(self, error):
+        """
+        Note an upstream failure seen by the transport adapter, for the call running on this thread.
+
+        Args:
+            error (MarketDataError): The failure.
+        """
+        context = getattr(self._local, "context", None)
+        if context is not None:
+            context.error = error
+
+    def _run_in(self, context, func):
+        """
+        Run a function with its upstream requests reported to a call.
+
+        Args:
+            context (_CallContext): The call.
+            func (Callable[[], Any]): The function.
+
+        Returns:
+            Any: The function's return value.
+        """
+        previous = getattr(self._local, "context", None)
+        self._local.context = context
+        try:
+            return func()
+        finally:
+            self._local.context = previous
+
+    def stats(self):
+        """
+        Get the client counters.
+
+        Returns:
+            dict: Calls, retries, whether the circuit is open, consecutive failures, calls rejected
+                by the open circuit, requests throttled locally and request tokens available.
+        """
+        with self._lock:
+            calls, retries = self.calls, self.retries
+        return {
+            "calls": calls,
+            "retries": retries,
+            "circuit_open": int(self.breaker.state != CircuitBreaker.CLOSED),
+            "consecutive_failures": self.breaker.failures,
+            "rejected": self.breaker.rejected,
+            "throttled": self.limiter.throttled,
+            "tokens": round(self.limiter.available(), 3),
+        }
+
+
+market_data = MarketDataClient()
+metrics.register_stats("market_data", "Market data client counters.", market_data.stats)
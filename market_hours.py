@@ -0,0 +1,80 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def _market_now(now=None):
+    """
+    Convert a timestamp to the exchange's local time.
+
+    Args:
+        now (datetime, optional): An aware datetime (default is the current time).
+
+    Returns:
+        datetime: The timestamp in New York time.
+    """
+    if now is None:
+        return datetime.now(MARKET_TZ)
+    return now.astimezone(MARKET_TZ)
+
+
+def is_market_open(now=None):
+    """
+    Check whether the US equity market is in its regular trading session.
+
+    Exchange holidays are not taken into account, so a holiday weekday is treated as a trading day.
+
+    Args:
+        now (datetime, optional): An aware datetime to check (default is the current time).
+
+    Returns:
+        bool: True between 09:30 and 16:00 New York time on weekdays.
+    """
+    local = _market_now(now)
+    if local.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= local.time() < MARKET_CLOSE
+
+
+def seconds_until_open(now=None):
+    """
+    Get the number of seconds until the next regular session opens.
+
+    Args:
+        now (datetime, optional): An aware datetime to measure from (default is the current time).
+
+    Returns:
+        float: Seconds until the next open, or 0 if the market is open now.
+    """
+    local = _market_now(now)
+    if is_market_open(local):
+        return 0.0
+
+    next_open = local.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if local.time() >= MARKET_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return (next_open.astimezone(timezone.utc) - local.astimezone(timezone.utc)).total_seconds()
+
+
+def previous_close(now=None):
+    """
+    Get the most recent regular session close at or before a timestamp.
+
+    Args:
+        now (datetime, optional): An aware datetime to measure from (default is the current time).
+
+    Returns:
+        datetime: The previous 16:00 New York close on a weekday.
+    """
+    local = _market_now(now)
+    close = local.replace(hour=MARKET_CLOSE.hour, minute=MARKET_CLOSE.minute, second=0, microsecond=0)
+    if local < close:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_MAX_TICKERS = int(os.getenv("METRICS_MAX_TICKERS", "200"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OTHER_TICKER = "other"
+
+
+def _format_labels(names, values, extra=()):
+    """
+    Format label pairs in the Prometheus text exposition format.
+
+    Args:
+        names (Tuple[str, ...]): The label names.
+        values (Tuple[str, ...]): The label values, in the same order.
+        extra (Iterable[Tuple[str, str]], optional): More (name, value) pairs to append.
+
+    Returns:
+        str: The formatted labels, e.g. '{stage="llm"}', or an empty string without labels.
+    """
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    """Format a sample value, writing whole numbers without a decimal point."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing count, one per combination of label values.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Tuple[str, ...], optional): The label names.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the count.
+
+        Args:
+            amount (float, optional): The increment (default is 1).
+            **labels: A value for every label name.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """
+        Get the exposition lines of the metric.
+
+        Returns:
+            List[str]: One line per label combination.
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """
+    A distribution of observed values in cumulative buckets, one per combination of label values.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Tuple[str, ...], optional): The label names.
+            buckets (Tuple[float, ...], optional): Upper bounds of the buckets, in increasing order.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record a value.
+
+        Args:
+            value (float): The observed value.
+            **labels: A value for every label name.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of a block in seconds, including when it raises.
+
+        Args:
+            **labels: A value for every label name.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        """
+        Get the exposition lines of the metric.
+
+        Returns:
+            List[str]: The bucket, sum and count lines of every label combination.
+        """
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The set of metrics exposed on /metrics.
+
+    Besides counters and histograms updated in place, the registry exposes the `stats()` counters of
+    the caches as gauges that are read when the metrics are rendered. Per-ticker labels are bounded:
+    after `max_tickers` distinct tickers, new ones are reported as 'other'.
+    """
+
+    def __init__(self, max_tickers=METRICS_MAX_TICKERS):
+        """
+        Args:
+            max_tickers (int, optional): Maximum number of distinct ticker label values.
+        """
+        self.max_tickers = max_tickers
+        self._metrics = {}
+        self._stats = {}
+        self._tickers = set()
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Create and register a counter.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Tuple[str, ...], optional): The label names.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Create and register a histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Tuple[str, ...], optional): The label names.
+            buckets (Tuple[float, ...], optional): Upper bounds of the buckets, in increasing order.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(self, prefix, documentation, stats):
+        """
+        Expose the numeric values of a stats dictionary as gauges named '{prefix}_{key}'.
+
+        Args:
+            prefix (str): The metric name prefix.
+            documentation (str): The help text, shared by all the gauges.
+            stats (Callable[[], dict]): Returns the current stats.
+        """
+        with self._lock:
+            self._stats[prefix] = (documentation, stats)
+
+    def ticker_label(self, ticker):
+        """
+        Get the label value for a ticker, bounding the number of distinct values.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+
+        Returns:
+            str: The normalized ticker, or 'other' once the limit is reached.
+        """
+        symbol = str(ticker).strip().upper()
+        with self._lock:
+            if symbol in self._tickers:
+                return symbol
+            if len(self._tickers) < self.max_tickers:
+                self._tickers.add(symbol)
+                return symbol
+        return OTHER_TICKER
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            stats = list(self._stats.items())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for prefix, (documentation, read_stats) in stats:
+            for key, value in read_stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{key}"
+                    lines.append(f"# HELP {name} {documentation}")
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (Counter | Histogram): The metric.
+
+        Returns:
+            Counter | Histogram: The metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from market_data import MarketDataError
+from market_hours import is_market_open
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "10"))
+PREFETCH_BUDGET_PER_HOUR = int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "600"))
+PREFETCH_INTERVAL_OPEN = float(os.getenv("PREFETCH_INTERVAL_OPEN", "30"))
+PREFETCH_INTERVAL_CLOSED = float(os.getenv("PREFETCH_INTERVAL_CLOSED", "900"))
+PREFETCH_HALF_LIFE = float(os.getenv("PREFETCH_HALF_LIFE", "3600"))
+PREFETCH_MAX_TRACKED = int(os.getenv("PREFETCH_MAX_TRACKED", "10000"))
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchScheduler:
+    """
+    Keep the histories and indicators of the most requested tickers warm.
+
+    Request frequency is tracked per ticker with exponentially decaying counts, for a bounded number
+    of tickers: the least recently requested one is forgotten first. Each cycle, the top-K
+    tickers whose cached history is missing or will expire before the next cycle are refreshed in one
+    batched fetch, and their indicators are precomputed. Cycles run often while the market is open
+    and rarely while it is closed, and the number of tickers fetched per rolling hour is capped by an
+    upstream request budget.
+
+    When several worker processes serve the app, a leader check lets only one of them run cycles;
+    the others publish nothing and rely on the histories it shares.
+    """
+
+    def __init__(self, cache, warm, top_k=PREFETCH_TOP_K, budget_per_hour=PREFETCH_BUDGET_PER_HOUR,
+                 interval_open=PREFETCH_INTERVAL_OPEN, interval_closed=PREFETCH_INTERVAL_CLOSED,
+                 half_life=PREFETCH_HALF_LIFE, max_tracked=PREFETCH_MAX_TRACKED, period='1y', interval='1d',
+                 clock=time.monotonic, leader=None):
+        """
+        Args:
+            cache (HistoryCache): The history cache to keep warm.
+            warm (Callable[[str, str], Any]): Precomputes indicators for (ticker, period).
+            top_k (int, optional): Number of hot tickers to keep warm.
+            budget_per_hour (int, optional): Maximum ticker fetches per rolling hour.
+            interval_open (float, optional): Seconds between cycles during market hours.
+            interval_closed (float, optional): Seconds between cycles outside market hours.
+            half_life (float, optional): Seconds after which a request counts half as much.
+            max_tracked (int, optional): Number of tickers whose requests are counted.
+            period (str, optional): The history period to keep warm (default is '1y').
+            interval (str, optional): The bar interval to keep warm (default is '1d').
+            clock (Callable[[], float], optional): Monotonic clock.
+            leader (Callable[[float], bool], optional): Takes or renews leadership for the given
+                seconds and returns whether this process leads; cycles are skipped when it does not.
+                Every process leads when omitted.
+        """
+        self.cache = cache
+        self.warm = warm
+        self.top_k = top_k
+        self.budget_per_hour = budget_per_hour
+        self.interval_open = interval_open
+        self.interval_closed = interval_closed
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self.period = period
+        self.interval = interval
+        self.clock = clock
+        self.leader = leader
+        self._scores = OrderedDict()
+        self._fetches = deque()
+        self._lock = threading.Lock()
+        self.cycles = 0
+        self.refreshed = 0
+        self.deferred = 0
+        self.skipped = 0
+
+    def record(self, ticker):
+        """
+        Count a request for a ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+        """
+        symbol = ticker.strip().upper()
+        if not symbol:
+            return
+        now = self.clock()
+        with self._lock:
+            score, updated_at = self._scores.pop(symbol, (0.0, now))
+            self._scores[symbol] = (self._decay(score, now - updated_at) + 1.0, now)
+            # Random symbols must not grow the table without bound
+            while len(self._scores) > self.max_tracked:
+                self._scores.popitem(last=False)
+
+    def hot_tickers(self):
+        """
+        Get the most requested tickers.
+
+        Returns:
+            List[str]: Up to `top_k` tickers, most requested first.
+        """
+        now = self.clock()
+        with self._lock:
+            scores = {symbol: self._decay(score, now - updated_at)
+                      for symbol, (score, updated_at) in self._scores.items()}
+            # Forget tickers nobody has asked about for a long time
+            for symbol in [symbol for symbol, score in scores.items() if score < 0.01]:
+                del self._scores[symbol]
+                del scores[symbol]
+        return sorted(scores, key=scores.get, reverse=True)[:self.top_k]
+
+    def next_delay(self):
+        """
+        Get the time until the next cycle.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        return self.interval_open if is_market_open() else self.interval_closed
+
+    def run_cycle(self):
+        """
+        Refresh the hot tickers that are due, within the upstream budget.
+
+        Returns:
+            List[str]: The tickers that were refreshed.
+        """
+        horizon = self.next_delay()
+        due = []
+        for symbol in self.hot_tickers():
+            expires_in = self.cache.expires_in(symbol, self.period, self.interval)
+            if expires_in is None or expires_in <= horizon:
+                due.append(symbol)
+
+        allowed = self._reserve(len(due))
+        self.deferred += len(due) - allowed
+        due = due[:allowed]
+        if due:
+            self.cache.refresh_many(due, self.period, self.interval)
+            for symbol in due:
+                self.warm(symbol, self.period)
+        self.cycles += 1
+        self.refreshed += len(due)
+        return due
+
+    async def run(self, executor):
+        """
+        Run cycles forever on a worker pool until cancelled.
+
+        Args:
+            executor (concurrent.futures.Executor): The pool that runs the blocking refreshes.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self.next_delay()
+            await asyncio.sleep(delay)
+            try:
+                # Hold leadership for two cycles, so a lost leader is replaced within one
+                if self.leader is not None and not await loop.run_in_executor(executor, self.leader, 2 * delay):
+                    self.skipped += 1
+                    continue
+                await loop.run_in_executor(executor, self.run_cycle)
+            except MarketDataError as e:
+                logger.warning("Prefetch cycle skipped: %s", e)
+            except Exception:
+                logger.exception("Prefetch cycle failed")
+
+    def stats(self):
+        """
+        Get the scheduler counters.
+
+        Returns:
+            dict: Cycles run, cycles skipped while another process leads, tickers refreshed, refreshes
+                deferred by the budget, and tracked tickers.
+        """
+        with self._lock:
+            return {
+                "cycles": self.cycles,
+                "skipped": self.skipped,
+                "refreshed": self.refreshed,
+                "deferred": self.deferred,
+                "tracked": len(self._scores),
+            }
+
+    def _decay(self, score, elapsed):
+        """Decay a request score by the time elapsed since it was updated."""
+        return score * math.pow(0.5, elapsed / self.half_life)
+
+    def _reserve(self, count):
+        """
+        Take up to `count` fetches from the rolling hourly budget.
+
+        Args:
+            count (int): Fetches wanted.
+
+        Returns:
+            int: Fetches granted.
+        """
+        now = self.clock()
+        with self._lock:
+            while self._fetches and self._fetches[0] <= now - 3600:
+                self._fetches.popleft()
+            granted = max(0, min(count, self.budget_per_hour - len(self._fetches)))
+            self._fetches.extend([now] * granted)
+            return granted
@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+
+class ProfilerBusyError(RuntimeError):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that periodically samples the stacks of all running threads.
+
+    Sampling happens on a background thread and only while a profile is being recorded, so the
+    overhead is zero the rest of the time. Results are in the collapsed-stack format read by
+    flame graph tools: one line per distinct stack, frames joined by ';', followed by the sample count.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        """
+        Args:
+            interval (float, optional): Seconds between samples.
+        """
+        self.interval = interval
+        self._samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start recording samples.
+
+        Raises:
+            ProfilerBusyError: If a profile is already being recorded.
+        """
+        with self._lock:
+            if self._thread is not None:
+                raise ProfilerBusyError("A profile is already being recorded.")
+            self._samples = Counter()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop recording samples.
+
+        Returns:
+            str: The recorded stacks in collapsed-stack format, most sampled first.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self._samples.most_common())
+
+    def _run(self):
+        """Sample every other thread's stack until stopped."""
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self._samples[";".join(reversed(frames))] += 1
+
+
+profiler = SamplingProfiler()
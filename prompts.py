@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import re
+
+from metrics import metrics
+
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "512"))
+PROMPT_MAX_RESULT_TOKENS = int(os.getenv("PROMPT_MAX_RESULT_TOKENS", "160"))
+
+# Tokens the chat format adds per message and once per request
+MESSAGE_OVERHEAD_TOKENS = 4
+REQUEST_OVERHEAD_TOKENS = 3
+CHARS_PER_TOKEN = 4
+
+# Answer lengths by stock function: single values need a sentence or two, MACD a little more
+MAX_TOKENS_BY_FUNCTION = {
+    "get_stock_price": 60,
+    "get_stock_volume": 100,
+    "calculate_sma": 100,
+    "calculate_ema": 100,
+    "calculate_rsi": 100,
+    "calculate_macd": 120,
+}
+DEFAULT_MAX_TOKENS = 150
+MAX_TOKENS_PER_EXTRA_PART = 40
+MAX_TOKENS_LIMIT = 300
+
+RESULT_UNITS = {
+    "get_stock_price": "per share",
+    "calculate_sma": "per share",
+    "calculate_ema": "per share",
+    "calculate_rsi": "on a 0-100 scale",
+}
+
+INDICATOR_NAMES = {"sma": "SMA", "ema": "EMA", "rsi": "RSI", "macd": "MACD histogram"}
+
+# Decimals and long integers such as share volumes; dates and short counts are left alone
+NUMBER_PATTERN = re.compile(r"-?\d+\.\d+(?:[eE][-+]?\d+)?|\b\d{5,}\b")
+TRUNCATION_MARK = " …"
+
+PROMPT_TOKENS = metrics.histogram("llm_prompt_tokens", "Input tokens of prompts sent to the OpenAI API.", ("mode",),
+                                  buckets=(32, 64, 128, 256, 512, 1024, 2048, 4096))
+TRUNCATED_PROMPTS = metrics.counter("llm_prompts_truncated_total", "Prompts shortened to fit the input token budget.")
+
+_encoding = None
+
+
+def _get_encoding():
+    """Load the tiktoken encoding on first use, or return False if tiktoken is not installed."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Count the tokens of a text as the OpenAI chat models see them.
+
+    Uses tiktoken when it is installed, and otherwise estimates one token per four characters,
+    which is close for the English and numbers in these prompts.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The number of tokens.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages):
+    """
+    Count the input tokens of a chat request.
+
+    Args:
+        messages (List[Dict[str, str]]): The messages to send.
+
+    Returns:
+        int: The number of tokens, including the chat format overhead.
+    """
+    return REQUEST_OVERHEAD_TOKENS + sum(MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+                                         for message in messages)
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    Shorten a text to a number of tokens, marking the cut.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The most tokens to keep.
+
+    Returns:
+        str: The text, or its beginning followed by an ellipsis.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    while tokens > max_tokens and text:
+        # Cut proportionally, then a little more, until the text and the mark fit
+        keep = max(0, min(len(text) - 1, int(len(text) * max_tokens / tokens) - len(TRUNCATION_MARK)))
+        text = text[:keep].rstrip()
+        tokens = count_tokens(text + TRUNCATION_MARK)
+    return text + TRUNCATION_MARK
+
+
+def format_number(value):
+    """
+    Format a number compactly for a prompt.
+
+    Args:
+        value (float): The number.
+
+    Returns:
+        str: e.g. '1.55M' for 1548123, '12,345' for 12345.2, '187.42' for 187.4213 and '0.0179' for
+            0.017867.
+    """
+    if math.isnan(value) or math.isinf(value):
+        return str(value)
+    magnitude = abs(value)
+    if magnitude >= 1e9:
+        return f"{value / 1e9:.2f}B"
+    if magnitude >= 1e6:
+        return f"{value / 1e6:.2f}M"
+    if magnitude >= 1e4:
+        return f"{value:,.0f}"
+    if magnitude >= 1:
+        return f"{value:.2f}"
+    return f"{value:.3g}"
+
+
+def summarize_series(values):
+    """
+    Summarize a series of numbers in one line.
+
+    Args:
+        values (Iterable[float]): The numbers, oldest first.
+
+    Returns:
+        str: The count, last value, range and mean.
+    """
+    values = [float(value) for value in values if value == value]
+    if not values:
+        return "no data"
+    return (f"{len(values)} values, last {format_number(values[-1])}, min {format_number(min(values))}, "
+            f"max {format_number(max(values))}, mean {format_number(sum(values) / len(values))}")
+
+
+def format_result(result, function_name=None):
+    """
+    Format a stock function result compactly for a prompt.
+
+    Numbers are rounded, single values get their unit, indicator sets become a short list and series
+    are replaced by summary statistics.
+
+    Args:
+        result (Any): The result as returned by the stock function.
+        function_name (str, optional): The stock function, for the unit.
+
+    Returns:
+        str: The formatted result.
+    """
+    if hasattr(result, "tolist") and not isinstance(result, str):
+        result = result.tolist()
+    if isinstance(result, (list, tuple)):
+        return summarize_series(result)
+    if isinstance(result, dict):
+        return ", ".join(f"{INDICATOR_NAMES.get(name, name)} {_format_value(value)}" for name, value in result.items())
+    if isinstance(result, (int, float)):
+        result = str(result)
+    if not isinstance(result, str):
+        return str(result)
+
+    text = result.strip()
+    if text.startswith("{"):
+        try:
+            return format_result(json.loads(text), function_name)
+        except ValueError:
+            pass
+    try:
+        value = float(text)
+    except ValueError:
+        return NUMBER_PATTERN.sub(lambda match: format_number(float(match.group())), text)
+    unit = RESULT_UNITS.get(function_name)
+    return f"{format_number(value)} {unit}" if unit else format_number(value)
+
+
+def _format_value(value):
+    """Format one value of an indicator set."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return format_number(float(value))
+    return str(value)
+
+
+def max_tokens_for(function_name, parts=1):
+    """
+    Get the answer length allowed for an explanation.
+
+    Args:
+        function_name (str): The stock function whose result is explained, or None.
+        parts (int, optional): The number of results explained together, e.g. one per interval.
+
+    Returns:
+        int: The max_tokens completion parameter.
+    """
+    max_tokens = MAX_TOKENS_BY_FUNCTION.get(function_name, DEFAULT_MAX_TOKENS)
+    return min(max_tokens + MAX_TOKENS_PER_EXTRA_PART * (max(parts, 1) - 1), MAX_TOKENS_LIMIT)
+
+
+def fit_messages(system_content, summary, user_template, result_text, budget=PROMPT_MAX_INPUT_TOKENS):
+    """
+    Build the messages of a prompt within an input token budget.
+
+    The result is first capped at PROMPT_MAX_RESULT_TOKENS. If the prompt is still over budget the
+    conversation summary is dropped, then the result is shortened further.
+
+    Args:
+        system_content (str): The system message, without the summary.
+        summary (str): A summary of the earlier conversation, or an empty string.
+        user_template (str): The user message, with '{result}' where the result goes.
+        result_text (str): The formatted result.
+        budget (int, optional): The most input tokens to send (default is PROMPT_MAX_INPUT_TOKENS).
+
+    Returns:
+        List[Dict[str, str]]: The messages.
+    """
+    capped = truncate_tokens(result_text, PROMPT_MAX_RESULT_TOKENS)
+    truncated = capped != result_text
+
+    def build(summary_text, result):
+        system = f"{system_content} {summary_text}" if summary_text else system_content
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_template.replace("{result}", result)},
+        ]
+
+    messages = build(summary, capped)
+    if summary and count_message_tokens(messages) > budget:
+        messages = build("", capped)
+        truncated = True
+    overflow = count_message_tokens(messages) - budget
+    if overflow > 0:
+        messages = build("", truncate_tokens(capped, max(count_tokens(capped) - overflow, 0)))
+        truncated = True
+    if truncated:
+        TRUNCATED_PROMPTS.inc()
+    return messages
@@ -0,0 +1,55 @@
+import os
+import secrets
+import tempfile
+
+import uvicorn
+
+from shared_cache import SHARED_CACHE_ADDRESS, SHARED_CACHE_AUTHKEY, start_server
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+def serve(workers=WEB_CONCURRENCY, host=HOST, port=PORT):
+    """
+    Serve the app with several worker processes sharing one cache.
+
+    A shared cache server is started first, at SHARED_CACHE_ADDRESS or a private Unix socket, and
+    every worker connects to it with SHARED_CACHE_AUTHKEY or a random secret generated here, so
+    histories, explanations and sessions are fetched or created once for all of them. The server
+    stops when the workers do.
+
+    This module does not import the app itself, as each worker imports it on its own.
+
+    Args:
+        workers (int, optional): The number of worker processes (default is WEB_CONCURRENCY).
+        host (str, optional): The interface to listen on (default is HOST).
+        port (int, optional): The port to listen on (default is PORT).
+    """
+    if workers <= 1:
+        uvicorn.run("main:app", host=host, port=port, log_level="info")
+        return
+
+    address = SHARED_CACHE_ADDRESS
+    socket_dir = None
+    if not address:
+        socket_dir = tempfile.mkdtemp(prefix="stock-chatbot-")
+        address = os.path.join(socket_dir, "cache.sock")
+    authkey = SHARED_CACHE_AUTHKEY or secrets.token_bytes(32).hex()
+    cache_server = start_server(address, authkey)
+    # Workers read the address and secret when they import the app
+    os.environ["SHARED_CACHE_ADDRESS"] = address
+    os.environ["SHARED_CACHE_AUTHKEY"] = authkey
+    try:
+        uvicorn.run("main:app", host=host, port=port, log_level="info", workers=workers)
+    finally:
+        cache_server.shutdown()
+        if socket_dir is not None:
+            if os.path.exists(address):
+                os.unlink(address)
+            os.rmdir(socket_dir)
+
+
+if __name__ == "__main__":
+    serve()
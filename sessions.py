@@ -0,0 +1,355 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from shared_cache import shared_cache
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_FACTS = int(os.getenv("SESSION_MAX_FACTS", "6"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "")
+
+INDICATOR_LABELS = {
+    "sma": "SMA",
+    "ema": "EMA",
+    "rsi": "RSI",
+    "macd": "MACD histogram",
+    "price": "price",
+    "volume": "volume",
+}
+
+
+class Session:
+    """
+    What the server remembers about one conversation.
+
+    Attributes:
+        session_id (str): The session id.
+        selected_stock (str): The stock the conversation is about, or None.
+        period (str): The last period asked about explicitly, or None.
+        interval (str): The last bar interval asked about, or None.
+        facts (OrderedDict): Recent results as label -> value, oldest first, e.g. {'RSI (1y)': '64.80'}.
+    """
+
+    __slots__ = ("session_id", "selected_stock", "period", "interval", "facts")
+
+    def __init__(self, session_id=None, selected_stock=None, period=None, facts=None, interval=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.selected_stock = selected_stock
+        self.period = period
+        self.interval = interval
+        self.facts = OrderedDict(facts or ())
+
+    def select(self, ticker):
+        """
+        Switch the conversation to a stock, forgetting what was learned about the previous one.
+
+        Args:
+            ticker (str): The stock ticker symbol, or None to clear the selection.
+        """
+        ticker = ticker.strip().upper() if ticker else None
+        if ticker != self.selected_stock:
+            self.selected_stock = ticker
+            self.period = None
+            self.interval = None
+            self.facts.clear()
+
+    def remember(self, indicator, period, result, interval=None):
+        """
+        Record a computed result for the summary, keeping only the most recent ones.
+
+        Args:
+            indicator (str): The indicator, e.g. 'rsi'.
+            period (str): The period the result covers, or None if it depends on the interval.
+            result (str): The result as returned by the stock function.
+            interval (str, optional): The bar interval or intervals, e.g. '5m' or '5m/60m'.
+
+        Returns:
+            str: The label of the recorded fact, or None if the result was not recorded.
+        """
+        if indicator not in INDICATOR_LABELS or not isinstance(result, str) or result.startswith("Error"):
+            return None
+        try:
+            value = f"{float(result):.2f}"
+        except ValueError:
+            # Summaries such as the volume description are kept short
+            value = result.split(";")[0]
+        details = [period] if period else []
+        if interval not in (None, "1d"):
+            details.append(f"{interval} bars")
+        label = f"{INDICATOR_LABELS[indicator]} ({', '.join(details)})"
+        self.facts.pop(label, None)
+        self.facts[label] = value
+        while len(self.facts) > SESSION_MAX_FACTS:
+            self.facts.popitem(last=False)
+        return label
+
+    def summary(self, exclude=None):
+        """
+        Summarize the earlier results in one short sentence for the prompt.
+
+        Args:
+            exclude (str, optional): A fact label to leave out, such as the one being explained.
+
+        Returns:
+            str: The summary, or an empty string if there is nothing to add.
+        """
+        facts = [f"{label} = {value}" for label, value in self.facts.items() if label != exclude]
+        return f"Earlier results: {'; '.join(facts)}." if facts else ""
+
+    def to_dict(self):
+        """
+        Get a JSON-serializable copy of the session.
+
+        Returns:
+            dict: The session fields.
+        """
+        return {
+            "session_id": self.session_id,
+            "selected_stock": self.selected_stock,
+            "period": self.period,
+            "interval": self.interval,
+            "facts": list(self.facts.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a session from `to_dict` output.
+
+        Args:
+            data (dict): The session fields.
+
+        Returns:
+            Session: The session.
+        """
+        return cls(data["session_id"], data.get("selected_stock"), data.get("period"),
+                   [tuple(fact) for fact in data.get("facts", ())], data.get("interval"))
+
+
+class SessionStore:
+    """
+    In-process session store with idle expiry and a bound on the number of sessions.
+
+    Sessions that are not used for `ttl` seconds expire, and the least recently used ones are
+    dropped beyond `max_entries`.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX_ENTRIES, clock=time.monotonic):
+        """
+        Args:
+            ttl (float, optional): Idle seconds before a session expires.
+            max_entries (int, optional): Maximum number of sessions kept.
+            clock (Callable[[], float], optional): Monotonic clock used for expiry.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id):
+        """
+        Get a session and extend its lifetime.
+
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            Session: The session, or None if it does not exist or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            session, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[session_id]
+                self.expirations += 1
+                return None
+            self._entries[session_id] = (session, self.clock() + self.ttl)
+            self._entries.move_to_end(session_id)
+            return session
+
+    def save(self, session):
+        """
+        Store a session, evicting the least recently used ones beyond the size bound.
+
+        Args:
+            session (Session): The session.
+        """
+        with self._lock:
+            self._entries.pop(session.session_id, None)
+            self._entries[session.session_id] = (session, self.clock() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id):
+        """
+        Forget a session.
+
+        Args:
+            session_id (str): The session id.
+        """
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self):
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Sessions kept, evictions and expirations.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "evictions": self.evictions, "expirations": self.expirations}
+
+
+class RedisSessionStore:
+    """
+    Session store backed by Redis or a Redis-compatible server, shared by all app instances.
+
+    Sessions are stored as JSON under 'session:{id}' with an idle TTL that is renewed on every
+    access; the server's own eviction policy bounds memory.
+    """
+
+    def __init__(self, url, ttl=SESSION_TTL, prefix="session:"):
+        """
+        Args:
+            url (str): The server URL, e.g. 'redis://localhost:6379/0'.
+            ttl (float, optional): Idle seconds before a session expires.
+            prefix (str, optional): Key prefix for sessions.
+
+        Raises:
+            RuntimeError: If the redis package is not installed.
+        """
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_REDIS_URL is set but the 'redis' package is not installed.")
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, session_id):
+        """
+        Get a session and extend its lifetime.
+
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            Session: The session, or None if it does not exist or has expired.
+        """
+        key = self.prefix + session_id
+        pipeline = self.client.pipeline()
+        pipeline.get(key)
+        pipeline.expire(key, self.ttl)
+        data, _ = pipeline.execute()
+        return Session.from_dict(json.loads(data)) if data is not None else None
+
+    def save(self, session):
+        """
+        Store a session.
+
+        Args:
+            session (Session): The session.
+        """
+        self.client.set(self.prefix + session.session_id, json.dumps(session.to_dict()), ex=self.ttl)
+
+    def delete(self, session_id):
+        """
+        Forget a session.
+
+        Args:
+            session_id (str): The session id.
+        """
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self):
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Always empty; the server keeps its own statistics.
+        """
+        return {}
+
+
+class SharedSessionStore:
+    """
+    Session store kept in the cache tier shared by the worker processes of one host.
+
+    Sessions are stored as JSON under 'session:{id}' with an idle TTL that is renewed on every
+    access, so a conversation continues whichever worker serves the next request.
+    """
+
+    def __init__(self, shared, ttl=SESSION_TTL, prefix="session:"):
+        """
+        Args:
+            shared (SharedCache): The shared cache client.
+            ttl (float, optional): Idle seconds before a session expires.
+            prefix (str, optional): Key prefix for sessions.
+        """
+        self.shared = shared
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, session_id):
+        """
+        Get a session and extend its lifetime.
+
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            Session: The session, or None if it does not exist or has expired.
+        """
+        entry = self.shared.get(self.prefix + session_id)
+        if entry is None:
+            return None
+        data, _ = entry
+        self.shared.set(self.prefix + session_id, data, self.ttl)
+        return Session.from_dict(json.loads(data))
+
+    def save(self, session):
+        """
+        Store a session.
+
+        Args:
+            session (Session): The session.
+        """
+        self.shared.set(self.prefix + session.session_id, json.dumps(session.to_dict()), self.ttl)
+
+    def delete(self, session_id):
+        """
+        Forget a session.
+
+        Args:
+            session_id (str): The session id.
+        """
+        self.shared.delete(self.prefix + session_id)
+
+    def stats(self):
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Always empty; the shared cache reports its own counters.
+        """
+        return {}
+
+
+if SESSION_REDIS_URL:
+    session_store = RedisSessionStore(SESSION_REDIS_URL)
+elif shared_cache is not None:
+    session_store = SharedSessionStore(shared_cache)
+else:
+    session_store = SessionStore()
@@ -0,0 +1,438 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+
+from metrics import metrics
+
+SHARED_CACHE_ADDRESS = os.getenv("SHARED_CACHE_ADDRESS", "")
+SHARED_CACHE_AUTHKEY = os.getenv("SHARED_CACHE_AUTHKEY", "")
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+SHARED_CACHE_RETRY = float(os.getenv("SHARED_CACHE_RETRY", "5"))
+
+logger = logging.getLogger(__name__)
+
+# Raised when the server is unreachable, restarting, rejects the secret or drops the connection mid-call
+CONNECTION_ERRORS = (OSError, EOFError, pickle.PickleError, AuthenticationError)
+
+
+class KeyValueStore:
+    """
+    A TTL and memory-bounded LRU store of byte strings.
+
+    It is the cache tier shared by the workers when served by `start_server`, and stands in for the server
+    in a single process and in tests. Values are opaque bytes, so the server never imports the
+    application's classes, and expiry uses wall-clock time so every process agrees on it.
+    """
+
+    def __init__(self, max_bytes=SHARED_CACHE_MAX_BYTES, clock=time.time):
+        """
+        Args:
+            max_bytes (int, optional): The memory budget for all values.
+            clock (Callable[[], float], optional): Wall-clock time used for expiry.
+        """
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Get a value.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Tuple[bytes, float]: The value and its expiry time, or None on a miss.
+        """
+        with self._lock:
+            return self._get(key)
+
+    def get_many(self, keys):
+        """
+        Get several values in one call.
+
+        Args:
+            keys (Iterable[str]): The keys.
+
+        Returns:
+            dict: Maps each key found to its (value, expiry time).
+        """
+        with self._lock:
+            entries = {key: self._get(key) for key in keys}
+        return {key: entry for key, entry in entries.items() if entry is not None}
+
+    def set(self, key, value, ttl):
+        """
+        Store a value, evicting least recently used ones to stay within the memory budget.
+
+        Args:
+            key (str): The key.
+            value (bytes): The value.
+            ttl (float): Seconds the value stays valid.
+        """
+        with self._lock:
+            self._set(key, value, self.clock() + ttl)
+
+    def set_many(self, items, ttl):
+        """
+        Store several values in one call.
+
+        Args:
+            items (dict): Maps keys to values.
+            ttl (float): Seconds the values stay valid.
+        """
+        with self._lock:
+            expires_at = self.clock() + ttl
+            for key, value in items.items():
+                self._set(key, value, expires_at)
+
+    def claim(self, key, owner, ttl):
+        """
+        Take or renew a lease, so only one process does some work.
+
+        Args:
+            key (str): The lease name.
+            owner (bytes): Identifies the process asking.
+            ttl (float): Seconds the lease lasts unless renewed.
+
+        Returns:
+            bool: True if the caller holds the lease.
+        """
+        with self._lock:
+            entry = self._get(key, count=False)
+            if entry is not None and entry[0] != owner:
+                return False
+            self._set(key, owner, self.clock() + ttl)
+            return True
+
+    def delete(self, key):
+        """
+        Drop a value.
+
+        Args:
+            key (str): The key.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry[0])
+
+    def stats(self):
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and bytes in use.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _get(self, key, count=True):
+        """Get a live entry and mark it recently used; the caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += count
+                return entry
+            del self._entries[key]
+            self._bytes -= len(entry[0])
+        self.misses += count
+        return None
+
+    def _set(self, key, value, expires_at):
+        """Store an entry and evict beyond the budget; the caller holds the lock."""
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[0])
+        self._entries[key] = (value, expires_at)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+
+class SharedCacheManager(BaseManager):
+    """
+    Serves one KeyValueStore to every worker process over a local socket.
+    """
+
+
+_served_store = None
+
+
+def _get_served_store():
+    """Get the store served by this process, creating it on the first connection."""
+    global _served_store
+    if _served_store is None:
+        _served_store = KeyValueStore()
+    return _served_store
+
+
+SharedCacheManager.register("store", callable=_get_served_store)
+
+
+def parse_address(address):
+    """
+    Parse a shared cache address.
+
+    Args:
+        address (str): 'host:port' for TCP, or a filesystem path for a Unix socket.
+
+    Returns:
+        Union[Tuple[str, int], str]: The address in the form multiprocessing expects.
+    """
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def check_authkey(authkey):
+    """
+    Check that a secret is set for the shared cache.
+
+    Whoever can connect with the secret can make the server and its clients unpickle arbitrary data,
+    so there is no default one.
+
+    Args:
+        authkey (str): The secret.
+
+    Returns:
+        bytes: The secret, encoded for multiprocessing.
+
+    Raises:
+        RuntimeError: If the secret is empty.
+    """
+    if not authkey:
+        raise RuntimeError("SHARED_CACHE_AUTHKEY must be set to a random secret to use the shared cache; "
+                           "serve.py generates one for the workers it starts.")
+    return authkey.encode()
+
+
+def start_server(address=SHARED_CACHE_ADDRESS, authkey=SHARED_CACHE_AUTHKEY):
+    """
+    Start the shared cache server in a child process.
+
+    Args:
+        address (str, optional): Where to listen, 'host:port' or a Unix socket path.
+        authkey (str, optional): The secret workers must present.
+
+    Returns:
+        SharedCacheManager: The running manager; call `shutdown()` to stop the server.
+
+    Raises:
+        RuntimeError: If no secret is set.
+    """
+    manager = SharedCacheManager(address=_bind_address(address), authkey=check_authkey(authkey))
+    manager.start()
+    return manager
+
+
+def _bind_address(address):
+    """Parse an address to listen on, removing a Unix socket left behind by a server that did not shut down."""
+    address = parse_address(address)
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)
+    return address
+
+
+class SharedCache:
+    """
+    Client of the cache tier shared by all worker processes.
+
+    Values are pickled on the client, so any picklable object can be stored. When the server cannot
+    be reached the cache behaves as empty and tries to reconnect after SHARED_CACHE_RETRY seconds,
+    so a lost server slows requests down rather than failing them.
+    """
+
+    def __init__(self, address=None, authkey=SHARED_CACHE_AUTHKEY, store=None, retry_after=SHARED_CACHE_RETRY,
+                 clock=time.monotonic):
+        """
+        Args:
+            address (str, optional): The server address, 'host:port' or a Unix socket path.
+            authkey (str, optional): The secret shared with the server.
+            store (KeyValueStore, optional): A store to use directly instead of a server, as a local
+                stand-in.
+            retry_after (float, optional): Seconds to wait before reconnecting after a failure.
+            clock (Callable[[], float], optional): Monotonic clock for the reconnect delay.
+
+        Raises:
+            RuntimeError: If a server address is given without a secret.
+        """
+        self.address = address
+        self.authkey = check_authkey(authkey) if store is None else None
+        self.retry_after = retry_after
+        self.clock = clock
+        self.owner = f"{os.getpid()}-{id(self)}".encode()
+        self._store = store
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def store(self):
+        """The store or a proxy to the server's store, or None while the server is unreachable."""
+        if self._store is None and self.clock() >= self._retry_at:
+            with self._lock:
+                if self._store is None and self.clock() >= self._retry_at:
+                    try:
+                        manager = SharedCacheManager(address=parse_address(self.address), authkey=self.authkey)
+                        manager.connect()
+                        self._store = manager.store()
+                    except CONNECTION_ERRORS as e:
+                        self._failed(e)
+        return self._store
+
+    def get(self, key):
+        """
+        Get a value.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Tuple[Any, float]: The value and the seconds it stays valid, or None on a miss.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Get several values in one round trip.
+
+        Args:
+            keys (Iterable[str]): The keys.
+
+        Returns:
+            dict: Maps each key found to its (value, seconds it stays valid).
+        """
+        keys = list(keys)
+        entries = self._call("get_many", keys) or {}
+        now = time.time()
+        values = {key: (pickle.loads(value), expires_at - now) for key, (value, expires_at) in entries.items()}
+        with self._lock:
+            self.hits += len(values)
+            self.misses += len(keys) - len(values)
+        return values
+
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+
+        Args:
+            key (str): The key.
+            value (Any): A picklable value.
+            ttl (float): Seconds the value stays valid.
+        """
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl):
+        """
+        Store several values in one round trip.
+
+        Args:
+            items (dict): Maps keys to picklable values.
+            ttl (float): Seconds the values stay valid.
+        """
+        if items and ttl > 0:
+            self._call("set_many", {key: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                                    for key, value in items.items()}, ttl)
+
+    def delete(self, key):
+        """
+        Drop a value.
+
+        Args:
+            key (str): The key.
+        """
+        self._call("delete", key)
+
+    def claim(self, key, ttl):
+        """
+        Take or renew a lease held by this process.
+
+        Args:
+            key (str): The lease name.
+            ttl (float): Seconds the lease lasts unless renewed.
+
+        Returns:
+            bool: True if this process holds the lease. Always False while the server is unreachable,
+                so no two processes work at once.
+        """
+        return bool(self._call("claim", key, self.owner, ttl))
+
+    def stats(self):
+        """
+        Get the client counters.
+
+        Returns:
+            dict: Hits, misses, connection errors and whether the store is reachable.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                    "connected": int(self._store is not None)}
+
+    def _call(self, method, *args):
+        """
+        Call a store method, treating connection failures as a miss.
+
+        Args:
+            method (str): The KeyValueStore method.
+            *args: Its arguments.
+
+        Returns:
+            Any: The method's return value, or None if the store is unreachable.
+        """
+        store = self.store
+        if store is None:
+            return None
+        try:
+            return getattr(store, method)(*args)
+        except CONNECTION_ERRORS as e:
+            with self._lock:
+                self._store = None
+                self._failed(e)
+            return None
+
+    def _failed(self, error):
+        """Count a connection failure and wait before reconnecting; the caller holds the lock."""
+        self.errors += 1
+        self._retry_at = self.clock() + self.retry_after
+        logger.warning("Shared cache at %s is unavailable: %s", self.address, error)
+
+
+shared_cache = SharedCache(SHARED_CACHE_ADDRESS) if SHARED_CACHE_ADDRESS else None
+if shared_cache is not None:
+    metrics.register_stats("shared_cache", "Cross-process cache client counters.", shared_cache.stats)
+
+
+if __name__ == "__main__":
+    # Serve the cache in the foreground, e.g. as a separate service for `uvicorn --workers`
+    logging.basicConfig(level=logging.INFO)
+    if not SHARED_CACHE_ADDRESS or not SHARED_CACHE_AUTHKEY:
+        raise SystemExit("Set SHARED_CACHE_ADDRESS to the address to listen on and SHARED_CACHE_AUTHKEY to a random "
+                         "secret shared with the workers.")
+    logger.info("Serving the shared cache on %s", SHARED_CACHE_ADDRESS)
+    manager = SharedCacheManager(address=_bind_address(SHARED_CACHE_ADDRESS), authkey=SHARED_CACHE_AUTHKEY.encode())
+    manager.get_server().serve_forever()
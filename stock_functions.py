@@ -1,47 +1,81 @@
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import yfinance as yf
+
+from charts import OVERLAY_SERIES, ChartData, render_chart
+from history_cache import get_histories, get_history
+from indicator_state import indicator_states, window_error
+from indicators import compute_indicators
+from intervals import INTERVAL_RULES, is_intraday, normalize_interval
+from lazy_imports import LazyModule
+from market_data import MarketDataError
+
+pd = LazyModule("pandas")
+
+COMPARABLE_INDICATORS = {
+    "price": None,
+    "sma": "sma_window",
+    "ema": "ema_window",
+    "rsi": "rsi_window",
+    "macd": None,
+}
 
 
-def get_stock_price(ticker, period='1y'):
+def get_stock_price(ticker, period='1y', interval='1d'):
     """
     Get the latest closing price of a stock.
 
     Args:
         ticker (str): The stock ticker symbol.
         period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
         str: The latest closing price of the stock.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
     try:
-        stock_data = yf.Ticker(ticker).history(period=period)
-        latest_price = stock_data.iloc[-1].Close
+        latest_price = get_history(ticker, period, interval)['Close'].iloc[-1]
         return str(latest_price)
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error fetching stock price for {ticker}: {str(e)}"
 
 
-def get_stock_volume(ticker):
+def get_stock_volume(ticker, period='1y', interval='1d'):
     """
-    Get the historical volume data for a stock.
+    Get a summary of the trading volume for a stock.
+
+    The full history is available from the /volume/{ticker} endpoint, which streams it instead of
+    building it in memory.
 
     Args:
         ticker (str): The stock ticker symbol.
+        period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
-        str: The historical volume data for the stock.
+        str: The latest volume with its 30-bar and whole-period averages.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
     try:
-        stock_data = yf.Ticker(ticker).history(period='max')
-        volume_data = stock_data['Volume'].to_dict()
-        return str(volume_data)
+        interval = normalize_interval(interval)
+        volume = get_history(ticker, period, interval)['Volume']
+        when = f"{volume.index[-1]:%Y-%m-%d %H:%M}" if is_intraday(interval) else f"{volume.index[-1]:%Y-%m-%d}"
+        bars = "30-day" if interval == "1d" else f"30-bar ({interval})"
+        return (f"Latest volume: {int(volume.iloc[-1])} shares on {when}; "
+                f"{bars} average: {int(volume.iloc[-30:].mean())} shares; "
+                f"{period} average: {int(volume.mean())} shares.")
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error fetching stock volume for {ticker}: {str(e)}"
 
 
-def calculate_sma(ticker, period='1y', window=50):
+def calculate_sma(ticker, period='1y', window=50, interval='1d'):
     """
     Calculate the Simple Moving Average (SMA) for a given stock.
 
@@ -49,19 +83,28 @@ def calculate_sma(ticker, period='1y', window=50):
         ticker (str): The stock ticker symbol.
         period (str, optional): The time period for which to fetch the stock data (default is '1y').
         window (int, optional): The window size for the SMA calculation (default is 50).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
         str: The calculated SMA value for the given stock and time period.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
+    error = window_error(window=window)
+    if error is not None:
+        return f"Error: {error}"
     try:
-        stock_data = yf.Ticker(ticker).history(period=period)
-        sma = stock_data['Close'].rolling(window=window).mean().iloc[-1]
+        stock_data = get_history(ticker, period, interval)
+        sma = indicator_states.latest(ticker, period, stock_data['Close'], interval, sma_window=window)["sma"]
         return str(sma)
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error calculating SMA for {ticker}: {str(e)}"
 
 
-def calculate_ema(ticker, period='1y', window=50):
+def calculate_ema(ticker, period='1y', window=50, interval='1d'):
     """
     Calculate the Exponential Moving Average (EMA) for a given stock.
 
@@ -69,25 +112,28 @@ def calculate_ema(ticker, period='1y', window=50):
         ticker (str): The stock ticker symbol.
         period (str, optional): The time period for which to fetch the stock data (default is '1y').
         window (int, optional): The window size for the EMA calculation (default is 50).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
         str: The calculated EMA value for the given stock and time period.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
+    error = window_error(window=window)
+    if error is not None:
+        return f"Error: {error}"
     try:
-        stock_data = yf.Ticker(ticker).history(period=period)
-
-        # Calculate the multiplier for the EMA
-        multiplier = 2 / (window + 1)
-
-        # Calculate the EMA
-        ema = stock_data['Close'].ewm(com=multiplier, adjust=False).mean().iloc[-1]
-
+        stock_data = get_history(ticker, period, interval)
+        ema = indicator_states.latest(ticker, period, stock_data['Close'], interval, ema_window=window)["ema"]
         return str(ema)
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error calculating EMA for {ticker}: {str(e)}"
 
 
-def calculate_rsi(ticker, period='1y', window=14):
+def calculate_rsi(ticker, period='1y', window=14, interval='1d'):
     """
     Calculate the Relative Strength Index (RSI) for a given stock.
 
@@ -95,23 +141,28 @@ def calculate_rsi(ticker, period='1y', window=14):
         ticker (str): The stock ticker symbol.
         period (str, optional): The time period for which to fetch the stock data (default is '1y').
         window (int, optional): The window size for RSI calculation (default is 14).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
         str: The calculated RSI value for the given stock.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
+    error = window_error(window=window)
+    if error is not None:
+        return f"Error: {error}"
     try:
-        stock_data = yf.Ticker(ticker).history(period=period)
-        delta = stock_data['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return str(rsi.iloc[-1])
+        stock_data = get_history(ticker, period, interval)
+        rsi = indicator_states.latest(ticker, period, stock_data['Close'], interval, rsi_window=window)["rsi"]
+        return str(rsi)
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error calculating RSI for {ticker}: {str(e)}"
 
 
-def calculate_macd(ticker, period='1y', short_window=12, long_window=26, signal_window=9):
+def calculate_macd(ticker, period='1y', short_window=12, long_window=26, signal_window=9, interval='1d'):
     """
     Calculate the Moving Average Convergence Divergence (MACD) for a given stock.
 
@@ -121,44 +172,193 @@ def calculate_macd(ticker, period='1y', short_window=12, long_window=26, signal_
         short_window (int, optional): The short window size (default is 12).
         long_window (int, optional): The long window size (default is 26).
         signal_window (int, optional): The signal window size (default is 9).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
 
     Returns:
         str: The MACD value for the given stock.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
     """
+    error = window_error(short_window=short_window, long_window=long_window, signal_window=signal_window)
+    if error is not None:
+        return f"Error: {error}"
     try:
-        stock_data = yf.Ticker(ticker).history(period=period)
-        short_ema = stock_data['Close'].ewm(span=short_window, min_periods=1, adjust=False).mean()
-        long_ema = stock_data['Close'].ewm(span=long_window, min_periods=1, adjust=False).mean()
-        macd = short_ema - long_ema
-        signal_line = macd.ewm(span=signal_window, min_periods=1, adjust=False).mean()
-        macd_histogram = macd - signal_line
-        return str(macd_histogram.iloc[-1])
+        stock_data = get_history(ticker, period, interval)
+        macd_histogram = indicator_states.latest(ticker, period, stock_data['Close'], interval,
+                                                 short_window=short_window, long_window=long_window,
+                                                 signal_window=signal_window)["macd"]
+        return str(macd_histogram)
+    except MarketDataError:
+        raise
     except Exception as e:
         return f"Error calculating MACD for {ticker}: {str(e)}"
 
 
-def plot_stock_price(ticker, period='1y'):
+def calculate_indicators(ticker, period='1y', sma_window=50, ema_window=50, rsi_window=14,
+                         short_window=12, long_window=26, signal_window=9, interval='1d'):
     """
-    Plot the historical stock prices for a given stock.
+    Calculate the SMA, EMA, RSI and MACD for a given stock from a single fetch.
 
     Args:
         ticker (str): The stock ticker symbol.
         period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        sma_window (int, optional): The window size for the SMA calculation (default is 50).
+        ema_window (int, optional): The window size for the EMA calculation (default is 50).
+        rsi_window (int, optional): The window size for RSI calculation (default is 14).
+        short_window (int, optional): The short MACD window size (default is 12).
+        long_window (int, optional): The long MACD window size (default is 26).
+        signal_window (int, optional): The MACD signal window size (default is 9).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
+
+    Returns:
+        str: A JSON object with the latest value of each indicator.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
+    """
+    error = window_error(sma_window=sma_window, ema_window=ema_window, rsi_window=rsi_window,
+                         short_window=short_window, long_window=long_window, signal_window=signal_window)
+    if error is not None:
+        return f"Error: {error}"
+    try:
+        stock_data = get_history(ticker, period, interval)
+        values = indicator_states.latest(ticker, period, stock_data['Close'], interval, sma_window=sma_window,
+                                         ema_window=ema_window, rsi_window=rsi_window, short_window=short_window,
+                                         long_window=long_window, signal_window=signal_window)
+        return json.dumps(values)
+    except MarketDataError:
+        raise
+    except Exception as e:
+        return f"Error calculating indicators for {ticker}: {str(e)}"
+
+
+def get_close_frame(tickers, period='1y', interval='1d'):
+    """
+    Get the closing prices of several stocks as one aligned frame, fetched in a single batch.
+
+    Rows are the union of all trading days; gaps are forward-filled so every column can be
+    processed together.
+
+    Args:
+        tickers (Iterable[str]): The stock ticker symbols.
+        period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
+
+    Returns:
+        pandas.DataFrame: Closing prices with one column per ticker that has data.
+    """
+    histories = get_histories(tickers, period, interval)
+    closes = {ticker: frame['Close'] for ticker, frame in histories.items() if not frame.empty}
+    if not closes:
+        return pd.DataFrame()
+    return pd.concat(closes, axis=1).sort_index().ffill()
+
+
+def rank_stocks(tickers, indicator='rsi', period='1y', window=None, ascending=False, interval='1d'):
+    """
+    Rank several stocks by the latest value of an indicator.
+
+    Args:
+        tickers (Iterable[str]): The stock ticker symbols.
+        indicator (str, optional): One of 'price', 'sma', 'ema', 'rsi' or 'macd' (default is 'rsi').
+        period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        window (int, optional): The window size for SMA, EMA or RSI (default is each indicator's default).
+        ascending (bool, optional): Rank the lowest value first (default is False).
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
+
+    Returns:
+        List[dict]: One entry per ticker with 'rank', 'ticker' and 'value', best first. Tickers
+            without data come last with a value and rank of None.
+
+    Raises:
+        ValueError: If the indicator is not supported or the window is not a positive whole number.
     """
-    stock_data = yf.Ticker(ticker).history(period=period)
-    if not stock_data.empty:
-        plt.figure(figsize=(10, 6))
-        plt.plot(stock_data.index, stock_data['Close'], label=f'{ticker} Close Price')
-        plt.title(f'{ticker} Stock Price')
-        plt.xlabel('Date')
-        plt.ylabel('Price (USD)')
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f'{ticker}.png')
-        plt.close()
+    if indicator not in COMPARABLE_INDICATORS:
+        raise ValueError(f"Unknown indicator '{indicator}'. Use one of: {', '.join(COMPARABLE_INDICATORS)}.")
+    error = window_error(window=window)
+    if error is not None:
+        raise ValueError(error)
+
+    tickers = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers))
+    closes = get_close_frame(tickers, period, interval)
+    if closes.empty:
+        values = pd.Series(dtype=float)
+    elif indicator == "price":
+        values = closes.iloc[-1]
     else:
-        print(f"Error fetching stock data for {ticker}")
+        params = {COMPARABLE_INDICATORS[indicator]: window} if window and COMPARABLE_INDICATORS[indicator] else {}
+        values = compute_indicators(closes, (indicator,), **params)[indicator]
+
+    values = values.dropna().sort_values(ascending=ascending)
+    ranking = [{"rank": rank, "ticker": ticker, "value": float(value)}
+               for rank, (ticker, value) in enumerate(values.items(), start=1)]
+    ranking += [{"rank": None, "ticker": ticker, "value": None} for ticker in tickers if ticker not in values.index]
+    return ranking
+
+
+def get_chart_data(ticker, period='1y', overlays=(), interval='1d'):
+    """
+    Get the price and overlay series for a chart.
+
+    Overlays are computed in one vectorized pass over the cached history.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        overlays (Tuple[str, ...], optional): Any of 'sma', 'ema' and 'macd'.
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
+
+    Returns:
+        ChartData: The series to draw.
+
+    Raises:
+        ValueError: If there is no data for the stock.
+    """
+    stock_data = get_history(ticker, period, interval)
+    if stock_data.empty:
+        raise ValueError(f"No price data found for {ticker}.")
+    close = stock_data['Close']
+    names = [name for overlay in overlays for name in OVERLAY_SERIES[overlay]]
+    series = compute_indicators(close, names, latest=False) if names else {}
+    # Plot exchange-local dates
+    dates = close.index.tz_localize(None) if close.index.tz is not None else close.index
+    return ChartData(ticker.strip().upper(), period, tuple(overlays), dates.to_numpy(), close.to_numpy(dtype=float),
+                     {name: values.to_numpy() for name, values in series.items()}, normalize_interval(interval))
+
+
+def plot_stock_price(ticker, period='1y', overlays=(), format='png', interval='1d'):
+    """
+    Plot the historical stock prices for a given stock.
 
+    Args:
+        ticker (str): The stock ticker symbol.
+        period (str, optional): The time period for which to fetch the stock data (default is '1y').
+        overlays (Tuple[str, ...], optional): Any of 'sma', 'ema' and 'macd'.
+        format (str, optional): 'png' or 'svg' (default is 'png').
+        interval (str, optional): The bar interval, e.g. '5m', '60m', '1d' or '1wk' (default is '1d').
+
+    Returns:
+        bytes: The encoded image, or None if there is no data for the stock.
+
+    Raises:
+        MarketDataError: If the market data provider is unavailable or rate limiting.
+    """
+    try:
+        data = get_chart_data(ticker, period, overlays, interval)
+    except ValueError:
+        return None
+    return render_chart(data.ticker, data.dates, data.close, data.series, data.overlays, format=format)
+
+
+# The interval parameter shared by every function
+INTERVAL_PARAMETER = {
+    "type": "string",
+    "enum": list(INTERVAL_RULES),
+    "description": "The bar interval (default is '1d'). One-minute bars cover the last 7 days, "
+                   "60m bars the last 730 days and other intraday bars the last 60 days.",
+    "default": "1d"
+}
 
 function_metadata = {
     "get_stock_price": {
@@ -175,21 +375,28 @@ function_metadata = {
                     "type": "string",
                     "description": "The time period for which to fetch the stock data (default is '1y').",
                     "default": "1y"
-                }
+                },
+                "interval": INTERVAL_PARAMETER
             },
             "required": ["ticker"]
         }
     },
     "get_stock_volume": {
         "name": "get_stock_volume",
-        "description": "Get the historical volume data for a stock.",
+        "description": "Get a summary of the trading volume for a stock.",
         "parameters": {
             "type": "object",
             "properties": {
                 "ticker": {
                     "type": "string",
                     "description": "The stock ticker symbol."
-                }
+                },
+                "period": {
+                    "type": "string",
+                    "description": "The time period for which to fetch the stock data (default is '1y').",
+                    "default": "1y"
+                },
+                "interval": INTERVAL_PARAMETER
             },
             "required": ["ticker"]
         }
@@ -209,6 +416,7 @@ function_metadata = {
                     "description": "The time period for which to fetch the stock data (default is '1y').",
                     "default": "1y"
                 },
+                "interval": INTERVAL_PARAMETER,
                 "window": {
                     "type": "integer",
                     "description": "The window size for the SMA calculation (default is 50).",
@@ -233,6 +441,7 @@ function_metadata = {
                     "description": "The time period for which to fetch the stock data (default is '1y').",
                     "default": "1y"
                 },
+                "interval": INTERVAL_PARAMETER,
                 "window": {
                     "type": "integer",
                     "description": "The window size for the EMA calculation (default is 50).",
@@ -257,6 +466,7 @@ function_metadata = {
                     "description": "The time period for which to fetch the stock data (default is '1y').",
                     "default": "1y"
                 },
+                "interval": INTERVAL_PARAMETER,
                 "window": {
                     "type": "integer",
                     "description": "The window size for RSI calculation (default is 14).",
@@ -281,6 +491,7 @@ function_metadata = {
                     "description": "The time period for which to fetch the stock data (default is '1y').",
                     "default": "1y"
                 },
+                "interval": INTERVAL_PARAMETER,
                 "short_window": {
                     "type": "integer",
                     "description": "The short window size (default is 12).",
@@ -304,7 +515,7 @@ function_metadata = {
 
 function_mapping = {
     "get_stock_price": get_stock_price,
-    # "get_stock_volume": get_stock_volume,
+    "get_stock_volume": get_stock_volume,
     "calculate_sma": calculate_sma,
     "calculate_ema": calculate_ema,
     "calculate_rsi": calculate_rsi,
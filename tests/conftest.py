@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+# The application modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests off the disk store and without a background scheduler
+os.environ.setdefault("BAR_STORE_ENABLED", "0")
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+
+
+class FakeClock:
+    """A clock that only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+
+class FakeTransport:
+    """Stands in for the pooled HTTPAdapter, answering with the status codes scripted for each ticker."""
+
+    def __init__(self):
+        self.statuses = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        import requests
+
+        ticker = request.url.rsplit("/", 1)[-1]
+        with self._lock:
+            self.requests.append(ticker)
+            script = self.statuses.get(ticker)
+            status = script.pop(0) if script else 200
+        response = requests.Response()
+        response.status_code = status
+        response._content = b""
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeTicker:
+    """Like yfinance, sends one request per history and returns an empty frame when it fails."""
+
+    bars = 300
+
+    def __init__(self, ticker, session=None):
+        self.ticker = ticker
+        self.session = session
+
+    def history(self, **kwargs):
+        import pandas as pd
+        from benchmarks.fakes import synthetic_history
+
+        response = self.session.get(f"https://example.test/{self.ticker}")
+        if response.status_code != 200:
+            return pd.DataFrame()
+        return synthetic_history(self.ticker, self.bars)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def upstream(monkeypatch, clock):
+    """
+    A market data client whose HTTP requests are answered by a FakeTransport, on a fake clock.
+
+    The transport is `upstream.transport`, and yfinance is replaced by FakeTicker.
+    """
+    import market_data
+    from market_data import MarketDataClient
+
+    client = MarketDataClient(rate=5, burst=20, max_wait=5, max_retries=2, failure_threshold=5, reset_timeout=30,
+                              clock=clock, sleep=clock.sleep)
+    client.transport = FakeTransport()
+    client.session.get_adapter("https://").adapter = client.transport
+    monkeypatch.setattr(market_data, "yf", types.SimpleNamespace(Ticker=FakeTicker))
+    return client
@@ -0,0 +1,59 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_series import BarSeries
+from benchmarks.fakes import synthetic_history
+
+END = pd.Timestamp("2024-06-28", tz="America/New_York")
+
+
+def test_from_frame_keeps_the_close_and_volume_in_the_exchange_timezone():
+    frame = synthetic_history("AAPL", 30, end=END)
+
+    bars = BarSeries.from_frame(frame)
+
+    pd.testing.assert_frame_equal(bars.to_frame(), frame[["Close", "Volume"]], check_freq=False)
+    assert bars.tz == "America/New_York"
+    assert bars.nbytes == 30 * 3 * 8
+    assert "Close" in bars and "Open" not in bars
+    with pytest.raises(KeyError):
+        bars["Open"]
+
+
+def test_columns_are_read_only_views():
+    bars = BarSeries.from_frame(synthetic_history("AAPL", 30, end=END))
+
+    close = bars["Close"]
+
+    assert np.shares_memory(close.to_numpy(), bars.close)
+    with pytest.raises(ValueError):
+        bars.close[0] = 0
+    assert not pickle.loads(pickle.dumps(bars)).close.flags.writeable
+
+
+def test_float32_prices_halve_the_price_array():
+    bars = BarSeries.from_frame(synthetic_history("AAPL", 30, end=END), price_dtype="float32")
+
+    assert bars.close.dtype == np.float32
+    assert bars.nbytes == 30 * (8 + 4 + 8)
+
+
+def test_empty_frames_give_an_empty_series():
+    bars = BarSeries.from_frame(pd.DataFrame())
+
+    assert bars.empty and len(bars.index) == 0
+    assert bars.resample("W-MON") is bars
+
+
+def test_resample_takes_the_last_close_and_sums_the_volume():
+    index = pd.date_range("2024-06-03 09:30", periods=4, freq="30min", tz="America/New_York")
+    frame = pd.DataFrame({"Close": [1.0, 2.0, 3.0, 4.0], "Volume": [10, 20, 30, 40]}, index=index)
+
+    hourly = BarSeries.from_frame(frame).resample("60min")
+
+    assert list(hourly.index.strftime("%H:%M")) == ["09:00", "10:00", "11:00"]
+    assert list(hourly.close) == [1.0, 3.0, 4.0]
+    assert list(hourly.volume) == [10, 50, 40]
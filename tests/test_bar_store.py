@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+import bar_store as bar_store_module
+from bar_store import BarStore, period_start
+from benchmarks.fakes import synthetic_history
+from market_data import UpstreamUnavailableError
+
+PERIOD_BARS = {"1mo": 22, "1y": 252, "5y": 1260}
+
+
+class FakeUpstream:
+    """Serves one long synthetic history, recording what was asked for."""
+
+    def __init__(self):
+        self.history = synthetic_history("AAPL", 1300)
+        self.calls = []
+        self.error = None
+
+    def fetch_period(self, ticker, period, interval):
+        self.calls.append(("period", period))
+        return self.history.iloc[-PERIOD_BARS[period]:]
+
+    def fetch_since(self, ticker, start, interval):
+        self.calls.append(("since", start))
+        if self.error is not None:
+            raise self.error
+        return self.history[self.history.index >= start]
+
+
+@pytest.fixture
+def upstream_bars():
+    return FakeUpstream()
+
+
+@pytest.fixture
+def store(tmp_path, upstream_bars, monkeypatch):
+    monkeypatch.setattr(bar_store_module, "is_market_open", lambda: False)
+    monkeypatch.setattr(bar_store_module, "previous_close",
+                        lambda: datetime.now(timezone.utc) - timedelta(hours=1))
+    return BarStore(str(tmp_path), upstream_bars.fetch_period, upstream_bars.fetch_since)
+
+
+def make_stale(monkeypatch):
+    """Pretend a session closed after every stored file was written."""
+    monkeypatch.setattr(bar_store_module, "previous_close", lambda: datetime.now(timezone.utc) + timedelta(hours=1))
+
+
+def test_period_start():
+    now = pd.Timestamp("2024-06-15 12:00", tz="UTC")
+
+    assert period_start("5d", now) == pd.Timestamp("2024-06-10 12:00", tz="UTC")
+    assert period_start("3mo", now) == pd.Timestamp("2024-03-15 12:00", tz="UTC")
+    assert period_start("ytd", now) == pd.Timestamp("2024-01-01", tz="UTC")
+    assert period_start("max", now) is None
+    with pytest.raises(ValueError, match="Unknown period"):
+        period_start("fortnight", now)
+
+
+def test_stored_bars_are_served_without_fetching(store, upstream_bars):
+    first = store.read("AAPL", "1y")
+    second = store.read("AAPL", "1mo")
+
+    assert upstream_bars.calls == [("period", "1y")]
+    assert second.index[0] >= period_start("1mo").tz_convert(second.index.tz)
+    pd.testing.assert_frame_equal(second, first[first.index >= second.index[0]], check_freq=False)
+
+
+def test_a_longer_period_replaces_the_file(store, upstream_bars):
+    store.read("AAPL", "1mo")
+    history = store.read("AAPL", "5y")
+
+    assert upstream_bars.calls == [("period", "1mo"), ("period", "5y")]
+    year = store.read("AAPL", "1y")
+    assert len(upstream_bars.calls) == 2
+    pd.testing.assert_frame_equal(year, history[history.index >= year.index[0]], check_freq=False)
+    assert year.index[0] - pd.Timedelta(days=7) < period_start("1y").tz_convert(year.index.tz) <= year.index[0]
+
+
+def test_stale_files_fetch_only_the_tail(store, upstream_bars, monkeypatch):
+    store.read("AAPL", "1y")
+    last = upstream_bars.history.index[-1]
+    upstream_bars.history.loc[last, "Close"] = 1234.5
+    make_stale(monkeypatch)
+
+    history = store.read("AAPL", "1y")
+
+    assert upstream_bars.calls == [("period", "1y"), ("since", last)]
+    assert history["Close"].iloc[-1] == 1234.5
+    assert not history.index.duplicated().any()
+
+
+def test_stale_bars_are_served_while_the_upstream_is_down(store, upstream_bars, monkeypatch):
+    stored = store.read("AAPL", "1y")
+    make_stale(monkeypatch)
+    upstream_bars.error = UpstreamUnavailableError("down")
+
+    pd.testing.assert_frame_equal(store.read("AAPL", "1y"), stored, check_freq=False)
+
+
+def test_offline_stores_never_fetch(tmp_path, upstream_bars):
+    online = BarStore(str(tmp_path), upstream_bars.fetch_period, upstream_bars.fetch_since)
+    online.read("AAPL", "1mo")
+    offline = BarStore(str(tmp_path), upstream_bars.fetch_period, upstream_bars.fetch_since, offline=True)
+
+    assert len(offline.read("AAPL", "1y")) == 22
+    assert offline.read("MSFT", "1y").empty
+    assert upstream_bars.calls == [("period", "1mo")]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from charts import ChartCache, ChartData, parse_overlays, render_chart, validate_size
+
+
+def make_data(close):
+    dates = np.datetime64("2024-01-01") + np.arange(len(close)).astype("timedelta64[D]")
+    return ChartData("AAPL", "1y", (), dates, np.asarray(close, dtype=float), {})
+
+
+def test_overlays_are_parsed_into_canonical_order():
+    assert parse_overlays(" MACD,sma,macd") == ("sma", "macd")
+    assert parse_overlays("") == ()
+    with pytest.raises(ValueError):
+        parse_overlays("sma,bollinger")
+
+
+def test_sizes_outside_the_bounds_are_rejected():
+    validate_size(800, 480)
+    with pytest.raises(ValueError):
+        validate_size(100, 480)
+
+
+def test_etag_changes_with_the_options_and_the_latest_bar():
+    data = make_data([1.0, 2.0, 3.0])
+    etag = data.etag(800, 480, "png")
+
+    assert etag == make_data([1.0, 2.0, 3.0]).etag(800, 480, "png")
+    assert etag != data.etag(800, 480, "svg")
+    assert etag != make_data([1.0, 2.0, 3.5]).etag(800, 480, "png")
+    assert etag != make_data([1.0, 2.0, 3.0, 4.0]).etag(800, 480, "png")
+
+
+def test_render_chart_draws_the_overlays_in_memory():
+    close = np.linspace(100, 120, 40)
+    dates = np.datetime64("2024-01-01") + np.arange(40).astype("timedelta64[D]")
+    series = {name: close for name in ("sma", "ema", "macd_line", "macd_signal", "macd")}
+
+    png = render_chart("AAPL", dates, close, series, ("sma", "macd"), width=400, height=300)
+    svg = render_chart("AAPL", dates, close, series, (), format="svg")
+
+    assert png.startswith(b"\x89PNG")
+    assert b"<svg" in svg
+
+
+def test_chart_cache_evicts_the_least_recently_used_image():
+    cache = ChartCache(max_entries=2)
+    cache.put('"a"', b"a")
+    cache.put('"b"', b"b")
+    cache.get('"a"')
+    cache.put('"c"', b"c")
+
+    assert cache.get('"b"') is None
+    assert cache.get('"a"') == b"a"
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1, "entries": 2, "bytes": 2}
@@ -0,0 +1,48 @@
+import openai
+import pandas as pd
+import pytest
+
+from benchmarks.fakes import FakeYFinance, MockOpenAIServer, PERIOD_BARS, synthetic_history
+
+
+@pytest.fixture
+def openai_server():
+    server = MockOpenAIServer(latency=0, tokens=5).start()
+    yield server
+    server.stop()
+
+
+def test_synthetic_history_is_deterministic_per_ticker():
+    end = pd.Timestamp("2024-06-28", tz="America/New_York")
+
+    first = synthetic_history("aapl", 50, end=end)
+
+    pd.testing.assert_frame_equal(first, synthetic_history("AAPL", 50, end=end))
+    assert not first["Close"].equals(synthetic_history("MSFT", 50, end=end)["Close"])
+    assert len(first) == 50 and first.index[-1] == end
+    assert (first["High"] >= first["Low"]).all()
+
+
+def test_fake_yfinance_counts_requests_and_sizes_periods():
+    provider = FakeYFinance()
+    ticker = provider.Ticker("AAPL")
+
+    assert len(ticker.history(period="1y")) == PERIOD_BARS["1y"]
+    recent = ticker.history(period="1y", start=ticker.history(period="5d").index[0])
+    assert len(recent) == 5
+    assert provider.requests == 3
+
+
+def test_mock_server_answers_plain_completions(openai_server):
+    completion = openai.ChatCompletion.create(api_base=openai_server.api_base, api_key="test", model="mock",
+                                              messages=[{"role": "user", "content": "Hi"}])
+
+    assert completion.choices[0].message.content == "word0 word1 word2 word3 word4"
+    assert openai_server.requests == 1
+
+
+def test_mock_server_streams_one_chunk_per_token(openai_server):
+    chunks = openai.ChatCompletion.create(api_base=openai_server.api_base, api_key="test", model="mock",
+                                          messages=[{"role": "user", "content": "Hi"}], stream=True)
+
+    assert [chunk.choices[0].delta.content for chunk in chunks] == [f"word{i} " for i in range(5)]
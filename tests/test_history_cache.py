@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fakes import synthetic_history
+from history_cache import HistoryCache
+from intervals import INTRADAY_MINUTES
+
+
+class FakeFetcher:
+    """Counts the histories fetched, one or many at a time. Intraday bars start at a session open."""
+
+    def __init__(self, bars=300):
+        self.bars = bars
+        self.calls = []
+
+    def __call__(self, ticker, period, interval):
+        self.calls.append((ticker, period, interval))
+        frame = synthetic_history(ticker, self.bars)
+        if interval in INTRADAY_MINUTES:
+            frame.index = pd.date_range("2024-06-03 09:30", periods=self.bars, freq=f"{INTRADAY_MINUTES[interval]}min",
+                                        tz="America/New_York", name="Date")
+        return frame
+
+    def many(self, tickers, period, interval):
+        self.calls.append((tuple(tickers), period, interval))
+        return {ticker: synthetic_history(ticker, self.bars) for ticker in tickers}
+
+
+@pytest.fixture
+def fetcher():
+    return FakeFetcher()
+
+
+@pytest.fixture
+def cache(fetcher, clock):
+    return HistoryCache(fetcher=fetcher, batch_fetcher=fetcher.many, ttl_open=60, ttl_closed=60, clock=clock)
+
+
+def test_entries_are_reused_until_they_expire(cache, fetcher, clock):
+    first = cache.get("aapl")
+    assert cache.get(" AAPL ") is first
+    assert fetcher.calls == [("AAPL", "1y", "1d")]
+
+    clock.sleep(60)
+    assert cache.get("AAPL") is not first
+    assert len(fetcher.calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_to_stay_within_the_budget(cache):
+    size = cache.get("AAPL").nbytes
+    cache.max_bytes = 2 * size
+    cache.get("MSFT")
+    cache.get("AAPL")
+    cache.get("TSLA")
+
+    assert cache.expires_in("MSFT") is None
+    assert cache.expires_in("AAPL") is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_oversized_and_empty_histories_are_not_stored(cache, fetcher):
+    cache.max_bytes = 1
+    cache.get("AAPL")
+    fetcher.bars = 0
+    cache.max_bytes = 1 << 30
+    cache.get("MSFT")
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_get_many_fetches_only_the_misses_in_one_batch(cache, fetcher):
+    cache.get("AAPL")
+
+    histories = cache.get_many(["msft", "AAPL", "TSLA", "MSFT"])
+
+    assert list(histories) == ["MSFT", "AAPL", "TSLA"]
+    assert fetcher.calls[1:] == [(("MSFT", "TSLA"), "1y", "1d")]
+
+
+def test_derived_entries_expire_with_their_source(cache, fetcher, clock):
+    cache.get("AAPL")
+    clock.sleep(30)
+
+    weekly = cache.get("AAPL", interval="1wk")
+
+    assert len(fetcher.calls) == 1
+    assert cache.expires_in("AAPL", interval="1wk") == pytest.approx(30)
+    clock.sleep(30)
+    assert cache.get("AAPL", interval="1wk") is not weekly
+
+
+def test_derived_entries_are_not_stored_without_their_source(cache, fetcher):
+    source = cache.get("AAPL")
+    cache.invalidate("AAPL")
+
+    cache._derive(("AAPL", "1y", "1wk"), ("AAPL", "1y", "1d"), source)
+
+    assert cache.expires_in("AAPL", interval="1wk") is None
+
+
+def test_derived_entries_are_not_stored_after_their_source_expired(cache, clock):
+    source = cache.get("AAPL")
+    clock.sleep(60)
+
+    cache._derive(("AAPL", "1y", "1wk"), ("AAPL", "1y", "1d"), source)
+
+    assert cache.expires_in("AAPL", interval="1wk") is None
+
+
+def test_coarser_intraday_bars_are_derived_from_cached_finer_ones(cache, fetcher):
+    cache.get("AAPL", "5d", "5m")
+
+    bars = cache.get("AAPL", "5d", "15m")
+
+    assert fetcher.calls == [("AAPL", "5d", "5m")]
+    assert len(bars) == fetcher.bars // 3
+    assert bars.volume.sum() == cache.get("AAPL", "5d", "5m").volume.sum()
+
+
+def test_intervals_unavailable_over_the_period_are_rejected(cache, fetcher):
+    with pytest.raises(ValueError):
+        cache.get("AAPL", "1y", "5m")
+    assert fetcher.calls == []
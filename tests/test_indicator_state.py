@@ -0,0 +1,94 @@
+"""
+Checks that the incremental indicator states match a full recompute with `compute_indicators`.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_state import IndicatorStateStore
+from indicators import compute_indicators
+
+# Appended and revised bars give the same arithmetic as a full recompute, up to rounding
+EXACT = {"rel": 1e-9, "abs": 1e-9}
+# A full recompute over a sliding window seeds its EMAs from the window's first close, while the
+# state keeps the older bars. The seed difference decays by (1 - 2 / (span + 1)) per bar, which
+# leaves less than 1e-4 of the price after the 252 bars of a 1y window with the default spans.
+SLIDING = {"rel": 1e-4, "abs": 1e-4}
+
+
+def synthetic_close(bars, seed=7):
+    """Get a deterministic daily closing price series following a random walk."""
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    return pd.Series(prices, index=pd.bdate_range("2020-01-01", periods=bars), name="Close")
+
+
+def assert_matches_recompute(values, close, tolerance):
+    """Assert that indicator values match a full recompute over a series."""
+    expected = compute_indicators(close)
+    for name in ("sma", "ema", "rsi", "macd"):
+        assert values[name] == pytest.approx(expected[name], **tolerance), name
+
+
+def test_appended_bars_match_full_recompute():
+    close = synthetic_close(400)
+    store = IndicatorStateStore()
+    store.latest("TEST", "max", close[:200])
+    for end in (201, 205, 260, 400):
+        assert_matches_recompute(store.latest("TEST", "max", close[:end]), close[:end], EXACT)
+
+
+def test_sliding_window_matches_full_recompute():
+    close = synthetic_close(600)
+    store = IndicatorStateStore()
+    store.latest("TEST", "1y", close[:252])
+    for shift in (1, 5, 20, 100):
+        window = close[shift:252 + shift]
+        assert_matches_recompute(store.latest("TEST", "1y", window), window, SLIDING)
+
+
+def test_revised_pending_bar_matches_full_recompute():
+    close = synthetic_close(300)
+    store = IndicatorStateStore()
+    store.latest("TEST", "1y", close)
+    for factor in (1.01, 0.97, 1.0):
+        revised = close.copy()
+        revised.iloc[-1] = close.iloc[-1] * factor
+        assert_matches_recompute(store.latest("TEST", "1y", revised), revised, EXACT)
+
+
+def test_custom_windows_match_full_recompute():
+    close = synthetic_close(300)
+    params = {"sma_window": 20, "ema_window": 10, "rsi_window": 7, "short_window": 5, "long_window": 35,
+              "signal_window": 5}
+    store = IndicatorStateStore()
+    store.latest("TEST", "1y", close[:250], **params)
+    values = store.latest("TEST", "1y", close, **params)
+    expected = compute_indicators(close, **params)
+    for name in ("sma", "ema", "rsi", "macd"):
+        assert values[name] == pytest.approx(expected[name], **EXACT), name
+
+
+def test_empty_history_raises_without_storing_a_state():
+    store = IndicatorStateStore()
+    with pytest.raises(ValueError):
+        store.latest("NONE", "1y", pd.Series([], dtype=float, index=pd.DatetimeIndex([])))
+    assert len(store._states) == 0
+
+
+def test_adjusted_history_rebuilds_the_state():
+    close = synthetic_close(300)
+    store = IndicatorStateStore()
+    store.latest("TEST", "max", close[:250])
+    # A split adjustment rewrites every close, including those already folded into the state
+    adjusted = close / 4
+    assert_matches_recompute(store.latest("TEST", "max", adjusted), adjusted, EXACT)
+
+
+@pytest.mark.parametrize("params", [{"sma_window": 0}, {"rsi_window": -3}, {"long_window": 2.5},
+                                    {"signal_window": True}])
+def test_invalid_windows_raise_without_storing_a_state(params):
+    store = IndicatorStateStore()
+    with pytest.raises(ValueError, match="must be a positive whole number"):
+        store.latest("TEST", "1y", synthetic_close(50), **params)
+    assert len(store._states) == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import compute_indicators
+
+
+def reference(close, sma_window=50, ema_window=50, rsi_window=14, short_window=12, long_window=26, signal_window=9):
+    """Compute each indicator on its own, one series at a time, the way the stock functions used to."""
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=rsi_window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_window).mean()
+    macd = (close.ewm(span=short_window, min_periods=1, adjust=False).mean()
+            - close.ewm(span=long_window, min_periods=1, adjust=False).mean())
+    return {
+        "sma": close.rolling(window=sma_window).mean(),
+        "ema": close.ewm(span=ema_window, adjust=False).mean(),
+        "rsi": 100 - (100 / (1 + gain / loss)),
+        "macd": macd - macd.ewm(span=signal_window, min_periods=1, adjust=False).mean(),
+    }
+
+
+@pytest.fixture
+def closes():
+    rng = np.random.default_rng(3)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (300, 3)), axis=0))
+    return pd.DataFrame(prices, columns=["AAPL", "MSFT", "TSLA"], index=pd.bdate_range("2023-01-02", periods=300))
+
+
+def test_latest_values_of_one_series_match_the_reference(closes):
+    close = closes["AAPL"]
+    values = compute_indicators(close)
+    expected = reference(close)
+
+    for name in ("sma", "ema", "rsi", "macd"):
+        assert values[name] == pytest.approx(expected[name].iloc[-1], rel=1e-12), name
+
+
+def test_every_column_is_computed_in_one_pass(closes):
+    params = {"sma_window": 20, "ema_window": 10, "rsi_window": 7, "short_window": 5, "long_window": 35,
+              "signal_window": 4}
+    values = compute_indicators(closes, latest=False, **params)
+
+    for ticker in closes:
+        expected = reference(closes[ticker], **params)
+        for name in ("sma", "ema", "rsi", "macd"):
+            pd.testing.assert_series_equal(values[name][ticker], expected[name], check_names=False)
+
+
+def test_arrays_and_selected_indicators(closes):
+    values = compute_indicators(closes.to_numpy(), ("rsi", "macd_line"))
+
+    assert list(values) == ["rsi", "macd_line"]
+    assert list(values["rsi"].index) == [0, 1, 2]
+    assert values["rsi"][1] == pytest.approx(reference(closes["MSFT"])["rsi"].iloc[-1])
+
+
+def test_unknown_indicators_and_shapes_are_rejected(closes):
+    with pytest.raises(ValueError, match="Unknown indicators: bollinger"):
+        compute_indicators(closes, ("sma", "bollinger"))
+    with pytest.raises(ValueError, match="3 dimensions"):
+        compute_indicators(np.zeros((2, 2, 2)))
@@ -0,0 +1,61 @@
+import pytest
+
+from intent_router import parse_intent
+
+
+@pytest.mark.parametrize("prompt, tickers", [
+    ("Is AAPL a good PE?", ["AAPL"]),
+    ("What does the CEO think about msft?", ["MSFT"]),
+    ("Is the RSI better than $nvda and $BRK.B?", ["NVDA", "BRK.B"]),
+    ("Is the RSI better than NVDA?", []),
+    ("Compare TSLA, $TSLA and tsla", ["TSLA"]),
+    ("It costs $5 in the US", []),
+])
+def test_tickers(prompt, tickers):
+    assert parse_intent(prompt).tickers == tickers
+
+
+def test_comparison():
+    intent = parse_intent("Is the RSI of TSLA better than MSFT and $NVDA?")
+
+    assert intent.action == "compare"
+    assert intent.indicator == "rsi"
+    assert intent.comparison == "better than"
+    assert intent.tickers == ["TSLA", "MSFT", "NVDA"]
+
+
+@pytest.mark.parametrize("prompt, indicator, params", [
+    ("What's the RSI 21-day for AAPL?", "rsi", {"window": 21}),
+    ("Show me the 50 day SMA over 5 years", "sma", {"window": 50, "period": "5y"}),
+    ("macd 12/26/9 for the last 6 months", "macd",
+     {"short_window": 12, "long_window": 26, "signal_window": 9, "period": "6mo"}),
+    ("EMA with a window of 30 year to date", "ema", {"window": 30, "period": "ytd"}),
+    ("What is the price over 3 years?", "price", {}),
+    ("What is the trading volume and the price?", "volume", {}),
+])
+def test_indicator_parameters(prompt, indicator, params):
+    intent = parse_intent(prompt)
+
+    assert intent.action == "function"
+    assert intent.indicator == indicator
+    assert intent.params == params
+
+
+def test_intervals():
+    assert parse_intent("hourly MACD").params == {"interval": "60m"}
+    assert parse_intent("5-minute RSI").params == {"interval": "5m"}
+
+    intent = parse_intent("compare the 5m and 1h RSI")
+    assert intent.intervals == ["5m", "60m"]
+    assert "interval" not in intent.params
+
+
+@pytest.mark.parametrize("prompt, action", [
+    ("exit", "exit"),
+    ("change stock please", "change_stock"),
+    ("Should I buy or sell?", "trade"),
+    ("Tell me something about this company", None),
+    ("Is the system memorable?", None),
+])
+def test_actions(prompt, action):
+    assert parse_intent(prompt).action == action
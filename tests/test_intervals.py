@@ -0,0 +1,37 @@
+import pytest
+
+from intervals import can_resample, default_period, normalize_interval, source_interval, validate_period
+
+
+def test_intervals_are_normalized_and_aliases_resolved():
+    assert normalize_interval(" 1H ") == "60m"
+    assert normalize_interval("1w") == "1wk"
+    with pytest.raises(ValueError):
+        normalize_interval("45m")
+
+
+def test_periods_default_by_interval():
+    assert [default_period(interval) for interval in ("1m", "5m", "1d", "1wk")] == ["5d", "1mo", "1y", "1y"]
+
+
+def test_intraday_periods_are_limited_to_what_yfinance_serves():
+    validate_period("1mo", "5m")
+    validate_period("max", "1wk")
+    with pytest.raises(ValueError, match="last 60 days"):
+        validate_period("1y", "5m")
+    with pytest.raises(ValueError):
+        validate_period("max", "60m")
+
+
+def test_only_whole_multiples_are_resampled():
+    assert can_resample("5m", "15m")
+    assert not can_resample("15m", "5m")
+    assert not can_resample("60m", "90m")
+    assert can_resample("1d", "1wk")
+    assert not can_resample("60m", "1d")
+    assert not can_resample("1d", "1d")
+
+
+def test_daily_and_coarser_bars_come_from_daily_bars():
+    assert source_interval("1mo") == "1d"
+    assert source_interval("15m") == "15m"
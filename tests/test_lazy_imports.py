@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+from lazy_imports import LazyModule
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_module_is_imported_on_first_attribute_access():
+    loaded = []
+    module = LazyModule("json", on_load=loaded.append)
+
+    assert not module.loaded
+    assert module.dumps([1]) == "[1]"
+    module.dumps([2])
+    assert module.loaded and loaded == [json]
+
+
+def test_attribute_writes_reach_the_real_module():
+    module = LazyModule("json")
+    module.lazy_test_marker = True
+    try:
+        assert json.lazy_test_marker
+    finally:
+        del json.lazy_test_marker
+
+
+def test_importing_the_app_does_not_load_heavy_dependencies():
+    heavy = ["pandas", "numpy", "yfinance", "openai", "matplotlib", "pyarrow"]
+    script = f"import sys, main; print([name for name in {heavy!r} if name in sys.modules])"
+    env = dict(os.environ, BAR_STORE_ENABLED="0", PREFETCH_ENABLED="0")
+
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+
+    assert output.strip() == "[]"
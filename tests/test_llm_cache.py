@@ -0,0 +1,85 @@
+import pytest
+
+from conftest import FakeClock
+from llm_cache import ResponseCache, bucket_numbers, normalize_prompt
+
+
+class FakeShared:
+    """A shared tier kept in a dict, storing (value, ttl) like the cache server."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):
+        self.entries[key] = (value, ttl)
+
+
+def messages(result):
+    return [{"role": "system", "content": "You explain stock results."},
+            {"role": "user", "content": f"Explain this result:   {result}"}]
+
+
+@pytest.fixture
+def cache():
+    clock = FakeClock()
+    return ResponseCache(ttl=60, max_entries=2, significant_digits=4, clock=clock)
+
+
+def test_bucket_numbers():
+    assert bucket_numbers("RSI 64.8312 over 14 days", 4) == "RSI 64.83 over 14 days"
+    assert bucket_numbers("price 123456.7 and -0.000123456", 3) == "price 1.23e+05 and -0.000123"
+    assert bucket_numbers("RSI 64.8312", 0) == "RSI 64.8312"
+
+
+def test_equivalent_prompts_share_a_key(cache):
+    key = cache.make_key(messages("64.8312"), model="gpt", max_tokens=150)
+
+    assert cache.make_key(messages("64.8349"), max_tokens=150, model="gpt") == key
+    assert cache.make_key([{**message, "content": message["content"].upper()} for message in messages("64.8312")],
+                          model="gpt", max_tokens=150) == key
+    assert cache.make_key(messages("64.8412"), model="gpt", max_tokens=150) != key
+    assert cache.make_key(messages("64.8312"), model="gpt", max_tokens=300) != key
+
+
+def test_tool_calls_are_part_of_the_prompt():
+    call = {"function": {"name": "calculate_rsi", "arguments": '{"ticker": "AAPL"}'}}
+    asked = [{"role": "assistant", "content": None, "tool_calls": [call]}]
+
+    assert "calculate_rsi" in normalize_prompt(asked)
+    assert normalize_prompt(asked) != normalize_prompt([{"role": "assistant", "content": None}])
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted(cache):
+    cache.put("a", "first")
+    cache.put("b", "second")
+    assert cache.get("a") == "first"
+    cache.put("c", "third")
+
+    assert cache.get("b") is None
+    cache.clock.sleep(60)
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "evictions": 1, "expirations": 1,
+                             "entries": 1}
+
+
+def test_the_shared_tier_fills_local_misses(cache):
+    cache.shared = FakeShared()
+    cache.put("a", "first")
+    other = ResponseCache(ttl=60, max_entries=2, clock=cache.clock, shared=cache.shared)
+
+    assert cache.shared.entries == {"llm:a": ("first", 60)}
+    assert other.get("a") == "first"
+    assert other.stats()["entries"] == 1
+
+
+def test_a_cache_sized_to_zero_stays_off_the_shared_tier(cache):
+    cache.shared = FakeShared()
+    cache.shared.set("llm:a", "first", 60)
+    cache.max_entries = 0
+    cache.put("b", "second")
+
+    assert cache.get("a") is None
+    assert "llm:b" not in cache.shared.entries
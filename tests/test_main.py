@@ -0,0 +1,279 @@
+import asyncio
+import json
+import threading
+import time
+
+import openai
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from openai.util import convert_to_openai_object
+
+import history_cache
+import main
+from market_data import RateLimitedError
+
+
+class FakeOpenAI:
+    """
+    Answers chat completions offline, recording every request.
+
+    Plain completions answer "explained: " and the start of the last message. Requests offering tools get
+    the scripted `tool_calls`, or a plain answer if there are none.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.tool_calls = []
+
+    async def acreate(self, messages, stream=False, **params):
+        self.requests.append(dict(params, messages=messages, stream=stream))
+        if "tools" in params:
+            message = {"role": "assistant", "content": None if self.tool_calls else "No data needed.",
+                       "tool_calls": self.tool_calls or None}
+        else:
+            message = {"role": "assistant", "content": self.answer(messages)}
+        if stream:
+            return self._stream(message["content"])
+        return convert_to_openai_object({"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+
+    @staticmethod
+    def answer(messages):
+        return "explained: " + messages[-1]["content"][:40]
+
+    async def _stream(self, content):
+        for position in range(0, len(content), 10):
+            yield convert_to_openai_object({"choices": [{"index": 0, "delta": {"content": content[position:position + 10]}}]})
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeOpenAI()
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", fake.acreate)
+    main.response_cache._entries.clear()
+    return fake
+
+
+@pytest.fixture
+def app_client(upstream, monkeypatch):
+    """A test client for the app, with histories fetched from the fake upstream into an empty cache."""
+    monkeypatch.setattr(history_cache, "market_data", upstream)
+    history_cache.history_cache.invalidate()
+    yield TestClient(main.app)
+    history_cache.history_cache.invalidate()
+
+
+def test_run_blocking_times_out_with_a_504():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.run_blocking(time.sleep, 1, timeout=0.01))
+    assert error.value.status_code == 504
+
+
+def test_run_blocking_reports_upstream_rate_limits_as_a_503():
+    def fetch():
+        raise RateLimitedError("The market data provider is rate limiting requests.", retry_after=2.5)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.run_blocking(fetch))
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": "3"}
+
+
+def test_stock_info_explains_the_computed_result(app_client, llm):
+    response = app_client.post("/stock-info/", json={"selected_stock": "AAPL", "user_input": "What is the RSI?"})
+
+    assert response.status_code == 200
+    assert response.json()["response"].startswith("explained: ")
+    assert "RSI" in llm.requests[-1]["messages"][-1]["content"]
+
+
+def test_slow_fetches_do_not_block_other_requests(app_client, upstream, llm, monkeypatch):
+    fetching, gate = threading.Event(), threading.Event()
+    send = upstream.transport.send
+
+    def slow_send(request, **kwargs):
+        fetching.set()
+        gate.wait(5)
+        return send(request, **kwargs)
+
+    monkeypatch.setattr(upstream.transport, "send", slow_send)
+    events = []
+    question = threading.Thread(target=lambda: events.append(app_client.post(
+        "/stock-info/", json={"selected_stock": "MSFT", "user_input": "What is the price?"}).status_code))
+    question.start()
+    assert fetching.wait(5)
+    # The fetch is parked on the worker pool, so the event loop still answers
+    events.append(app_client.get("/metrics").status_code)
+    gate.set()
+    question.join(10)
+
+    assert events == [200, 200]
+
+
+def test_compare_ranks_the_largest_allowed_list(app_client, upstream, monkeypatch):
+    monkeypatch.setattr(upstream.limiter, "sleep", lambda seconds: None)
+    tickers = [f"T{i:03d}" for i in range(main.MAX_COMPARE_TICKERS)]
+
+    response = app_client.post("/compare", json={"tickers": tickers, "indicator": "rsi"})
+
+    assert response.status_code == 200
+    assert sorted(result["ticker"] for result in response.json()["results"]) == tickers
+    assert len(upstream.transport.requests) == 100
+    assert upstream.limiter.throttled == 0
+
+
+def test_repeated_questions_reuse_the_cached_explanation(app_client, llm):
+    question = {"selected_stock": "AAPL", "user_input": "What is the RSI?"}
+    first = app_client.post("/stock-info/", json=question).json()
+    second = app_client.post("/stock-info/", json=question).json()
+
+    assert second["response"] == first["response"]
+    assert len(llm.requests) == 1
+
+
+def read_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_the_result_then_tokens_then_the_whole_answer(app_client, llm):
+    response = app_client.post("/stock-info/stream",
+                               json={"selected_stock": "AAPL", "user_input": "What is the RSI?"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "result" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+    tokens = "".join(data["token"] for name, data in events if name == "token")
+    assert events[-1][1]["response"] == tokens
+    assert tokens.startswith("explained: ")
+    assert llm.requests[-1]["stream"]
+
+
+def test_metrics_expose_the_stage_timings_of_answered_questions(app_client, llm):
+    app_client.post("/stock-info/", json={"selected_stock": "AAPL", "user_input": "What is the RSI?"})
+
+    response = app_client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE stock_info_stage_seconds histogram" in response.text
+    assert 'stock_info_stage_seconds_count{stage="llm"}' in response.text
+    assert "history_cache_misses " in response.text
+
+
+def test_batch_fetches_each_ticker_once_and_explains_in_one_completion(app_client, upstream, llm, monkeypatch):
+    def answer(messages):
+        if messages[0]["content"] == main.BATCH_INSTRUCTIONS:
+            return "\n".join(f"{line.split('.')[0]}. batched" for line in messages[-1]["content"].splitlines())
+        return FakeOpenAI.answer(messages)
+
+    monkeypatch.setattr(llm, "answer", answer)
+    items = [{"selected_stock": "AAPL", "user_input": "What is the RSI?"},
+             {"selected_stock": "MSFT", "user_input": "What is the 20-day SMA?"},
+             {"selected_stock": "AAPL", "user_input": "What is the MACD?"},
+             {"selected_stock": "AAPL", "user_input": " "}]
+
+    response = app_client.post("/stock-info/batch", json={"items": items})
+
+    results = response.json()["results"]
+    assert [result.get("response") for result in results[:3]] == ["batched"] * 3
+    assert results[3] == {"error": "Error: Please provide a valid input."}
+    assert sorted(upstream.transport.requests) == ["AAPL", "MSFT"]
+    assert len(llm.requests) == 1
+
+
+def test_batch_rejects_too_many_questions(app_client):
+    items = [{"selected_stock": "AAPL", "user_input": "What is the RSI?"}] * (main.MAX_BATCH_ITEMS + 1)
+
+    assert app_client.post("/stock-info/batch", json={"items": items}).status_code == 400
+
+
+def test_charts_are_revalidated_by_etag_without_rendering_again(app_client, monkeypatch):
+    renders = []
+
+    async def render(*args):
+        renders.append(args)
+        return b"\x89PNG image"
+
+    monkeypatch.setattr(main, "render_in_pool", render)
+    main.chart_cache._entries.clear()
+
+    first = app_client.get("/chart/AAPL", params={"overlays": "sma,macd"})
+    etag = first.headers["ETag"]
+    again = app_client.get("/chart/AAPL", params={"overlays": "macd,sma"})
+    unchanged = app_client.get("/chart/AAPL", params={"overlays": "sma,macd"}, headers={"If-None-Match": etag})
+
+    assert first.status_code == 200 and first.content == b"\x89PNG image"
+    assert again.headers["ETag"] == etag and again.content == first.content
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert len(renders) == 1
+
+
+def test_charts_reject_unknown_overlays(app_client):
+    assert app_client.get("/chart/AAPL", params={"overlays": "bollinger"}).status_code == 400
+
+
+def test_follow_up_questions_continue_the_session(app_client, llm):
+    first = app_client.post("/stock-info/", json={"selected_stock": "AAPL",
+                                                  "user_input": "What is the RSI over the last 6 months?"}).json()
+    follow_up = app_client.post("/stock-info/", json={"user_input": "And the MACD?",
+                                                      "session_id": first["session_id"]}).json()
+
+    assert follow_up["session_id"] == first["session_id"]
+    session = main.session_store.get(first["session_id"])
+    assert (session.selected_stock, session.period) == ("AAPL", "6mo")
+    assert list(session.facts) == ["RSI (6mo)", "MACD histogram (6mo)"]
+    prompt = " ".join(message["content"] for message in llm.requests[-1]["messages"])
+    assert "Earlier results: RSI (6mo) = " in prompt
+
+
+def test_exit_ends_the_session(app_client, llm):
+    session_id = app_client.post("/stock-info/", json={"selected_stock": "AAPL",
+                                                       "user_input": "What is the RSI?"}).json()["session_id"]
+
+    app_client.post("/stock-info/", json={"user_input": "exit", "session_id": session_id})
+
+    assert main.session_store.get(session_id) is None
+    assert app_client.post("/stock-info/", json={"user_input": "What is the RSI?",
+                                                 "session_id": session_id}).status_code == 400
+
+
+def tool_call(call_id, name, arguments):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+
+
+def test_tool_calls_drop_undeclared_arguments_and_default_the_ticker():
+    assert main.parse_tool_call(tool_call("1", "calculate_sma", '{"window": 20, "colour": "red"}'), "AAPL") == (
+        "1", "calculate_sma", {"window": 20, "ticker": "AAPL"})
+    assert main.parse_tool_call(tool_call("2", "calculate_rsi", "not json")) == ("2", "calculate_rsi", {})
+    assert main.run_tool("calculate_rsi", {}) == "Error: Please select a stock."
+    assert main.run_tool("delete_everything", {"ticker": "AAPL"}) == "Error: Unknown function 'delete_everything'."
+
+
+def test_tools_run_the_requested_calls_and_answer_in_one_follow_up(app_client, upstream, llm):
+    llm.tool_calls = [tool_call("call_1", "calculate_rsi", "{}"),
+                      tool_call("call_2", "calculate_sma", '{"ticker": "MSFT", "window": 20}')]
+
+    response = app_client.post("/stock-info/tools", json={"selected_stock": "AAPL",
+                                                          "user_input": "RSI of AAPL and the 20-day SMA of MSFT?"})
+
+    body = response.json()
+    assert [(call["name"], call["arguments"]) for call in body["tool_calls"]] == [
+        ("calculate_rsi", {"ticker": "AAPL"}), ("calculate_sma", {"ticker": "MSFT", "window": 20})]
+    assert all(not call["result"].startswith("Error") for call in body["tool_calls"])
+    assert body["response"].startswith("explained: ")
+    assert sorted(upstream.transport.requests) == ["AAPL", "MSFT"]
+    follow_up = llm.requests[-1]["messages"]
+    assert [message["role"] for message in follow_up[-3:]] == ["assistant", "tool", "tool"]
+    assert len(llm.requests) == 2
+
+
+def test_tools_return_the_model_reply_when_no_call_is_needed(app_client, llm):
+    body = app_client.post("/stock-info/tools", json={"user_input": "Hello"}).json()
+
+    assert body["response"] == "No data needed."
+    assert body["tool_calls"] == []
@@ -0,0 +1,97 @@
+import pytest
+
+from conftest import FakeClock
+from market_data import (CircuitBreaker, CircuitOpenError, RateLimitedError, ThrottledError, TokenBucket,
+                         UpstreamUnavailableError)
+
+
+def test_token_bucket_allows_a_burst_then_paces_waiting_callers():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire() and bucket.acquire()
+    assert clock.now == 0
+    assert bucket.acquire()
+    assert clock.now == pytest.approx(0.5)
+    assert not bucket.acquire(max_wait=0.1)
+    assert bucket.throttled == 1
+
+
+def test_circuit_breaker_opens_at_the_threshold_and_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.sleep(10)
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_history_retries_upstream_failures(upstream):
+    upstream.transport.statuses = {"AAPL": [503, 429]}
+
+    frame = upstream.history("AAPL", period="1y")
+
+    assert len(frame) == 300
+    assert upstream.transport.requests == ["AAPL"] * 3
+    assert upstream.retries == 2
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_history_raises_after_the_last_retry(upstream):
+    upstream.transport.statuses = {"AAPL": [503, 503, 429]}
+
+    with pytest.raises(RateLimitedError):
+        upstream.history("AAPL", period="1y")
+    assert upstream.breaker.failures == 3
+
+
+def test_throttled_calls_are_not_retried_or_counted_as_failures(upstream):
+    upstream.max_wait = 0
+    for _ in range(20):
+        upstream.limiter.acquire()
+
+    with pytest.raises(ThrottledError):
+        upstream.history("AAPL", period="1y")
+    assert upstream.transport.requests == []
+    assert upstream.breaker.failures == 0
+
+
+def test_download_retries_only_the_failed_ticker(upstream):
+    upstream.transport.statuses = {"MSFT": [503]}
+
+    histories = upstream.download(["AAPL", "MSFT", "NVDA"], "1y")
+
+    assert sorted(histories) == ["AAPL", "MSFT", "NVDA"]
+    assert all(len(frame) == 300 for frame in histories.values())
+    assert sorted(upstream.transport.requests) == ["AAPL", "MSFT", "MSFT", "NVDA"]
+
+
+def test_download_raises_when_a_ticker_keeps_failing(upstream):
+    upstream.transport.statuses = {"MSFT": [503, 503, 503]}
+
+    with pytest.raises(UpstreamUnavailableError):
+        upstream.download(["AAPL", "MSFT"], "1y")
+    assert upstream.transport.requests.count("AAPL") == 1
+
+
+def test_download_waits_for_tokens_beyond_max_wait(upstream, monkeypatch):
+    # Every request waits at once and the clock stands still, so the bucket never refills
+    monkeypatch.setattr(upstream, "pool_size", 100)
+    monkeypatch.setattr(upstream.limiter, "sleep", lambda seconds: None)
+    tickers = [f"T{i:03d}" for i in range(100)]
+
+    histories = upstream.download(tickers, "1y")
+
+    assert sorted(histories) == tickers
+    assert upstream.limiter.throttled == 0
+    assert upstream.queue_time(1) == pytest.approx((1 + 80) / 5)
@@ -0,0 +1,54 @@
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_counters_render_one_line_per_label_combination():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls.", ("outcome",))
+
+    calls.inc(outcome="ok")
+    calls.inc(2, outcome="ok")
+    calls.inc(outcome='bad "input"')
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP calls_total Calls.", "# TYPE calls_total counter"]
+    assert 'calls_total{outcome="ok"} 3' in lines
+    assert 'calls_total{outcome="bad \\"input\\""} 1' in lines
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    seconds = registry.histogram("seconds", "Durations.", buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.5, 5.0):
+        seconds.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[2:] == ['seconds_bucket{le="0.1"} 1', 'seconds_bucket{le="1.0"} 3', 'seconds_bucket{le="+Inf"} 4',
+                         "seconds_sum 6.05", "seconds_count 4"]
+
+
+def test_stats_are_read_as_gauges_when_rendered():
+    registry = MetricsRegistry()
+    stats = {"hits": 1, "enabled": True, "path": "/tmp"}
+    registry.register_stats("cache", "Cache counters.", lambda: stats)
+    stats["hits"] = 7
+
+    assert registry.render().splitlines() == ["# HELP cache_hits Cache counters.", "# TYPE cache_hits gauge",
+                                              "cache_hits 7"]
+
+
+def test_ticker_labels_are_bounded():
+    registry = MetricsRegistry(max_tickers=2)
+
+    assert [registry.ticker_label(ticker) for ticker in ("aapl", "MSFT", "NVDA", "AAPL ")] == [
+        "AAPL", "MSFT", "other", "AAPL"]
+
+
+def test_metric_names_are_unique():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls.")
+
+    with pytest.raises(ValueError):
+        registry.histogram("calls_total", "Calls.")
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import FakeClock
+from prefetch import PrefetchScheduler
+
+
+class FakeCache:
+    """Records refreshes and reports every history as missing unless it was refreshed."""
+
+    def __init__(self):
+        self.refreshed = []
+        self.expiry = {}
+
+    def expires_in(self, ticker, period='1y', interval='1d'):
+        return self.expiry.get(ticker)
+
+    def refresh_many(self, tickers, period='1y', interval='1d'):
+        self.refreshed.append(list(tickers))
+        for ticker in tickers:
+            self.expiry[ticker] = 3600
+
+
+@pytest.fixture
+def scheduler():
+    clock = FakeClock()
+    warmed = []
+    scheduler = PrefetchScheduler(FakeCache(), lambda ticker, period: warmed.append(ticker), top_k=2,
+                                  budget_per_hour=3, interval_open=30, interval_closed=30, half_life=60,
+                                  max_tracked=3, clock=clock)
+    scheduler.warmed = warmed
+    return scheduler
+
+
+def test_hot_tickers_follow_decayed_request_counts(scheduler):
+    for ticker in ["AAPL", "AAPL", "MSFT", " msft ", "MSFT", "TSLA"]:
+        scheduler.record(ticker)
+    assert scheduler.hot_tickers() == ["MSFT", "AAPL"]
+
+    scheduler.clock.sleep(600)
+    scheduler.record("TSLA")
+    assert scheduler.hot_tickers()[0] == "TSLA"
+
+
+def test_record_forgets_the_least_recently_requested_ticker(scheduler):
+    for ticker in ["AAPL", "AAPL", "MSFT", "TSLA", "AAPL", "NVDA"]:
+        scheduler.record(ticker)
+
+    assert scheduler.stats()["tracked"] == 3
+    assert set(scheduler._scores) == {"TSLA", "AAPL", "NVDA"}
+
+
+def test_cycles_refresh_due_tickers_within_the_budget(scheduler):
+    for ticker in ["AAPL", "AAPL", "MSFT"]:
+        scheduler.record(ticker)
+
+    assert scheduler.run_cycle() == ["AAPL", "MSFT"]
+    assert scheduler.warmed == ["AAPL", "MSFT"]
+    # Both are fresh now, so the next cycle has nothing to do
+    assert scheduler.run_cycle() == []
+
+    scheduler.cache.expiry.clear()
+    assert scheduler.run_cycle() == ["AAPL"]
+    assert scheduler.stats()["deferred"] == 1
@@ -0,0 +1,42 @@
+from prompts import (count_message_tokens, count_tokens, fit_messages, format_number, format_result,
+                     max_tokens_for, truncate_tokens)
+
+
+def test_numbers_are_formatted_compactly():
+    assert [format_number(value) for value in (1548123, 12345.2, 187.4213, 0.017867, -2.5e9)] == [
+        "1.55M", "12,345", "187.42", "0.0179", "-2.50B"]
+
+
+def test_results_are_formatted_by_shape():
+    assert format_result("187.4213", "get_stock_price") == "187.42 per share"
+    assert format_result('{"rsi": 64.8012, "macd": -0.01234}') == "RSI 64.80, MACD histogram -0.0123"
+    assert format_result([1.0, 3.0, float("nan"), 2.0]) == "3 values, last 2.00, min 1.00, max 3.00, mean 2.00"
+    assert format_result("Average volume: 1548123.0 over 21 days") == "Average volume: 1.55M over 21 days"
+
+
+def test_truncation_marks_the_cut_and_fits_the_budget():
+    text = "word " * 200
+
+    short = truncate_tokens(text, 20)
+
+    assert short.endswith(" …") and count_tokens(short) <= 20
+    assert truncate_tokens("short", 20) == "short"
+
+
+def test_answer_length_grows_with_the_parts_up_to_the_limit():
+    assert max_tokens_for("get_stock_price") == 60
+    assert max_tokens_for("calculate_macd", 3) == 200
+    assert max_tokens_for(None, 10) == 300
+
+
+def test_fit_messages_drops_the_summary_before_shortening_the_result():
+    summary = "Earlier results: " + "RSI (1y) = 64.80; " * 20
+    result = "1.23 " * 20
+
+    roomy = fit_messages("Explain.", summary, "Result: {result}", result, budget=2000)
+    tight = fit_messages("Explain.", summary, "Result: {result}", result, budget=count_message_tokens(roomy) - 10)
+    tiny = fit_messages("Explain.", summary, "Result: {result}", result, budget=25)
+
+    assert roomy[0]["content"] == f"Explain. {summary}" and roomy[1]["content"] == f"Result: {result}"
+    assert tight[0]["content"] == "Explain." and tight[1]["content"] == f"Result: {result}"
+    assert tiny[1]["content"].endswith(" …") and count_message_tokens(tiny) <= 25
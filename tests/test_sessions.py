@@ -0,0 +1,52 @@
+from sessions import SESSION_MAX_FACTS, Session, SessionStore
+
+
+def test_selecting_another_stock_forgets_the_conversation():
+    session = Session(selected_stock="AAPL", period="6mo", interval="1h")
+    session.remember("rsi", "6mo", "64.8")
+
+    session.select(" aapl ")
+    assert session.period == "6mo" and session.facts
+    session.select("msft")
+    assert (session.selected_stock, session.period, session.interval, dict(session.facts)) == ("MSFT", None, None, {})
+
+
+def test_remember_keeps_the_latest_results_for_the_summary():
+    session = Session()
+    label = session.remember("rsi", "1y", "64.8012")
+    session.remember("macd", "6mo", "0.5", interval="1wk")
+    session.remember("volume", "1mo", "Average volume: 10; rising")
+
+    assert label == "RSI (1y)"
+    assert session.remember("rsi", "1y", "Error: no data") is None
+    assert session.summary(exclude=label) == ("Earlier results: MACD histogram (6mo, 1wk bars) = 0.50; "
+                                              "volume (1mo) = Average volume: 10.")
+    for number in range(SESSION_MAX_FACTS + 2):
+        session.remember("sma", f"{number}d", str(number))
+    assert len(session.facts) == SESSION_MAX_FACTS
+
+
+def test_sessions_survive_a_json_round_trip():
+    session = Session(selected_stock="AAPL", period="1y", interval="1h")
+    session.remember("rsi", "1y", "64.8")
+
+    copy = Session.from_dict(session.to_dict())
+
+    assert copy.to_dict() == session.to_dict()
+
+
+def test_store_expires_idle_sessions_and_bounds_their_number(clock):
+    store = SessionStore(ttl=10, max_entries=2, clock=clock)
+    first, second, third = Session(), Session(), Session()
+    for session in (first, second):
+        store.save(session)
+
+    clock.sleep(8)
+    assert store.get(first.session_id) is first
+    clock.sleep(8)
+    assert store.get(second.session_id) is None
+    store.save(second)
+    store.save(third)
+
+    assert store.get(first.session_id) is None
+    assert store.stats() == {"entries": 2, "evictions": 1, "expirations": 1}
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from shared_cache import KeyValueStore, SharedCache, check_authkey, parse_address, start_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    address = os.path.join(tmp_path, "cache.sock")
+    manager = start_server(address, "secret")
+    yield address
+    manager.shutdown()
+
+
+def test_a_secret_is_required():
+    with pytest.raises(RuntimeError):
+        check_authkey("")
+    with pytest.raises(RuntimeError):
+        SharedCache("/tmp/cache.sock", authkey="")
+    assert check_authkey("secret") == b"secret"
+
+
+def test_addresses_are_parsed_as_tcp_or_unix_sockets():
+    assert parse_address("127.0.0.1:6000") == ("127.0.0.1", 6000)
+    assert parse_address("/run/cache.sock") == "/run/cache.sock"
+
+
+def test_store_expires_values_and_evicts_to_stay_within_the_budget(clock):
+    store = KeyValueStore(max_bytes=10, clock=clock)
+    store.set("a", b"aaaa", ttl=10)
+    store.set("b", b"bbbb", ttl=20)
+    store.get("a")
+    store.set("c", b"cccc", ttl=20)
+
+    assert store.get("b") is None
+    assert store.get("a") == (b"aaaa", 10)
+    clock.sleep(10)
+    assert store.get_many(["a", "c"]) == {"c": (b"cccc", 20)}
+    assert store.stats()["evictions"] == 1 and store.stats()["bytes"] == 4
+
+
+def test_leases_belong_to_one_owner_until_they_expire(clock):
+    store = KeyValueStore(clock=clock)
+
+    assert store.claim("leader", b"one", ttl=10)
+    assert not store.claim("leader", b"two", ttl=10)
+    assert store.claim("leader", b"one", ttl=10)
+    clock.sleep(10)
+    assert store.claim("leader", b"two", ttl=10)
+
+
+def test_clients_share_pickled_values_through_the_server(server):
+    writer, reader = SharedCache(server, "secret"), SharedCache(server, "secret")
+
+    writer.set("prices", {"AAPL": [1.5, 2.5]}, ttl=60)
+
+    value, ttl = reader.get("prices")
+    assert value == {"AAPL": [1.5, 2.5]} and 0 < ttl <= 60
+    assert reader.get("missing") is None
+    assert reader.stats() == {"hits": 1, "misses": 1, "errors": 0, "connected": 1}
+
+
+def test_a_wrong_secret_behaves_as_an_empty_cache(server, clock):
+    SharedCache(server, "secret").set("prices", [1.5], ttl=60)
+    client = SharedCache(server, "wrong", retry_after=5, clock=clock)
+
+    assert client.get("prices") is None
+    client.set("prices", [0.0], ttl=60)
+    assert client.stats() == {"hits": 0, "misses": 1, "errors": 1, "connected": 0}
+    assert SharedCache(server, "secret").get("prices")[0] == [1.5]
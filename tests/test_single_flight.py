@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fakes import synthetic_history
+from history_cache import HistoryCache, SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def load():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "bars"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, "AAPL", load)
+        started.wait(5)
+        followers = [pool.submit(flight.do, "AAPL", load) for _ in range(3)]
+        # Followers wait for the leader instead of running the function
+        while flight.stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in [leader] + followers]
+
+    assert results == ["bars"] * 4
+    assert runs == [1]
+    assert flight.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "AAPL", fail)
+        started.wait(5)
+        follower = pool.submit(flight.do, "AAPL", fail)
+        while flight.stats()["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+
+    # The failed call is not remembered, so the next caller tries again
+    assert flight.do("AAPL", lambda: "bars") == "bars"
+
+
+def test_cache_misses_for_the_same_history_fetch_once():
+    gate = threading.Event()
+    fetches = []
+
+    def fetcher(ticker, period, interval):
+        fetches.append(ticker)
+        gate.wait(5)
+        return synthetic_history(ticker, 100)
+
+    cache = HistoryCache(fetcher=fetcher)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get, "AAPL") for _ in range(8)]
+        while cache.stats()["coalesced"] < 7:
+            time.sleep(0.001)
+        gate.set()
+        results = [future.result() for future in futures]
+
+    assert fetches == ["AAPL"]
+    assert all(bars is results[0] for bars in results)
@@ -0,0 +1,63 @@
+import pytest
+
+import history_cache
+from indicators import compute_indicators
+from stock_functions import (calculate_indicators, calculate_macd, calculate_rsi, calculate_sma, get_close_frame,
+                             rank_stocks)
+
+
+@pytest.mark.parametrize("call", [
+    lambda: calculate_sma("AAPL", window=0),
+    lambda: calculate_rsi("AAPL", window=-14),
+    lambda: calculate_macd("AAPL", short_window=12, long_window=0),
+    lambda: calculate_indicators("AAPL", ema_window=1.5),
+])
+def test_invalid_windows_are_reported_before_fetching(call):
+    result = call()
+    assert result.startswith("Error: The ") and "must be a positive whole number" in result
+
+
+def test_rank_stocks_rejects_invalid_windows():
+    with pytest.raises(ValueError, match="The window must be a positive whole number, got 0."):
+        rank_stocks(["AAPL", "MSFT"], "sma", window=0)
+
+
+@pytest.fixture
+def downloads(upstream, monkeypatch):
+    """Serve the history cache from the fake upstream, recording each batched download."""
+    calls = []
+    download = upstream.download
+
+    def record(tickers, period, interval='1d'):
+        calls.append(list(tickers))
+        return download(tickers, period, interval)
+
+    monkeypatch.setattr(upstream, "download", record)
+    monkeypatch.setattr(history_cache, "market_data", upstream)
+    history_cache.history_cache.invalidate()
+    yield calls
+    history_cache.history_cache.invalidate()
+
+
+def test_rank_stocks_fetches_every_ticker_in_one_download(downloads, upstream):
+    upstream.transport.statuses = {"NODATA": [404]}
+
+    ranking = rank_stocks(["aapl", "MSFT", "NODATA", "TSLA", "AAPL"], "price")
+
+    assert downloads == [["AAPL", "MSFT", "NODATA", "TSLA"]]
+    assert [entry["rank"] for entry in ranking] == [1, 2, 3, None]
+    assert ranking[-1] == {"rank": None, "ticker": "NODATA", "value": None}
+    values = [entry["value"] for entry in ranking[:3]]
+    assert values == sorted(values, reverse=True)
+
+
+def test_rank_stocks_matches_the_indicator_of_each_close(downloads):
+    closes = get_close_frame(["AAPL", "MSFT", "TSLA"])
+    ranking = rank_stocks(["AAPL", "MSFT", "TSLA"], "rsi", window=21, ascending=True)
+
+    assert list(closes.columns) == ["AAPL", "MSFT", "TSLA"]
+    expected = compute_indicators(closes, ("rsi",), rsi_window=21)["rsi"].sort_values()
+    assert [entry["ticker"] for entry in ranking] == list(expected.index)
+    assert [entry["value"] for entry in ranking] == pytest.approx(list(expected))
+    # Everything was fetched by the first call
+    assert downloads == [["AAPL", "MSFT", "TSLA"]]
@@ -0,0 +1,62 @@
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import volume_stream
+from bar_series import BarSeries
+from benchmarks.fakes import synthetic_history
+from intervals import INTERVAL_RULES
+from volume_stream import get_volume_series, iter_volume_arrow, iter_volume_ndjson
+
+
+@pytest.fixture(autouse=True)
+def history(monkeypatch):
+    history = synthetic_history("AAPL", 300, end=pd.Timestamp("2024-06-28", tz="America/New_York"))
+    monkeypatch.setattr(volume_stream, "get_history", lambda ticker, period: history)
+    return history
+
+
+@pytest.mark.parametrize("resample, interval", [("weekly", "1wk"), ("monthly", "1mo")])
+def test_buckets_match_the_bars_of_the_same_interval(history, resample, interval):
+    volume = get_volume_series("AAPL", resample=resample)
+    bars = BarSeries.from_frame(history).resample(INTERVAL_RULES[interval])
+
+    assert volume.index.equals(bars.index)
+    assert volume.tolist() == bars["Volume"].tolist()
+    assert volume.sum() == history["Volume"].sum()
+
+
+def test_weeks_are_labelled_by_their_monday():
+    volume = get_volume_series("AAPL", start="2024-06-01", resample="weekly")
+
+    assert set(volume.index.dayofweek) == {0}
+    assert volume.index[-1] == pd.Timestamp("2024-06-24", tz="America/New_York")
+
+
+def test_date_range_and_paging(history):
+    volume = get_volume_series("AAPL", start="2024-06-03", end="2024-06-07")
+    assert volume.tolist() == history["Volume"]["2024-06-03":"2024-06-07"].tolist()
+
+    page = get_volume_series("AAPL", offset=10, limit=5)
+    assert page.tolist() == history["Volume"].iloc[10:15].tolist()
+
+
+def test_unknown_resample_is_rejected():
+    with pytest.raises(ValueError, match="Unknown resample"):
+        get_volume_series("AAPL", resample="hourly")
+
+
+def test_streams_hold_every_row_in_chunks(history):
+    volume = get_volume_series("AAPL")
+
+    chunks = list(iter_volume_ndjson(volume, chunk_size=128))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+    assert len(chunks) == 3
+    assert rows[0] == {"date": volume.index[0].strftime("%Y-%m-%d"), "volume": int(volume.iloc[0])}
+    assert [row["volume"] for row in rows] == volume.tolist()
+
+    table = pa.ipc.open_stream(b"".join(iter_volume_arrow(volume, chunk_size=128))).read_all()
+    assert table.num_rows == 300
+    assert table.column("volume").to_pylist() == volume.tolist()
@@ -0,0 +1,140 @@
+import io
+import json
+
+from history_cache import get_history
+from intervals import INTERVAL_RULES
+from lazy_imports import LazyModule
+
+pd = LazyModule("pandas")
+
+# The same buckets as weekly and monthly bars, labelled by the day they start
+RESAMPLE_RULES = {
+    "daily": None,
+    "weekly": INTERVAL_RULES["1wk"],
+    "monthly": INTERVAL_RULES["1mo"],
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_volume_series(ticker, start=None, end=None, resample='daily', offset=0, limit=None):
+    """
+    Get the trading volume for a stock over a date range.
+
+    Args:
+        ticker (str): The stock ticker symbol.
+        start (str, optional): First date to include, e.g. '2020-01-01' (default is the first bar).
+        end (str, optional): Last date to include (default is the latest bar).
+        resample (str, optional): 'daily', 'weekly' or 'monthly'; coarser buckets sum the daily
+            volume and are labelled by their first day (default is 'daily').
+        offset (int, optional): Number of rows to skip, for paging (default is 0).
+        limit (int, optional): Maximum number of rows to return (default is all).
+
+    Returns:
+        pandas.Series: Volume indexed by date, oldest first.
+
+    Raises:
+        ValueError: If the resample rule is unknown or no data is available.
+    """
+    if resample not in RESAMPLE_RULES:
+        raise ValueError(f"Unknown resample '{resample}'. Use one of: {', '.join(RESAMPLE_RULES)}.")
+
+    stock_data = get_history(ticker, 'max')
+    if stock_data.empty:
+        raise ValueError(f"No volume data found for {ticker}.")
+
+    volume = stock_data['Volume']
+    index = volume.index
+    if start is not None:
+        volume = volume[index.searchsorted(_as_timestamp(start, index), side='left'):]
+        index = volume.index
+    if end is not None:
+        volume = volume[:index.searchsorted(_as_timestamp(end, index) + pd.Timedelta(days=1), side='left')]
+
+    rule = RESAMPLE_RULES[resample]
+    if rule is not None:
+        volume = volume.resample(rule, label="left", closed="left").sum()
+
+    stop = None if limit is None else offset + limit
+    return volume.iloc[offset:stop]
+
+
+def _as_timestamp(value, index):
+    """
+    Parse a date in the timezone of a DatetimeIndex so it can be compared with it.
+
+    Args:
+        value (str): The date to parse.
+        index (pandas.DatetimeIndex): The index to compare against.
+
+    Returns:
+        pandas.Timestamp: The parsed date.
+    """
+    timestamp = pd.Timestamp(value)
+    if index.tz is not None and timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(index.tz)
+    return timestamp
+
+
+def iter_volume_ndjson(volume, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Serialize a volume series as JSON lines, one chunk of rows at a time.
+
+    Only one chunk is formatted at a time, so memory use does not grow with the series length.
+
+    Args:
+        volume (pandas.Series): Volume indexed by date.
+        chunk_size (int, optional): Rows per yielded chunk (default is 1000).
+
+    Yields:
+        bytes: Newline-delimited JSON objects with 'date' and 'volume' keys.
+    """
+    for position in range(0, len(volume), chunk_size):
+        chunk = volume.iloc[position:position + chunk_size]
+        dates = chunk.index.strftime('%Y-%m-%d')
+        lines = [json.dumps({"date": date, "volume": int(value)}) for date, value in zip(dates, chunk.values)]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def iter_volume_arrow(volume, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Serialize a volume series as an Arrow IPC stream, one record batch at a time.
+
+    Args:
+        volume (pandas.Series): Volume indexed by date.
+        chunk_size (int, optional): Rows per record batch (default is 1000).
+
+    Yields:
+        bytes: Consecutive pieces of the Arrow IPC stream with 'date' and 'volume' columns.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema([("date", pa.timestamp("s", tz=str(volume.index.tz or "UTC"))), ("volume", pa.int64())])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for position in range(0, len(volume), chunk_size):
+            chunk = volume.iloc[position:position + chunk_size]
+            batch = pa.record_batch(
+                [pa.array(chunk.index, type=schema.field("date").type),
+                 pa.array(chunk.values.astype("int64"))],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink):
+    """
+    Take everything written to a buffer so far and empty it.
+
+    Args:
+        sink (io.BytesIO): The buffer.
+
+    Returns:
+        bytes: The buffered bytes.
+    """
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data